@@ -1,4 +1,5 @@
 from agents.tools import search_docs
+from rag.search import query_cache_stats
 from llm.ollama import OllamaLLM
 import re
 
@@ -100,6 +101,7 @@ class ReActAgent:
                         total = len(results)
 
                     print(f"[DEBUG] Retrieved {total} results")
+                    print("[DEBUG] Query embedding cache:", query_cache_stats())
 
                 obs = self._format_results(results)
                 context += f"\nObservation:\n{obs}\n"
@@ -137,6 +139,21 @@ class ReActAgent:
         match = re.search(r'query\s*=\s*"([^"]+)"', text)
         return match.group(1) if match else text
     
+    def _also_in(self, r):
+        """Provenance of duplicates folded into this chunk at index time."""
+        dups = r.get("duplicates") or []
+        if not dups:
+            return ""
+        where = sorted({" ".join(str(d[f]) for f in ("source", "version") if d.get(f)) for d in dups})
+        return f"\n    Also in: {', '.join(where[:5])}" + (" ..." if len(where) > 5 else "")
+
+    def _similarity(self, r):
+        """Cosine similarity to the query; the fused score only orders results."""
+        similarity = r.get("similarity")
+        if similarity is None:
+            return "n/a (keyword match)" if "similarity" in r else f"{r.get('score'):.3f}"
+        return f"{similarity:.3f}"
+
     def _format_results(self, results):
         """
         Supports:
@@ -155,7 +172,7 @@ class ReActAgent:
                     out.append(
                         f"""Source: {r.get('source')}
     Service: {r.get('service')}
-    Score: {r.get('score'):.3f}
+    Similarity: {self._similarity(r)}{self._also_in(r)}
 
     Excerpt:
     \"\"\"{r['text'][:800]}\"\"\"
@@ -170,7 +187,7 @@ class ReActAgent:
                 out.append(
                     f"""Source: {r.get('source')}
     Service: {r.get('service')}
-    Score: {r.get('score'):.3f}
+    Similarity: {self._similarity(r)}{self._also_in(r)}
 
     Excerpt:
     \"\"\"{r['text'][:800]}\"\"\"
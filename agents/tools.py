@@ -1,5 +1,5 @@
 from typing import List, Optional
-from rag.search import search
+from rag.search import search, search_many
 import re
 
 
@@ -66,9 +66,6 @@ def search_docs(query: str, service: Optional[str] = None, k: int = 5) -> List[d
     print("Service scores:", service_scores)
     print("Significant:", significant)
 
-    service_context = {}
-    for svc in significant:
-        svc_results = search(query, service=svc, k=k)
-        service_context[svc] = svc_results
+    per_service = search_many([query] * len(significant), significant, k=k)
 
-    return service_context
+    return dict(zip(significant, per_service))
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+
+"""
+Compare two benchmark result files (see bench.run) and report
+regressions: slower latency percentiles or build, lower embedding
+throughput, lower recall.
+
+Usage:
+    python -m bench.compare baseline.json results.json --tolerance 0.10
+Exits 1 if anything regressed beyond the tolerance.
+"""
+
+import argparse
+import json
+from pathlib import Path
+
+
+# Relative slowdown allowed for timings and throughput
+DEFAULT_TOLERANCE = 0.10
+
+# Absolute drop allowed for recall@k
+DEFAULT_RECALL_TOLERANCE = 0.01
+
+
+def _get(results: dict, path: str):
+    value = results
+    for key in path.split("."):
+        if not isinstance(value, dict) or key not in value:
+            return None
+        value = value[key]
+    return value
+
+
+def metrics(results: dict) -> dict:
+    """Flatten results into {metric path: (value, higher_is_better)}."""
+    out = {}
+    for name, stats in (results.get("latency_ms") or {}).items():
+        for p in ("p50", "p95", "p99"):
+            out[f"latency_ms.{name}.{p}"] = (stats.get(p), False)
+    for name in (results.get("throughput_qps") or {}):
+        out[f"throughput_qps.{name}"] = (results["throughput_qps"][name], True)
+    for name, stats in (results.get("recall") or {}).items():
+        out[f"recall.{name}.mean"] = (stats.get("mean"), True)
+
+    out["build.seconds"] = (_get(results, "build.seconds"), False)
+    out["build.embedding.chunks_per_s"] = (_get(results, "build.embedding.chunks_per_s"), True)
+    return {k: v for k, v in out.items() if v[0] is not None}
+
+
+def compare(baseline: dict, current: dict, tolerance: float = DEFAULT_TOLERANCE,
+            recall_tolerance: float = DEFAULT_RECALL_TOLERANCE) -> list[dict]:
+    """Per metric both values, the relative change and whether it regressed."""
+    base, cur = metrics(baseline), metrics(current)
+    rows = []
+    for name in sorted(base.keys() & cur.keys()):
+        (old, higher_is_better), (new, _) = base[name], cur[name]
+        change = (new - old) / old if old else 0.0
+
+        if name.startswith("recall."):
+            regressed = old - new > recall_tolerance
+        elif higher_is_better:
+            regressed = change < -tolerance
+        else:
+            regressed = change > tolerance
+
+        rows.append({"metric": name, "baseline": old, "current": new,
+                     "change": round(change, 4), "regressed": regressed})
+    return rows
+
+
+def print_report(rows: list[dict]):
+    for row in rows:
+        flag = "REGRESSED" if row["regressed"] else ""
+        print(f"{row['metric']:<44} {row['baseline']:>12.4g} → {row['current']:<12.4g} "
+              f"{row['change']:+8.1%}  {flag}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="Allowed relative slowdown / throughput loss")
+    parser.add_argument("--recall-tolerance", type=float, default=DEFAULT_RECALL_TOLERANCE,
+                        help="Allowed absolute recall drop")
+    args = parser.parse_args()
+
+    rows = compare(json.loads(Path(args.baseline).read_text()),
+                   json.loads(Path(args.current).read_text()),
+                   args.tolerance, args.recall_tolerance)
+    print_report(rows)
+
+    regressed = [row for row in rows if row["regressed"]]
+    print(f"{len(regressed)} of {len(rows)} metrics regressed")
+    raise SystemExit(1 if regressed else 0)
+
+
+if __name__ == "__main__":
+    main()
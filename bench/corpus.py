@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+
+"""
+Synthetic chunk corpora for benchmarks.
+
+Chunks have the fields of the real ones (id, source, service, version,
+url, heading, text, plus repo / labels for GitHub and file_path for
+code), a similar mix of sources and services, log-normal text lengths
+and a Zipf-distributed vocabulary with a long tail of identifiers, so
+FAISS, BM25 and the metadata store see realistic shapes at any size.
+
+For every golden query (bench/golden.json) a few chunks containing one
+of its match phrases are planted; their ids are written to golden.json
+next to the corpus and serve as the relevant set for recall@k.
+
+Usage:
+    python -m bench.corpus --chunks 100000 --output data/bench/100k
+"""
+
+import argparse
+import json
+import time
+from pathlib import Path
+
+import numpy as np
+
+
+GOLDEN_FILE = Path(__file__).with_name("golden.json")
+
+# Relative to the benchmark working directory, where rag.index expects them
+CHUNKS_FILE = Path("data/processed/chunks/synthetic.jsonl")
+CORPUS_GOLDEN_FILE = "golden.json"
+
+SEED = 0
+BLOCK = 10_000
+
+SOURCES = {
+    "openstack_docs": 0.35,
+    "releasenotes": 0.25,
+    "admin_docs": 0.20,
+    "github": 0.15,
+    "code": 0.05,
+}
+SERVICES = {
+    "nova": 0.30, "neutron": 0.20, "cinder": 0.12, "placement": 0.08,
+    "keystone": 0.08, "glance": 0.07, "octavia": 0.05, "swift": 0.05, "heat": 0.05,
+}
+VERSIONS = ["2024.1", "2024.2", "2025.1", "2025.2"]
+
+HEADINGS = {
+    "openstack_docs": ["Introduction", "Install and configure", "Configuration options",
+                       "Troubleshooting", "Scheduler filters", "Networking", "Upgrade"],
+    "releasenotes": ["New Features", "Upgrade Notes", "Bug Fixes", "Deprecation Notes",
+                     "Security Issues", "Known Issues"],
+    "admin_docs": ["Live migration", "Cells", "Quotas", "Compute nodes", "Evacuate",
+                   "Resource tracking"],
+}
+
+# Common words of the corpus; the tail is generated identifiers
+WORDS = """
+the a to of and in is for on with that be by this as are from or can an it not if when
+instance server host compute node scheduler api service request volume network port
+subnet router flavor image quota project user token policy database migration cell
+conductor placement allocation resource provider inventory trait aggregate zone
+hypervisor libvirt qemu kvm driver agent ovs ovn bridge interface dhcp metadata
+security group rule firewall floating ip address snapshot backup attach detach boot
+rebuild resize evacuate shelve unshelve reboot delete create update list show
+error failed failure exception timeout warning debug traceback refused denied invalid
+config option default value set enable disable deprecated removed added fixed support
+upgrade release version microversion endpoint catalog region keystone nova neutron
+cinder glance octavia swift heat rabbitmq oslo messaging rpc queue worker process
+log file path directory permission memory cpu disk numa pinning pci sriov vgpu
+state status active error build shutoff paused suspended pending available in-use
+""".split()
+
+TAIL_WORDS = 50_000
+
+GITHUB_REPOS = ["openstack/nova", "openstack/neutron", "openstack/cinder", "openstack/placement"]
+CODE_REPOS = ["nova", "neutron"]
+
+
+def _weights(table: dict):
+    names = list(table)
+    p = np.array([table[n] for n in names], dtype=np.float64)
+    return names, p / p.sum()
+
+
+class ChunkGenerator:
+    """Deterministic stream of synthetic chunks (same seed, same corpus)."""
+
+    def __init__(self, seed: int = SEED, mean_words: int = 110):
+        self.rng = np.random.default_rng(seed)
+        self.mean_words = mean_words
+        tail = [f"{w}_{i}" for i, w in zip(range(TAIL_WORDS), np.resize(WORDS, TAIL_WORDS))]
+        self.vocab = np.array(WORDS + tail, dtype=object)
+        self.sources, self.source_p = _weights(SOURCES)
+        self.services, self.service_p = _weights(SERVICES)
+
+    def words(self, n: int) -> np.ndarray:
+        # Zipf over the vocabulary: common words dominate, identifiers form
+        # the tail (ranks past its end wrap around rather than pile up)
+        ranks = self.rng.zipf(1.3, n) - 1
+        return self.vocab[ranks % len(self.vocab)]
+
+    def texts(self, n: int) -> list[str]:
+        lengths = np.clip(self.rng.lognormal(np.log(self.mean_words), 0.5, n), 20, 400).astype(int)
+        words = self.words(int(lengths.sum()))
+        ends = np.cumsum(lengths)
+        return [" ".join(words[end - length:end]) for end, length in zip(ends, lengths)]
+
+    def chunks(self, n: int, start: int = 0):
+        """``n`` chunks with ids start..start+n-1, generated in blocks."""
+        for block_start in range(start, start + n, BLOCK):
+            size = min(BLOCK, start + n - block_start)
+            sources = self.rng.choice(len(self.sources), size, p=self.source_p)
+            services = self.rng.choice(len(self.services), size, p=self.service_p)
+            texts = self.texts(size)
+            picks = self.rng.integers(0, 1 << 30, size)
+
+            for i in range(size):
+                yield self.chunk(block_start + i, self.sources[sources[i]],
+                                 self.services[services[i]], texts[i], int(picks[i]))
+
+    def chunk(self, i: int, source: str, service: str, text: str, pick: int) -> dict:
+        chunk = {
+            "id": f"syn-{i:09d}",
+            "source": source,
+            "service": service,
+            "version": VERSIONS[pick % len(VERSIONS)],
+            "url": None,
+            "heading": None,
+            "text": text,
+        }
+
+        if source == "github":
+            repo = GITHUB_REPOS[pick % len(GITHUB_REPOS)]
+            chunk.update({
+                "repo": repo,
+                "service": repo.split("/")[-1],
+                "type": "issue" if pick % 3 else "pull",
+                "labels": ["bug"] if pick % 2 else [],
+                "url": f"https://github.com/{repo}/issues/{i}",
+            })
+        elif source == "code":
+            repo = CODE_REPOS[pick % len(CODE_REPOS)]
+            path = f"{repo}/{self.vocab[pick % len(WORDS)]}/module_{pick % 997}.py"
+            chunk.update({"repo": repo, "service": None, "file_path": path,
+                          "heading": Path(path).name})
+        else:
+            headings = HEADINGS[source]
+            chunk["heading"] = headings[pick % len(headings)]
+            chunk["url"] = f"https://docs.openstack.org/{service}/latest/page{pick % 5000}.html"
+
+        return chunk
+
+
+def plant_golden(gen: ChunkGenerator, golden: list[dict], start: int, per_query: int):
+    """
+    Chunks that answer the golden queries: the query wording, one match
+    phrase and the expected service, padded with corpus text.
+    Returns (chunks, golden entries with their relevant ids).
+    """
+    chunks, entries = [], []
+    i = start
+    for entry in golden:
+        match = entry["match"]
+        relevant = []
+        for j in range(per_query):
+            phrase = match["phrases"][j % len(match["phrases"])]
+            text = f"{entry['query']}. {phrase}. " + gen.texts(1)[0]
+            source = "github" if j % 3 == 0 else "openstack_docs"
+            chunk = gen.chunk(i, source, match.get("service") or "nova", text, j)
+            if source == "github":
+                chunk["service"] = match.get("service") or chunk["service"]
+            chunk["heading"] = chunk["heading"] or phrase
+            chunks.append(chunk)
+            relevant.append(chunk["id"])
+            i += 1
+        entries.append({**entry, "relevant": relevant})
+    return chunks, entries
+
+
+def generate(n_chunks: int, output: Path, seed: int = SEED, per_query: int | None = None) -> dict:
+    """
+    Write ``n_chunks`` chunks (planted golden ones included) to
+    output/data/processed/chunks/synthetic.jsonl and the golden set with
+    relevant ids to output/golden.json. Memory stays flat in n_chunks.
+    """
+    started = time.perf_counter()
+    golden = json.loads(GOLDEN_FILE.read_text())
+    per_query = per_query or int(np.clip(n_chunks // 20_000, 5, 50))
+
+    gen = ChunkGenerator(seed)
+    n_filler = max(n_chunks - per_query * len(golden), 0)
+    planted, entries = plant_golden(gen, golden, n_filler, per_query)
+
+    path = output / CHUNKS_FILE
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("w", encoding="utf-8") as f:
+        for chunk in gen.chunks(n_filler):
+            f.write(json.dumps(chunk) + "\n")
+        for chunk in planted:
+            f.write(json.dumps(chunk) + "\n")
+
+    (output / CORPUS_GOLDEN_FILE).write_text(json.dumps(entries, indent=2))
+
+    summary = {
+        "chunks": n_filler + len(planted),
+        "planted": len(planted),
+        "seed": seed,
+        "bytes": path.stat().st_size,
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+    print(f"✔ Wrote {summary['chunks']} synthetic chunks → {path}")
+    return summary
+
+
+def queries(n: int, seed: int = SEED) -> list[str]:
+    """Symptom-like queries drawn from the corpus vocabulary."""
+    gen = ChunkGenerator(seed + 1)
+    services = list(SERVICES)
+    out = []
+    for i in range(n):
+        words = " ".join(gen.words(int(gen.rng.integers(3, 9))))
+        out.append(f"{services[i % len(services)]} {words}")
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=int, required=True, help="Corpus size (e.g. 10000 to 10000000)")
+    parser.add_argument("--output", required=True, help="Benchmark working directory")
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--per-query", type=int, help="Relevant chunks planted per golden query")
+    args = parser.parse_args()
+
+    generate(args.chunks, Path(args.output), args.seed, args.per_query)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,358 @@
+#!/usr/bin/env python3
+
+"""
+Retrieval benchmark.
+
+Builds an index over a synthetic corpus (bench.corpus) of the requested
+size and measures:
+
+    build           wall time, embedding throughput, index size
+    latency_ms      p50/p95/p99 of rag.search.search() and
+                    agents.tools.search_docs(), with the query embedding
+                    cache off ("uncached") and on ("cached")
+    throughput_qps  search_many() over batches of queries
+    recall          recall@k and hit@k of the golden queries
+
+and writes them as JSON, so runs can be compared (bench.compare). Each
+corpus size gets its own working directory with the usual data/ layout;
+the corpus and index are reused by later runs unless --regenerate /
+--rebuild are given.
+
+Usage:
+    python -m bench.run --chunks 100000 --output bench/results/100k.json
+    python -m bench.run --chunks 1000000 --index-type ivf-pq --backend onnx-int8 \
+        --baseline bench/results/1m.json
+    python -m bench.run --index data/processed/index     (queries only, real index)
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+
+from bench import compare, corpus
+from rag import ann, shards, snapshots
+from rag.backends import BACKENDS, DEFAULT_BACKEND
+from rag.meta_store import MetaStore
+
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+WORK_ROOT = Path("data/bench")
+
+N_QUERIES = 200
+BATCH_SIZE = 32
+K = 10
+
+
+def _size_name(n: int) -> str:
+    for suffix, unit in (("m", 1_000_000), ("k", 1_000)):
+        if n >= unit and n % unit == 0:
+            return f"{n // unit}{suffix}"
+    return str(n)
+
+
+# ---------------------------------------------------------
+# Build
+# ---------------------------------------------------------
+
+def build(workdir: Path, args) -> dict:
+    """
+    Run rag.index in ``workdir`` as a subprocess, so the benchmark
+    measures the real build (process pool, memory) rather than a copy.
+    """
+    # A cold embedding cache: otherwise a rebuild measures cache reads
+    shutil.rmtree(workdir / "data/processed/embeddings", ignore_errors=True)
+    shutil.rmtree(workdir / snapshots.INDEX_DIR, ignore_errors=True)
+
+    # Exported ONNX models are looked up relative to the working directory
+    models = workdir / "data/models"
+    if (REPO_ROOT / "data/models").exists() and not models.exists():
+        models.symlink_to(REPO_ROOT / "data/models")
+
+    stats_file = workdir / "build_stats.json"
+    cmd = [sys.executable, "-m", "rag.index",
+           "--backend", args.backend, "--index-type", args.index_type,
+           "--shard-by", args.shard_by, "--stats-out", str(stats_file.resolve())]
+    if args.workers is not None:
+        cmd += ["--workers", str(args.workers)]
+
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(REPO_ROOT), env.get("PYTHONPATH")]))
+
+    print(f"[INFO] Building index: {' '.join(cmd[1:])}")
+    started = time.perf_counter()
+    subprocess.run(cmd, cwd=workdir, env=env, check=True)
+    seconds = time.perf_counter() - started
+
+    stats = json.loads(stats_file.read_text())
+    stats["wall_seconds"] = round(seconds, 3)
+    stats["index_bytes"] = sum(s["index_bytes"] for s in stats["shards"].values())
+    return stats
+
+
+# ---------------------------------------------------------
+# Queries
+# ---------------------------------------------------------
+
+def percentiles(samples: list[float]) -> dict:
+    ms = np.asarray(samples) * 1000
+    return {
+        "n": len(ms),
+        "mean": round(float(ms.mean()), 3),
+        "p50": round(float(np.percentile(ms, 50)), 3),
+        "p95": round(float(np.percentile(ms, 95)), 3),
+        "p99": round(float(np.percentile(ms, 99)), 3),
+    }
+
+
+def _flatten(results) -> list[dict]:
+    """search_docs() returns a dict of per-service lists for multi-service queries."""
+    if isinstance(results, dict):
+        results = [r for hits in results.values() for r in hits]
+        results.sort(key=lambda r: r["score"], reverse=True)
+    return results
+
+
+def timed(fn, queries: list[str], repeat: int) -> list[float]:
+    samples = []
+    for _ in range(repeat):
+        for q in queries:
+            started = time.perf_counter()
+            fn(q)
+            samples.append(time.perf_counter() - started)
+    return samples
+
+
+def latency(queries: list[str], k: int, repeat: int) -> dict:
+    from agents.tools import search_docs
+    from rag import search
+
+    def run_search(q):
+        search.search(q, k=k)
+
+    def run_search_docs(q):
+        # search_docs prints its service scores
+        with contextlib.redirect_stdout(io.StringIO()):
+            search_docs(q, k=k)
+
+    out = {}
+    cache = search._store.query_cache
+    for name, fn in (("search", run_search), ("search_docs", run_search_docs)):
+        # Every query pays for its embedding ...
+        search._store.query_cache = search.QueryEmbeddingCache(maxsize=0)
+        out[f"{name}.uncached"] = percentiles(timed(fn, queries, repeat))
+
+        # ... or none does (the first pass fills the cache)
+        search._store.query_cache = search.QueryEmbeddingCache()
+        timed(fn, queries, 1)
+        out[f"{name}.cached"] = percentiles(timed(fn, queries, repeat))
+    search._store.query_cache = cache
+    return out
+
+
+def throughput(queries: list[str], k: int, batch_size: int) -> dict:
+    from rag import search
+
+    search._store.query_cache = search.QueryEmbeddingCache(maxsize=0)
+    started = time.perf_counter()
+    for i in range(0, len(queries), batch_size):
+        search.search_many(queries[i:i + batch_size], k=k)
+    seconds = time.perf_counter() - started
+    search._store.query_cache = search.QueryEmbeddingCache()
+
+    return {f"search_many.batch{batch_size}": round(len(queries) / seconds, 1)}
+
+
+# ---------------------------------------------------------
+# Recall
+# ---------------------------------------------------------
+
+def relevant_ids(index_dir: Path, golden: list[dict]) -> list[dict]:
+    """
+    Relevant sets for a real index: chunks of the expected service whose
+    text or heading contains one of the match phrases (case-insensitive).
+    Scans every shard's metadata once.
+    """
+    entries = [{**entry, "relevant": []} for entry in golden]
+    phrases = [[p.lower() for p in e["match"]["phrases"]] for e in entries]
+
+    for root in shards.local_shards(index_dir).values():
+        _, meta_dir, _ = snapshots.layout(snapshots.resolve(root))
+        meta = MetaStore(meta_dir)
+        deleted = set(meta.deleted_rows().tolist())
+        for row, record in enumerate(meta):
+            if row in deleted:
+                continue
+            haystack = f"{record.get('heading') or ''}\n{record.get('text') or ''}".lower()
+            for entry, wanted in zip(entries, phrases):
+                service = entry["match"].get("service")
+                if service and record.get("service") != service:
+                    continue
+                if any(p in haystack for p in wanted):
+                    entry["relevant"].append(record["id"])
+
+    for entry in entries:
+        if not entry["relevant"]:
+            print(f"[WARN] No relevant chunks for golden query {entry['query']!r}")
+    return [e for e in entries if e["relevant"]]
+
+
+def recall(golden: list[dict], k: int) -> tuple[dict, list[dict]]:
+    """Mean recall@k and hit@k of search() and search_docs(), plus per-query recall."""
+    from agents.tools import search_docs
+    from rag import search
+
+    scores = {"search": [], "search_docs": []}
+    hits = {"search": [], "search_docs": []}
+    per_query = []
+
+    for entry in golden:
+        relevant = set(entry["relevant"])
+        with contextlib.redirect_stdout(io.StringIO()):
+            found = {
+                "search": search.search(entry["query"], service=entry.get("service"), k=k),
+                "search_docs": _flatten(search_docs(entry["query"], service=entry.get("service"), k=k)),
+            }
+
+        row = {"query": entry["query"]}
+        for name, results in found.items():
+            ids = {r.get("id") for r in results[:k]}
+            score = len(ids & relevant) / min(k, len(relevant))
+            scores[name].append(score)
+            hits[name].append(float(bool(ids & relevant)))
+            row[name] = round(score, 3)
+        per_query.append(row)
+
+    out = {}
+    for name in scores:
+        out[f"{name}@{k}"] = {
+            "mean": round(float(np.mean(scores[name])), 4),
+            "hit_rate": round(float(np.mean(hits[name])), 4),
+        }
+    return out, per_query
+
+
+# ---------------------------------------------------------
+# Main
+# ---------------------------------------------------------
+
+def environment(args) -> dict:
+    import faiss
+
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+                                capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "faiss": faiss.__version__,
+        "numpy": np.__version__,
+        "backend": args.backend,
+    }
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--chunks", type=int, help="Synthetic corpus size (10000 to 10000000)")
+    target.add_argument("--index", help="Benchmark queries against an existing index directory")
+    parser.add_argument("--workdir", help="Corpus and index directory (default: data/bench/<size>)")
+    parser.add_argument("--seed", type=int, default=corpus.SEED)
+    parser.add_argument("--backend", default=DEFAULT_BACKEND, choices=BACKENDS)
+    parser.add_argument("--workers", type=int, help="Embedding worker processes")
+    parser.add_argument("--index-type", default="flat", choices=ann.INDEX_TYPES)
+    parser.add_argument("--shard-by", default="none", choices=shards.SHARD_BY)
+    parser.add_argument("--regenerate", action="store_true", help="Regenerate the corpus")
+    parser.add_argument("--rebuild", action="store_true", help="Rebuild the index even if one exists")
+    parser.add_argument("--queries", type=int, default=N_QUERIES, help="Latency queries")
+    parser.add_argument("--repeat", type=int, default=1, help="Passes over the latency queries")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="search_many() batch size")
+    parser.add_argument("-k", type=int, default=K)
+    parser.add_argument("--output", help="Results JSON (default: <workdir>/results.json)")
+    parser.add_argument("--baseline", help="Compare against this results JSON; exit 1 on regressions")
+    parser.add_argument("--tolerance", type=float, default=compare.DEFAULT_TOLERANCE)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    from rag import search
+
+    results = {"environment": environment(args), "k": args.k}
+
+    if args.index:
+        index_dir = Path(args.index)
+        output = Path(args.output or "bench_results.json")
+        golden = relevant_ids(index_dir, json.loads(corpus.GOLDEN_FILE.read_text()))
+        results["corpus"] = {"index": str(index_dir)}
+    else:
+        workdir = Path(args.workdir or WORK_ROOT / _size_name(args.chunks))
+        index_dir = workdir / snapshots.INDEX_DIR
+        output = Path(args.output or workdir / "results.json")
+
+        generated = not (workdir / corpus.CHUNKS_FILE).exists() or args.regenerate
+        if generated:
+            results["corpus"] = corpus.generate(args.chunks, workdir, args.seed)
+        else:
+            print(f"[INFO] Reusing corpus in {workdir}")
+            results["corpus"] = {"chunks": args.chunks, "seed": args.seed, "reused": True}
+
+        if generated or args.rebuild or not shards.local_shards(index_dir):
+            results["build"] = build(workdir, args)
+        else:
+            print(f"[INFO] Reusing index in {index_dir} (--rebuild to rebuild)")
+        golden = json.loads((workdir / corpus.CORPUS_GOLDEN_FILE).read_text())
+
+    search._store = search.IndexStore(index_dir, backend=args.backend)
+    started = time.perf_counter()
+    search.warm_up()
+    results["load_seconds"] = round(time.perf_counter() - started, 3)
+    results["shards"] = search.snapshot_info()
+
+    queries = corpus.queries(args.queries, args.seed)
+    print(f"[INFO] Timing {len(queries)} queries × {args.repeat}")
+    results["latency_ms"] = latency(queries, args.k, args.repeat)
+    results["throughput_qps"] = throughput(queries, args.k, args.batch_size)
+    print(f"[INFO] Scoring {len(golden)} golden queries")
+    results["recall"], results["recall_per_query"] = recall(golden, args.k)
+
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2))
+
+    if "build" in results:
+        b = results["build"]
+        print(f"Build: {b['wall_seconds']}s, {b['embedding']['chunks_per_s']} chunks/s, "
+              f"{b['index_bytes'] / 1e6:.1f} MB")
+    for name, stats in results["latency_ms"].items():
+        print(f"{name:<22} p50={stats['p50']}ms p95={stats['p95']}ms p99={stats['p99']}ms")
+    for name, qps in results["throughput_qps"].items():
+        print(f"{name:<22} {qps} queries/s")
+    for name, stats in results["recall"].items():
+        print(f"recall {name:<15} {stats['mean']} (hit rate {stats['hit_rate']})")
+    print(f"✔ Results → {output}")
+
+    if args.baseline:
+        rows = compare.compare(json.loads(Path(args.baseline).read_text()), results, args.tolerance)
+        compare.print_report(rows)
+        if any(row["regressed"] for row in rows):
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,42 @@
 import argparse
-from agents.react_agent import ReActAgent
+import os
+
+DEFAULT_SERVER = "http://127.0.0.1:8765"
+
+
+def run_remote(server: str, args):
+    """
+    Ask a running server.py. Returns (result, trace), or None when no
+    server is reachable so the caller can fall back to in-process mode.
+    """
+    import requests
+
+    try:
+        resp = requests.post(
+            f"{server.rstrip('/')}/run",
+            json={
+                "symptom": args.symptom,
+                "service": args.service,
+                "llm": args.llm,
+                "debug": args.debug,
+            },
+            timeout=(1, 600),
+        )
+    except requests.ConnectionError:
+        return None
+
+    resp.raise_for_status()
+    data = resp.json()
+    return data["result"], data["trace"]
+
+
+def run_local(args):
+    # Imported lazily so --help and server mode never touch the index stack
+    from agents.react_agent import ReActAgent
+
+    # agent = ReActAgent(model=args.llm)
+    agent = ReActAgent(model=args.llm, debug=args.debug)
+    return agent.run(args.symptom, args.service)
 
 
 def main():
@@ -9,12 +46,20 @@ def main():
     parser.add_argument("--service", required=False)
     parser.add_argument("--llm", required=False)
     parser.add_argument("--debug", action="store_true")
+    parser.add_argument("--server", default=os.getenv("TROUBLESHOOTER_SERVER", DEFAULT_SERVER),
+                        help="Retrieval server started with server.py")
+    parser.add_argument("--local", action="store_true",
+                        help="Run in-process instead of asking the server")
 
     args = parser.parse_args()
 
-    # agent = ReActAgent(model=args.llm)
-    agent = ReActAgent(model=args.llm, debug=args.debug)
-    result, trace = agent.run(args.symptom, args.service)
+    outcome = None if args.local else run_remote(args.server, args)
+    if outcome is None:
+        if not args.local:
+            print(f"[INFO] No server at {args.server}, running in-process")
+        outcome = run_local(args)
+
+    result, trace = outcome
 
     print("\n=== TRACE ===")
     for t in trace:
@@ -0,0 +1,211 @@
+"""
+Pooled HTTP client shared by the fetchers and the LLM client.
+
+An HttpClient wraps one requests.Session, so connections to a host are
+kept alive and reused instead of paying a TCP/TLS handshake per request,
+and responses are gzip-compressed where the server supports it. On top
+of that it adds what every caller used to do differently, or not at all:
+
+- at most ``per_host`` requests in flight per host
+- (connect, read) timeouts on every request
+- retries with exponential backoff and full jitter. Idempotent requests
+  are retried on connection errors, timeouts and RETRY_STATUSES
+  (honouring Retry-After). Others (e.g. a POST to the LLM) only when the
+  connection could not be made, so nothing is ever sent twice
+- per-host metrics: requests, retries, errors, bytes and latency
+  percentiles (see metrics())
+
+Responses are returned as they are, including 4xx/5xx once retries are
+used up; callers decide with raise_for_status() or their own handling.
+
+shared() is the process-wide client, used by llm.ollama and reported by
+server.py's /health. Fetchers with their own pool size create their own.
+"""
+
+import random
+import threading
+import time
+from collections import deque
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import ConnectTimeoutError, MaxRetryError, NewConnectionError
+
+
+# Connections kept per host, and requests allowed in flight per host
+POOL_SIZE = 8
+PER_HOST = 8
+
+# (connect, read) seconds
+TIMEOUT = (5, 60)
+
+RETRIES = 3
+BACKOFF = 0.5
+MAX_BACKOFF = 30.0
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+IDEMPOTENT_METHODS = ("GET", "HEAD", "OPTIONS", "PUT", "DELETE")
+
+# Latencies kept per host for the percentiles
+LATENCY_WINDOW = 1024
+
+
+class HostMetrics:
+    def __init__(self):
+        self.requests = 0
+        self.retries = 0
+        self.errors = 0
+        self.bytes = 0
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+
+    def to_dict(self) -> dict:
+        out = {
+            "requests": self.requests,
+            "retries": self.retries,
+            "errors": self.errors,
+            "bytes": self.bytes,
+        }
+        if self.latencies:
+            ms = sorted(latency * 1000 for latency in self.latencies)
+            out["latency_ms"] = {
+                "mean": round(sum(ms) / len(ms), 1),
+                "p50": round(ms[(len(ms) - 1) // 2], 1),
+                "p95": round(ms[int(0.95 * (len(ms) - 1))], 1),
+                "max": round(ms[-1], 1),
+            }
+        return out
+
+
+class HttpClient:
+    def __init__(self, pool_size: int = POOL_SIZE, per_host: int = PER_HOST,
+                 timeout=TIMEOUT, retries: int = RETRIES, backoff: float = BACKOFF,
+                 retry_statuses=RETRY_STATUSES, headers: dict | None = None):
+        self.per_host = per_host
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.retry_statuses = tuple(retry_statuses)
+
+        self.session = requests.Session()
+        self.session.headers.update({"Accept-Encoding": "gzip, deflate"})
+        self.session.headers.update(headers or {})
+        adapter = HTTPAdapter(pool_connections=8, pool_maxsize=max(pool_size, per_host))
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self._slots = {}
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def close(self):
+        self.session.close()
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def request(self, method: str, url: str, *, timeout=None, retries: int | None = None,
+                idempotent: bool | None = None, throttle=None, **kwargs) -> requests.Response:
+        """
+        Send a request, retrying as described above. ``idempotent``
+        defaults by method; POSTs that are safe to repeat (e.g. GraphQL
+        queries) can pass True. ``throttle`` is called before every
+        attempt, e.g. to wait for a rate limit budget. Other arguments
+        go to requests.Session.request.
+        """
+        host = urlsplit(url).netloc
+        slots, metrics = self._host(host)
+        retries = self.retries if retries is None else retries
+        if idempotent is None:
+            idempotent = method.upper() in IDEMPOTENT_METHODS
+
+        attempt = 0
+        while True:
+            if throttle is not None:
+                throttle()
+
+            started = time.perf_counter()
+            try:
+                with slots:
+                    response = self.session.request(method, url, timeout=timeout or self.timeout, **kwargs)
+                    body = response.content
+            except (requests.ConnectionError, requests.Timeout) as e:
+                retryable = idempotent or not_sent(e)
+                with self._lock:
+                    metrics.requests += 1
+                    if not retryable or attempt >= retries:
+                        metrics.errors += 1
+                    else:
+                        metrics.retries += 1
+                if not retryable or attempt >= retries:
+                    raise
+                attempt += 1
+                time.sleep(self._backoff(attempt))
+                continue
+
+            elapsed = time.perf_counter() - started
+            retry = idempotent and response.status_code in self.retry_statuses and attempt < retries
+            with self._lock:
+                metrics.requests += 1
+                metrics.bytes += len(body)
+                metrics.latencies.append(elapsed)
+                if retry:
+                    metrics.retries += 1
+                elif response.status_code >= 500:
+                    metrics.errors += 1
+
+            if not retry:
+                return response
+
+            attempt += 1
+            time.sleep(self._backoff(attempt, response.headers.get("Retry-After")))
+
+    def _host(self, host: str):
+        with self._lock:
+            if host not in self._slots:
+                self._slots[host] = threading.BoundedSemaphore(self.per_host)
+                self._metrics[host] = HostMetrics()
+            return self._slots[host], self._metrics[host]
+
+    def _backoff(self, attempt: int, retry_after: str | None = None) -> float:
+        if retry_after:
+            try:
+                return min(float(retry_after), MAX_BACKOFF)
+            except ValueError:
+                pass
+        # Full jitter: concurrent clients don't retry in lockstep
+        return random.uniform(0, min(self.backoff * 2 ** attempt, MAX_BACKOFF))
+
+    def metrics(self) -> dict:
+        """Per-host request counts, bytes and latency percentiles."""
+        with self._lock:
+            return {host: m.to_dict() for host, m in self._metrics.items()}
+
+
+def not_sent(error: Exception) -> bool:
+    """Whether a request failed while connecting, before anything was sent."""
+    if isinstance(error, requests.ConnectTimeout):
+        return True
+    if not isinstance(error, requests.ConnectionError):
+        return False
+    # Reset or closed connections after sending come as a bare ProtocolError
+    cause = error.args[0] if error.args else None
+    if isinstance(cause, MaxRetryError):
+        cause = cause.reason
+    return isinstance(cause, (NewConnectionError, ConnectTimeoutError))
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def shared() -> HttpClient:
+    """The process-wide client."""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = HttpClient()
+        return _shared
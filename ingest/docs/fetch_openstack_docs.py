@@ -1,5 +1,4 @@
 import shutil
-import requests
 from bs4 import BeautifulSoup
 from pathlib import Path
 import subprocess
@@ -7,6 +6,8 @@ import sys
 import time
 from urllib.parse import urljoin
 
+from common.http_client import HttpClient
+
 VERSION = "2025.2"
 BASE_URL = "https://docs.openstack.org"
 OUT_ROOT = Path("data/raw/openstack_docs") / VERSION
@@ -74,14 +75,14 @@ def html_to_markdown(html_path: Path, md_path: Path):
     )
 
 
-def fetch_service(service: str):
+def fetch_service(service: str, http: HttpClient):
     print(f"\n==> Fetching {service} ({VERSION})")
 
     service_root = OUT_ROOT / service
     service_root.mkdir(parents=True, exist_ok=True)
 
     index_url = f"{BASE_URL}/{service}/{VERSION}/"
-    r = requests.get(index_url, headers=HEADERS, timeout=30)
+    r = http.get(index_url)
     r.raise_for_status()
 
     soup = BeautifulSoup(r.text, "html.parser")
@@ -110,7 +111,7 @@ def fetch_service(service: str):
             continue
 
         try:
-            resp = requests.get(url, headers=HEADERS, timeout=30)
+            resp = http.get(url)
             resp.raise_for_status()
             html_file.write_text(resp.text, encoding="utf-8")
 
@@ -139,8 +140,15 @@ def main():
     ensure_pandoc()
     OUT_ROOT.mkdir(parents=True, exist_ok=True)
 
-    for service in SERVICES:
-        fetch_service(service)
+    # One keep-alive connection to the docs site for every page
+    http = HttpClient(pool_size=1, per_host=1, headers=HEADERS)
+    try:
+        for service in SERVICES:
+            fetch_service(service, http)
+    finally:
+        http.close()
+
+    print(f"\nHTTP: {http.metrics()}")
 
 
 if __name__ == "__main__":
@@ -11,48 +11,247 @@ Features:
 - Issue vs PR detection
 - Normalized JSONL output
 - Framework-agnostic metadata
+- Concurrent comment fetching on pooled connections (common.http_client)
+- One rate-limit budget shared by all workers and repos
+
+Comments are fetched by a pool of workers (--workers) while issue pages
+are still being listed; issues without comments cost no request. Every
+request first takes a slot from a RateBudget, which follows the
+X-RateLimit-Remaining / X-RateLimit-Reset headers and, when the
+requests still planned exceed the remaining budget, spaces them so the
+budget lasts until the reset instead of running dry and stalling.
+
+Issues are written as their comments arrive, with at most about a page
+in memory, and progress is checkpointed next to the output (see
+Checkpoint). Rerunning an interrupted fetch with the same arguments
+resumes where it stopped; --restart starts over.
+
+With --sync only what changed since the previous sync is fetched and
+written: the listing asks for issues updated since then, comments are
+re-fetched only for issues whose updated_at or comment count moved, and
+every listing page seen before is requested with If-None-Match, so
+unchanged ones come back as 304s that cost no rate limit. The output is
+a delta that ingest.github.index_github upserts, marked as such by an
+<output>.delta file next to it. Per-repo state (see SyncState) is kept
+in --sync-dir and only saved after a complete run. Issues that are
+deleted or transferred do not show up in a delta.
+
+With --api graphql, issues and PRs are listed through the GraphQL API
+together with their labels and first comments, 100 per request (see
+GraphQLFetcher); only long threads take extra REST requests. The
+records written are the same as with REST.
 
 Usage:
-    python fetch_issues.py --repo openstack/nova --output data/raw/github_nova.jsonl
+    python -m ingest.github.fetch_issues --repo openstack/nova --output data/raw/github_nova.jsonl
+    python -m ingest.github.fetch_issues --repo openstack/nova --api graphql --output data/raw/github_nova.jsonl
+    python -m ingest.github.fetch_issues --repo openstack/nova --repo openstack/neutron \
+        --output "data/raw/github_{repo}.jsonl" --workers 16
+    python -m ingest.github.fetch_issues --repo openstack/nova --sync --output data/raw/github_nova_delta.jsonl
+
+Against a local stand-in API (see ingest.github.stub_server):
+    GITHUB_TOKEN=test python -m ingest.github.fetch_issues --api-url http://127.0.0.1:8780 ...
 """
 
 import os
 import time
 import argparse
+import heapq
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from urllib.parse import urlencode
+
 import requests
 from typing import Dict, List, Optional
 
+from common.http_client import HttpClient
+
 
-GITHUB_API = "https://api.github.com"
+GITHUB_API = os.getenv("GITHUB_API_URL", "https://api.github.com")
 PER_PAGE = 100
 
+WORKERS = 8
+TIMEOUT = 30
+RETRIES = 3
+SERVER_ERRORS = (500, 502, 503, 504)
+
+# Requests left untouched for other tools sharing the token
+RESERVE = 50
+
+# Issues whose comments may be in flight per repo: about a page, which
+# bounds memory and how much a resumed fetch repeats
+MAX_PENDING = PER_PAGE
+
+SYNC_DIR = Path("data/raw/github_sync")
+
+# GraphQL listing: issues per request, and comments fetched along with
+# each issue; longer threads get their comments from REST
+GRAPHQL_PAGE = 100
+GRAPHQL_COMMENTS = 50
+
+GRAPHQL_QUERY = """
+query($owner: String!, $name: String!, $first: Int!, $after: String, $comments: Int!, $states: [%(state_type)s!]) {
+  repository(owner: $owner, name: $name) {
+    items: %(connection)s(first: $first, after: $after, states: $states,
+                          orderBy: {field: CREATED_AT, direction: DESC}) {
+      pageInfo { hasNextPage endCursor }
+      nodes {
+        number title body state createdAt updatedAt url
+        labels(first: 100) { nodes { name } }
+        comments(first: $comments) { totalCount nodes { body } }
+      }
+    }
+  }
+}
+"""
+
+# --state values as GraphQL state filters (None: all)
+GRAPHQL_STATES = {
+    "issues": {"open": ["OPEN"], "closed": ["CLOSED"]},
+    "pullRequests": {"open": ["OPEN"], "closed": ["CLOSED", "MERGED"]},
+}
+
+
+# ------------------------------------------------------------
+# Rate limit budget
+# ------------------------------------------------------------
+
+class RateBudget:
+    """
+    Request budget of one token, shared by every worker and repo.
+
+    Each response's X-RateLimit-Remaining / X-RateLimit-Reset headers
+    update it. While the requests still planned (see plan()) fit into
+    the remaining budget, requests go out unthrottled; otherwise they
+    are spaced evenly until the reset. With the budget used up, every
+    worker waits for the reset.
+    """
+
+    def __init__(self, reserve: int = RESERVE):
+        self.reserve = reserve
+        self.remaining = None
+        self.reset = 0.0
+        self.planned = 0
+
+        self.requests = 0
+        self.waited = 0.0
+
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def plan(self, n: int = 1):
+        """Announce ``n`` upcoming requests."""
+        with self._lock:
+            self.planned += n
+
+    def acquire(self):
+        """Block until the next request may be sent."""
+        with self._lock:
+            now = time.time()
+            interval = 0.0
+            if self.remaining is not None and now < self.reset:
+                usable = self.remaining - self.reserve
+                if usable <= 0:
+                    # Spent: nobody sends before the window resets
+                    self._next = max(self._next, self.reset + 1)
+                    self.remaining = None
+                elif self.planned > usable:
+                    interval = (self.reset - now) / usable
+                self.remaining = None if self.remaining is None else self.remaining - 1
+
+            start = max(now, self._next)
+            self._next = start + interval
+            self.planned = max(self.planned - 1, 0)
+            self.requests += 1
+            wait = start - now
+            self.waited += wait
+
+        if wait > 0:
+            if wait > 5:
+                print(f"[Rate Limit] Waiting {wait:.0f} seconds...")
+            time.sleep(wait)
+
+    def update(self, headers):
+        """Take the budget from a response's rate limit headers."""
+        if "X-RateLimit-Remaining" not in headers:
+            return
+        remaining = int(headers["X-RateLimit-Remaining"])
+        reset = float(headers.get("X-RateLimit-Reset", time.time()))
+        with self._lock:
+            # Responses of concurrent requests arrive out of order
+            if reset == self.reset and self.remaining is not None:
+                remaining = min(remaining, self.remaining)
+            self.remaining, self.reset = remaining, reset
+
+    def pause(self, seconds: float):
+        """Hold back every worker, e.g. after a secondary rate limit."""
+        with self._lock:
+            self._next = max(self._next, time.time() + seconds)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "waited_s_total": round(self.waited, 1),
+                "remaining": self.remaining,
+            }
+
 
 class GitHubFetcher:
-    def __init__(self, token: Optional[str] = None):
+    def __init__(self, token: Optional[str] = None, api_url: str = GITHUB_API,
+                 workers: int = WORKERS, budget: Optional[RateBudget] = None):
         self.token = token or os.getenv("GITHUB_TOKEN")
         if not self.token:
             raise ValueError("GITHUB_TOKEN environment variable is required.")
 
+        self.api_url = api_url.rstrip("/")
         self.headers = {
             "Authorization": f"Bearer {self.token}",
             "Accept": "application/vnd.github+json",
         }
 
+        # Keep-alive connections, one per worker. Rate limit responses
+        # are handled in _request, so a pause holds back every worker.
+        self.http = HttpClient(pool_size=workers, per_host=workers, timeout=TIMEOUT, retries=RETRIES,
+                               retry_statuses=SERVER_ERRORS, headers=self.headers)
+
+        self.budget = budget or RateBudget()
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="github")
+
+    def close(self):
+        self.pool.shutdown()
+        self.http.close()
+
+    def stats(self) -> dict:
+        return self.budget.stats()
+
     # --------------------------------------------------------
     # Core request wrapper with rate limit handling
     # --------------------------------------------------------
 
-    def _get(self, url: str, params: Optional[Dict] = None) -> requests.Response:
+    def _get(self, url: str, params: Optional[Dict] = None, etag: Optional[str] = None) -> requests.Response:
+        """GET with retries; with ``etag``, a 304 response means unchanged."""
+        headers = {"If-None-Match": etag} if etag else None
+        return self._request("GET", url, self.budget, params=params, headers=headers)
+
+    def _request(self, method: str, url: str, budget: RateBudget, **kwargs) -> requests.Response:
+        """Request through the budget; connection errors and 5xx are retried by the client."""
         while True:
-            response = requests.get(url, headers=self.headers, params=params)
-
-            if response.status_code == 403:
-                remaining = int(response.headers.get("X-RateLimit-Remaining", 0))
-                if remaining == 0:
-                    reset_time = int(response.headers.get("X-RateLimit-Reset", time.time()))
-                    sleep_seconds = max(reset_time - int(time.time()), 5)
-                    print(f"[Rate Limit] Sleeping {sleep_seconds} seconds...")
-                    time.sleep(sleep_seconds)
+            response = self.http.request(method, url, throttle=budget.acquire, **kwargs)
+            budget.update(response.headers)
+
+            if response.status_code in (403, 429):
+                if response.headers.get("X-RateLimit-Remaining") == "0":
+                    # acquire() now waits for the reset
+                    budget.plan()
+                    continue
+                retry_after = response.headers.get("Retry-After")
+                if retry_after:
+                    # Secondary rate limit
+                    print(f"[Rate Limit] Retry after {retry_after} seconds")
+                    budget.pause(float(retry_after))
+                    budget.plan()
                     continue
 
             response.raise_for_status()
@@ -62,55 +261,476 @@ class GitHubFetcher:
     # Fetch issues + PRs
     # --------------------------------------------------------
 
-    def fetch_issues(self, repo: str, state: str = "all") -> List[Dict]:
+    def iter_issue_pages(self, repo: str, state: str = "all", since: Optional[str] = None,
+                         etags: Optional[Dict] = None, start_page: int = 1):
+        """
+        Yield the repo's issues and PRs page by page, from
+        ``start_page``; with ``since``, only those updated since then,
+        oldest update first.
+
+        ``etags`` maps page queries to {"etag", "n"} of an earlier
+        listing. Pages answered 304 are skipped; the dict is updated in
+        place to describe this listing.
+        """
         owner, name = repo.split("/")
-        url = f"{GITHUB_API}/repos/{owner}/{name}/issues"
+        url = f"{self.api_url}/repos/{owner}/{name}/issues"
 
-        page = 1
-        all_items = []
+        previous = dict(etags or {})
+        if etags is not None:
+            etags.clear()
 
+        page = start_page
         while True:
             params = {
                 "state": state,
                 "per_page": PER_PAGE,
                 "page": page,
             }
-
-            response = self._get(url, params=params)
-            data = response.json()
-
-            if not data:
+            if since:
+                params.update(since=since, sort="updated", direction="asc")
+
+            key = urlencode(params)
+            old = previous.get(key)
+
+            self.budget.plan()
+            response = self._get(url, params=params, etag=old and old["etag"])
+
+            if response.status_code == 304:
+                print(f"[INFO] {repo}: page {page} unchanged")
+                n = old["n"]
+                if etags is not None:
+                    etags[key] = old
+            else:
+                data = response.json()
+                n = len(data)
+                if etags is not None and response.headers.get("ETag"):
+                    etags[key] = {"etag": response.headers["ETag"], "n": n}
+                if not data:
+                    break
+
+                print(f"[INFO] {repo}: retrieved page {page} ({n} items)")
+                yield data
+
+            if n < PER_PAGE:
                 break
-
-            all_items.extend(data)
-            print(f"[INFO] Retrieved page {page} ({len(data)} items)")
             page += 1
 
-        return all_items
+    def fetch_issues(self, repo: str, state: str = "all") -> List[Dict]:
+        return [issue for page in self.iter_issue_pages(repo, state) for issue in page]
 
     # --------------------------------------------------------
     # Fetch comments for a specific issue
     # --------------------------------------------------------
 
-    def fetch_comments(self, repo: str, issue_number: int) -> List[str]:
+    def fetch_comment_pages(self, repo: str, issue_number: int, count: Optional[int] = None) -> List[Dict]:
+        """
+        An issue's comments as pages of {"n", "bodies"}. ``count`` (the
+        issue's "comments" field) saves the requests for issues without
+        comments.
+        """
+        if count == 0:
+            return []
+
         owner, name = repo.split("/")
-        url = f"{GITHUB_API}/repos/{owner}/{name}/issues/{issue_number}/comments"
+        url = f"{self.api_url}/repos/{owner}/{name}/issues/{issue_number}/comments"
 
-        comments = []
+        pages = []
         page = 1
 
         while True:
             params = {"per_page": PER_PAGE, "page": page}
-            response = self._get(url, params=params)
-            data = response.json()
-
+            if count is None:
+                self.budget.plan()
+            data = self._get(url, params=params).json()
             if not data:
                 break
 
-            comments.extend([c["body"] for c in data if c.get("body")])
+            pages.append({"n": len(data), "bodies": [c["body"] for c in data if c.get("body")]})
+            if len(data) < PER_PAGE:
+                break
+            page += 1
+
+        return pages
+
+    def fetch_comments(self, repo: str, issue_number: int, count: Optional[int] = None) -> List[str]:
+        """Comment bodies of an issue."""
+        return comment_bodies(self.fetch_comment_pages(repo, issue_number, count))
+
+    def submit_comments(self, repo: str, issue: Dict):
+        """Queue an issue's comment pages on the worker pool; returns a future."""
+        count = issue.get("comments")
+        if count:
+            # Pages known up front, so the budget can pace for them
+            self.budget.plan(-(-count // PER_PAGE))
+        return self.pool.submit(self.fetch_comment_pages, repo, issue["number"], count)
+
+    # --------------------------------------------------------
+    # Fetch a whole repo
+    # --------------------------------------------------------
+
+    def fetch_repo(self, repo: str, output: str, state: str = "all", resume: bool = True) -> int:
+        """
+        Write the repo's normalized issues to ``output`` (JSONL), in
+        listing order, while their comments are fetched concurrently.
+        Progress is checkpointed page by page; with ``resume``, an
+        interrupted fetch into the same output carries on from there.
+        Returns the issues in the output.
+        """
+        checkpoint = Checkpoint.open(output, repo, state, "rest", resume)
+        pending = deque()
+
+        with checkpoint.output() as f:
+            def flush(limit):
+                while len(pending) > limit:
+                    page, issue, future = pending.popleft()
+                    normalized = normalize_issue(repo, issue, comment_bodies(future.result()))
+                    f.write(json_dumps_safe(normalized) + "\n")
+                    checkpoint.advance(issue["number"], {"page": page})
+                checkpoint.save(f, force=limit == 0)
+
+            start = checkpoint.resume.get("page", 1)
+            for page, items in enumerate(self.iter_issue_pages(repo, state, start_page=start), start):
+                for issue in items:
+                    if not checkpoint.done(issue):
+                        pending.append((page, issue, self.submit_comments(repo, issue)))
+                flush(MAX_PENDING)
+            flush(0)
+
+        checkpoint.clear()
+        return checkpoint.written
+
+    def sync_repo(self, repo: str, output: str, sync: "SyncState", state: str = "all") -> tuple[int, int]:
+        """
+        Write the issues changed since the last sync to ``output`` and
+        update ``sync``. Returns (changed, unchanged) issue counts.
+
+        The output is marked as a delta (see delta_marker) unless this is
+        the repo's first sync, which lists every issue.
+        """
+        pending = deque()
+        written = unchanged = 0
+        newest = sync.since
+        marker = delta_marker(output)
+        marker.unlink(missing_ok=True)
+
+        with open(output, "w", encoding="utf-8") as f:
+            def flush(limit):
+                nonlocal written
+                while len(pending) > limit:
+                    issue, future = pending.popleft()
+                    pages = future.result()
+                    sync.record(issue)
+                    normalized = normalize_issue(repo, issue, comment_bodies(pages))
+                    f.write(json_dumps_safe(normalized) + "\n")
+                    written += 1
+
+            for page in self.iter_issue_pages(repo, state, since=sync.since, etags=sync.pages):
+                for issue in page:
+                    newest = max(newest or "", issue.get("updated_at") or "") or None
+                    if not sync.changed(issue):
+                        unchanged += 1
+                        continue
+                    pending.append((issue, self.submit_comments(repo, issue)))
+                flush(MAX_PENDING)
+            flush(0)
+
+        if sync.since is not None:
+            marker.write_text(json.dumps({"repo": repo, "since": sync.since}), encoding="utf-8")
+        sync.since = newest
+        sync.save()
+        return written, unchanged
+
+
+class GraphQLFetcher(GitHubFetcher):
+    """
+    Lists issues and PRs through the GraphQL API: GRAPHQL_PAGE per
+    request, each with its labels and first GRAPHQL_COMMENTS comments,
+    so a repo takes about one request per 100 issues instead of one per
+    issue with comments. Longer threads get their comments from REST.
+    Nodes are mapped to the REST shape (rest_issue), so normalize_issue
+    writes the same records as the REST path.
+
+    GraphQL has its own rate limit, counted in points rather than
+    requests, so it gets its own RateBudget.
+    """
+
+    def __init__(self, *args, graphql_url: Optional[str] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.graphql_url = graphql_url or graphql_endpoint(self.api_url)
+        self.graphql_budget = RateBudget()
+
+    def stats(self) -> dict:
+        return {"graphql": self.graphql_budget.stats(), "rest": self.budget.stats()}
+
+    def _graphql(self, query: str, variables: Dict) -> Dict:
+        while True:
+            self.graphql_budget.plan()
+            response = self._request("POST", self.graphql_url, self.graphql_budget, idempotent=True,
+                                     json={"query": query, "variables": variables})
+            payload = response.json()
+            errors = payload.get("errors")
+            if not errors:
+                return payload["data"]
+
+            if any(error.get("type") == "RATE_LIMITED" for error in errors):
+                # Answered with 200; wait for the reset like after a 403
+                if response.headers.get("X-RateLimit-Remaining") != "0":
+                    self.graphql_budget.pause(60)
+                continue
+            raise RuntimeError(f"GraphQL query failed: {errors[0].get('message')}")
+
+    def iter_connection(self, repo: str, connection: str, state: str = "all", after: Optional[str] = None):
+        """
+        Yield (issue, comments, cursor) for the repo's "issues" or
+        "pullRequests", newest first, starting after the ``after``
+        cursor. comments is None when the thread is longer than what
+        came with the issue; cursor is the one the issue's page was
+        requested with, to resume from.
+        """
+        owner, name = repo.split("/")
+        query = GRAPHQL_QUERY % {
+            "connection": connection,
+            "state_type": "IssueState" if connection == "issues" else "PullRequestState",
+        }
+        variables = {
+            "owner": owner,
+            "name": name,
+            "first": GRAPHQL_PAGE,
+            "after": after,
+            "comments": GRAPHQL_COMMENTS,
+            "states": GRAPHQL_STATES[connection].get(state),
+        }
+
+        page = 1
+        while True:
+            items = self._graphql(query, variables)["repository"]["items"]
+            print(f"[INFO] {repo}: retrieved {connection} page {page} ({len(items['nodes'])} items)")
+
+            for node in items["nodes"]:
+                comments = node["comments"]
+                complete = len(comments["nodes"]) >= comments["totalCount"]
+                bodies = [c["body"] for c in comments["nodes"] if c.get("body")]
+                yield rest_issue(node, connection == "pullRequests"), bodies if complete else None, variables["after"]
+
+            if not items["pageInfo"]["hasNextPage"]:
+                break
+            variables["after"] = items["pageInfo"]["endCursor"]
             page += 1
 
-        return comments
+    def fetch_repo(self, repo: str, output: str, state: str = "all", resume: bool = True) -> int:
+        """
+        Write the repo's normalized issues and PRs to ``output``, newest
+        first, checkpointed like GitHubFetcher.fetch_repo.
+        """
+        checkpoint = Checkpoint.open(output, repo, state, "graphql", resume)
+        cursors = dict(checkpoint.resume)
+        pending = deque()
+
+        # Issues and PRs are separate connections; interleave them by
+        # number like the REST listing
+        listing = heapq.merge(
+            self.iter_connection(repo, "issues", state, cursors.get("issues")),
+            self.iter_connection(repo, "pullRequests", state, cursors.get("pullRequests")),
+            key=lambda item: -item[0]["number"],
+        )
+
+        with checkpoint.output() as f:
+            def flush(limit):
+                while len(pending) > limit:
+                    issue, comments, cursor, future = pending.popleft()
+                    if future is not None:
+                        comments = comment_bodies(future.result())
+                    normalized = normalize_issue(repo, issue, comments)
+                    f.write(json_dumps_safe(normalized) + "\n")
+                    cursors["pullRequests" if "pull_request" in issue else "issues"] = cursor
+                    checkpoint.advance(issue["number"], dict(cursors))
+                checkpoint.save(f, force=limit == 0)
+
+            for issue, comments, cursor in listing:
+                if checkpoint.done(issue):
+                    continue
+                future = self.submit_comments(repo, issue) if comments is None else None
+                pending.append((issue, comments, cursor, future))
+                flush(MAX_PENDING)
+            flush(0)
+
+        checkpoint.clear()
+        return checkpoint.written
+
+
+def graphql_endpoint(api_url: str) -> str:
+    """GraphQL URL next to a REST base (GitHub Enterprise serves REST under /api/v3)."""
+    if api_url.endswith("/v3"):
+        return api_url[:-len("/v3")] + "/graphql"
+    return api_url + "/graphql"
+
+
+def rest_issue(node: Dict, pull_request: bool) -> Dict:
+    """A GraphQL issue or PR node in the shape of a REST issues listing item."""
+    issue = {
+        "number": node["number"],
+        "title": node["title"],
+        "body": node["body"],
+        "state": "open" if node["state"] == "OPEN" else "closed",
+        "labels": [{"name": label["name"]} for label in node["labels"]["nodes"]],
+        "comments": node["comments"]["totalCount"],
+        "created_at": node["createdAt"],
+        "updated_at": node["updatedAt"],
+        "html_url": node["url"],
+    }
+    if pull_request:
+        issue["pull_request"] = {"html_url": node["url"]}
+    return issue
+
+
+def comment_bodies(pages: List[Dict]) -> List[str]:
+    return [body for page in pages for body in page["bodies"]]
+
+
+def delta_marker(output: str) -> Path:
+    """
+    Written next to a --sync output that only holds the issues changed
+    since an earlier sync; ingest.github.index_github refuses
+    --delete-missing for such an input.
+    """
+    return Path(f"{output}.delta")
+
+
+# ------------------------------------------------------------
+# Incremental sync state
+# ------------------------------------------------------------
+
+class SyncState:
+    """
+    What the last sync of a repo saw: the newest updated_at (the next
+    listing's ``since``), the ETags of the listing pages, and per issue
+    its updated_at and comment count. No issue content is kept; a
+    changed issue is fetched again with all its comments.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        data = json.loads(self.path.read_text(encoding="utf-8")) if self.path.exists() else {}
+        self.since = data.get("since")
+        self.pages = data.get("pages", {})
+        self.issues = {
+            number: {"updated_at": seen["updated_at"], "comments": seen["comments"]}
+            for number, seen in data.get("issues", {}).items()
+        }
+        self._lock = threading.Lock()
+
+    @classmethod
+    def for_repo(cls, repo: str, sync_dir: Path = SYNC_DIR) -> "SyncState":
+        return cls(Path(sync_dir) / f"{repo.replace('/', '__')}.json")
+
+    def changed(self, issue: Dict) -> bool:
+        seen = self.issues.get(str(issue["number"]))
+        return (seen is None
+                or seen["updated_at"] != issue.get("updated_at")
+                or seen["comments"] != issue.get("comments"))
+
+    def record(self, issue: Dict):
+        with self._lock:
+            self.issues[str(issue["number"])] = {
+                "updated_at": issue.get("updated_at"),
+                "comments": issue.get("comments"),
+            }
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps({
+            "since": self.since,
+            "pages": self.pages,
+            "issues": self.issues,
+        }, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, self.path)
+
+
+# ------------------------------------------------------------
+# Resumable full fetches
+# ------------------------------------------------------------
+
+class Checkpoint:
+    """
+    Progress of a full fetch into one output file, kept next to it as
+    <output>.checkpoint: the byte offset up to which the output is
+    complete, the last issue number written and where the listing picks
+    up again (the REST page or GraphQL cursors of that issue's page).
+
+    The listing is newest first, so on resume everything numbered at
+    or above the last issue written is skipped and the output is cut
+    back to the offset. Issues opened in between only push the listing
+    back; at most about a page is requested twice.
+    """
+
+    def __init__(self, output: str, key: Dict):
+        self.output_path = Path(output)
+        self.path = Path(f"{output}.checkpoint")
+        self.key = key
+        self.offset = 0
+        self.written = 0
+        self.last_number = None
+        self.resume = {}
+        self.resumed = False
+        self._saved = 0
+
+    @classmethod
+    def open(cls, output: str, repo: str, state: str, api: str, resume: bool = True) -> "Checkpoint":
+        """Checkpoint of ``output``, restored if it belongs to the same fetch."""
+        checkpoint = cls(output, {"repo": repo, "state": state, "api": api})
+        if not (resume and checkpoint.path.exists() and checkpoint.output_path.exists()):
+            return checkpoint
+
+        data = json.loads(checkpoint.path.read_text(encoding="utf-8"))
+        if data.get("key") != checkpoint.key:
+            print(f"[WARN] {checkpoint.path} is from another fetch ({data.get('key')}), starting over")
+            return checkpoint
+
+        checkpoint.offset = data["offset"]
+        checkpoint.written = checkpoint._saved = data["written"]
+        checkpoint.last_number = data["last_number"]
+        checkpoint.resume = data["resume"]
+        checkpoint.resumed = True
+        print(f"[INFO] {repo}: resuming after #{checkpoint.last_number} ({checkpoint.written} issues written)")
+        return checkpoint
+
+    def output(self):
+        """The output file, cut back to the checkpoint when resuming."""
+        if self.resumed:
+            os.truncate(self.output_path, self.offset)
+            return open(self.output_path, "a", encoding="utf-8")
+        return open(self.output_path, "w", encoding="utf-8")
+
+    def done(self, issue: Dict) -> bool:
+        """Whether the issue was written before the checkpoint."""
+        return self.last_number is not None and issue["number"] >= self.last_number
+
+    def advance(self, number: int, resume: Dict):
+        self.written += 1
+        self.last_number = number
+        self.resume = resume
+
+    def save(self, f, force: bool = False):
+        """Record what ``f`` holds so far, about once a page."""
+        if self.written - self._saved < PER_PAGE and not (force and self.written > self._saved):
+            return
+        f.flush()
+        self.offset = f.tell()
+        self._saved = self.written
+
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        tmp.write_text(json.dumps({
+            "key": self.key,
+            "offset": self.offset,
+            "written": self.written,
+            "last_number": self.last_number,
+            "resume": self.resume,
+        }), encoding="utf-8")
+        os.replace(tmp, self.path)
+
+    def clear(self):
+        self.path.unlink(missing_ok=True)
 
 
 # ------------------------------------------------------------
@@ -150,30 +770,62 @@ def normalize_issue(repo: str, issue: Dict, comments: List[str]) -> Dict:
 # CLI Entrypoint
 # ------------------------------------------------------------
 
+def output_path(template: str, repo: str) -> str:
+    return template.replace("{repo}", repo.split("/")[-1])
+
+
 def main():
     parser = argparse.ArgumentParser()
-    parser.add_argument("--repo", required=True, help="owner/repo")
-    parser.add_argument("--output", required=True, help="Output JSONL file")
+    parser.add_argument("--repo", required=True, action="append",
+                        help="owner/repo (repeatable; repos share the rate limit budget)")
+    parser.add_argument("--output", required=True,
+                        help="Output JSONL file; with several repos use {repo}, e.g. data/raw/github_{repo}.jsonl")
     parser.add_argument("--state", default="all", help="Issue state (all/open/closed)")
+    parser.add_argument("--workers", type=int, default=WORKERS, help="Concurrent comment requests")
+    parser.add_argument("--api-url", default=GITHUB_API, help="GitHub API base URL")
+    parser.add_argument("--api", choices=["rest", "graphql"], default="rest",
+                        help="List issues with their comments through GraphQL (far fewer requests)")
+    parser.add_argument("--restart", action="store_true",
+                        help="Ignore the checkpoint of an interrupted fetch and start over")
+    parser.add_argument("--sync", action="store_true",
+                        help="Only fetch and write issues changed since the last --sync run")
+    parser.add_argument("--sync-dir", default=str(SYNC_DIR), help="Where --sync keeps per-repo state")
     args = parser.parse_args()
 
-    fetcher = GitHubFetcher()
-
-    print(f"[INFO] Fetching issues for {args.repo}")
-    raw_items = fetcher.fetch_issues(args.repo, state=args.state)
-
-    print(f"[INFO] Total issues/PRs: {len(raw_items)}")
-
-    with open(args.output, "w", encoding="utf-8") as f:
-        for issue in raw_items:
-            number = issue["number"]
-            comments = fetcher.fetch_comments(args.repo, number)
-
-            normalized = normalize_issue(args.repo, issue, comments)
-
-            f.write(json_dumps_safe(normalized) + "\n")
-
-    print(f"[INFO] Saved to {args.output}")
+    if len(args.repo) > 1 and "{repo}" not in args.output:
+        parser.error("--output needs a {repo} placeholder when fetching several repos")
+
+    if args.sync and args.api == "graphql":
+        parser.error("--sync relies on REST conditional requests; use --api rest")
+
+    fetcher_class = GraphQLFetcher if args.api == "graphql" else GitHubFetcher
+    fetcher = fetcher_class(api_url=args.api_url, workers=args.workers)
+    started = time.perf_counter()
+
+    # Repos are listed side by side; their comments share one worker pool
+    def fetch(repo):
+        output = output_path(args.output, repo)
+        if args.sync:
+            sync = SyncState.for_repo(repo, Path(args.sync_dir))
+            print(f"[INFO] Syncing issues for {repo} (changed since {sync.since or 'ever'})")
+            changed, unchanged = fetcher.sync_repo(repo, output, sync, state=args.state)
+            print(f"[INFO] {repo}: saved {changed} changed issues/PRs to {output} ({unchanged} unchanged)")
+            return
+
+        print(f"[INFO] Fetching issues for {repo}")
+        delta_marker(output).unlink(missing_ok=True)
+        count = fetcher.fetch_repo(repo, output, state=args.state, resume=not args.restart)
+        print(f"[INFO] {repo}: saved {count} issues/PRs to {output}")
+
+    try:
+        with ThreadPoolExecutor(max_workers=len(args.repo), thread_name_prefix="repo") as repos:
+            for future in [repos.submit(fetch, repo) for repo in args.repo]:
+                future.result()
+    finally:
+        fetcher.close()
+
+    print(f"[INFO] Done in {time.perf_counter() - started:.1f}s: {fetcher.stats()}")
+    print(f"[INFO] HTTP: {fetcher.http.metrics()}")
 
 
 # ------------------------------------------------------------
@@ -66,6 +66,9 @@ def chunk_text(text: str,
     while start < len(text):
         end = start + max_chars
         yield text[start:end]
+        # The next window would lie inside this one
+        if end >= len(text):
+            break
         start = end - overlap
 
 
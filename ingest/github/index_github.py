@@ -4,37 +4,50 @@
 Indexes GitHub issues/PRs into existing FAISS + metadata store.
 
 Usage:
-    python index_github.py \
-        --input data/raw/github_nova.jsonl \
-        --index data/processed/index/docs.faiss \
-        --meta data/processed/index/docs_meta.json
+    python -m ingest.github.index_github \
+        --input data/raw/github_nova.jsonl
+
+The published index snapshot (see rag.snapshots) is copied into a new
+snapshot, updated there and published once complete, so rag.search
+never sees a half-written update. --shard NAME targets a shard of its
+own (see rag.shards) instead of the main index, so a large repo can be
+re-indexed without touching the rest. With --index / --meta the given
+files are updated in place instead.
+
+Re-indexing an issue replaces its chunks: the old rows are tombstoned in
+the metadata store and the new ones appended, so running the same export
+twice does not duplicate results. Use --compact (or python -m
+rag.compact) to drop tombstoned rows from the FAISS index.
 """
 
 import argparse
-import json
 from pathlib import Path
 from typing import List
 
 import faiss
 import numpy as np
-from sentence_transformers import SentenceTransformer
 
+from ingest.github.fetch_issues import delta_marker
+from rag import ann
+from rag import lexical
+from rag import shards
+from rag import snapshots
+from rag.backends import BACKENDS, DEFAULT_BACKEND, MODEL_NAME, backend_name
+from rag.compact import compact
+from rag.embed_cache import EmbeddingCache
+from rag.embedding import BATCH_SIZE as EMBED_BATCH_SIZE, ChunkEncoder, default_workers
+from rag.meta_store import HEADER_FILE, MetaStore, MetaStoreWriter, stable_key
+from rag.stream import batched, iter_jsonl
 
-MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+
+# Chunks embedded and added to the index per step
+BATCH_SIZE = 1024
 
 
 # ------------------------------------------------------------
 # Utilities
 # ------------------------------------------------------------
 
-def load_jsonl(path: Path) -> List[dict]:
-    items = []
-    with path.open("r", encoding="utf-8") as f:
-        for line in f:
-            items.append(json.loads(line))
-    return items
-
-
 def chunk_text(text: str, max_chars: int = 2500) -> List[str]:
     """
     Issues are semantic units.
@@ -60,40 +73,162 @@ def chunk_text(text: str, max_chars: int = 2500) -> List[str]:
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("--input", required=True, help="Input JSONL from fetch_issues.py")
-    parser.add_argument("--index", required=True, help="FAISS index path")
-    parser.add_argument("--meta", required=True, help="Metadata JSON path")
+    parser.add_argument("--index-dir", default=str(snapshots.INDEX_DIR),
+                        help="Snapshot root to update (ignored with --index)")
+    parser.add_argument("--shard", help="Index into this shard (e.g. github-nova), created if needed")
+    parser.add_argument("--index", help="Update this FAISS index in place instead of a snapshot")
+    parser.add_argument("--meta", help="Metadata store directory (with --index)")
+    parser.add_argument("--bm25", help="BM25 index directory (default: bm25/ next to the index)")
+    parser.add_argument("--index-type", choices=ann.INDEX_TYPES,
+                        help="Re-encode the merged index as this type (e.g. sq8, pq)")
+    parser.add_argument("--refine", choices=ann.REFINE_TYPES,
+                        help="Re-score top candidates against flat / fp16 vectors")
+    parser.add_argument("--pq-m", type=int, help="PQ: number of sub-quantizers")
+    parser.add_argument("--recall-sample", type=int, default=200,
+                        help="Queries used for the memory vs recall report")
+    parser.add_argument("--backend", default=DEFAULT_BACKEND, choices=BACKENDS,
+                        help="Embedding backend (onnx / onnx-int8 need python -m rag.backends export)")
+    parser.add_argument("--workers", type=int, default=default_workers(),
+                        help="Embedding processes (default: one per 4 CPU cores)")
+    parser.add_argument("--embed-batch-size", type=int, default=EMBED_BATCH_SIZE,
+                        help="Texts per model call, grouped by token length")
+    parser.add_argument("--delete-closed", action="store_true",
+                        help="Remove closed issues/PRs from the index instead of updating them")
+    parser.add_argument("--delete-missing", action="store_true",
+                        help="Remove indexed issues of the input repos that are not in the input; "
+                             "needs a full export, not a fetch_issues --sync delta")
+    parser.add_argument("--compact", action="store_true",
+                        help="Rewrite the index without deleted rows afterwards")
+    parser.add_argument("--no-publish", action="store_true",
+                        help="Build the snapshot but leave the published one in place")
+    parser.add_argument("--keep", type=int, default=snapshots.KEEP,
+                        help="Older snapshots kept for rollback")
     args = parser.parse_args()
 
-    input_path = Path(args.input)
-    index_path = Path(args.index)
-    meta_path = Path(args.meta)
-
-    print("[INFO] Loading GitHub issues...")
-    issues = load_jsonl(input_path)
+    if bool(args.index) != bool(args.meta):
+        parser.error("--index and --meta go together")
 
-    print("[INFO] Loading embedding model...")
-    model = SentenceTransformer(MODEL_NAME)
-
-    print("[INFO] Loading existing FAISS index...")
-    index = faiss.read_index(str(index_path))
-
-    print("[INFO] Loading existing metadata...")
-    with meta_path.open("r", encoding="utf-8") as f:
-        meta = json.load(f)
-
-    embeddings = []
-    new_meta = []
+    input_path = Path(args.input)
+    if args.delete_missing and delta_marker(args.input).exists():
+        parser.error(f"{args.input} is a --sync delta ({delta_marker(args.input)}); "
+                     "--delete-missing needs a full export")
+    index_dir = shards.shard_root(args.shard or shards.MAIN_SHARD, Path(args.index_dir))
+
+    if args.index:
+        snapshot = None
+        index_path = Path(args.index)
+        meta_path = Path(args.meta)
+        bm25_path = Path(args.bm25) if args.bm25 else index_path.parent / "bm25"
+    else:
+        print(f"[INFO] Copying index snapshot {snapshots.resolve(index_dir)}...")
+        snapshot = snapshots.clone(index_dir)
+        index_path, meta_path, bm25_path = snapshots.layout(snapshot)
+
+    # Pass 1 only keeps ids and repos, so the old rows of every issue in
+    # the export can be tombstoned before its new rows are appended
+    print("[INFO] Scanning GitHub issues...")
+    doc_keys, repos = scan_issues(input_path)
+
+    if index_path.exists():
+        print("[INFO] Loading existing FAISS index...")
+        index = faiss.read_index(str(index_path))
+        params = ann.read_params(index_path, index)
+    else:
+        # New shard: a flat index is created once the dimension is known
+        print("[INFO] No existing index, starting a new one")
+        index, params = None, None
+
+    stale_rows = find_stale_rows(meta_path, doc_keys, repos, args.delete_missing)
+
+    cache = EmbeddingCache(backend_name(args.backend, MODEL_NAME))
+
+    # Pass 2 streams the export: chunk, embed, add to FAISS and append
+    # metadata one batch at a time
+    print("[INFO] Indexing issues...")
+    with ChunkEncoder(args.backend, MODEL_NAME, args.workers, args.embed_batch_size) as encode, \
+            MetaStoreWriter(meta_path, append=True) as writer:
+        # Row ids are FAISS ids, so old versions are tombstoned, never removed
+        writer.delete(stale_rows)
+
+        for batch in batched(iter_chunks(input_path, args.delete_closed), BATCH_SIZE):
+            vectors = cache.get_or_encode([entry["text"] for entry in batch], encode)
+            if index is None:
+                index, params = ann.new_index("flat", vectors.shape[1], 0)
+                params["embedding"] = encode.name
+            index.add(vectors.astype("float32"))
+            for entry in batch:
+                writer.add(entry)
+            print(f"[INFO]   {index.ntotal} vectors ({cache.misses} chunks embedded)")
+
+    print(f"[INFO] Embedding cache: {cache.stats()}")
+    print(f"[INFO] Embedding throughput: {encode.stats()}")
+    print(f"[INFO] Replaced or deleted {len(stale_rows)} existing chunks")
+
+    if index is None:
+        raise SystemExit("[ERROR] No index and nothing to add")
+
+    params["ntotal"] = index.ntotal
+
+    if args.index_type:
+        # Vectors decoded from the current index: exact if it is still flat
+        print(f"[INFO] Re-encoding index as {args.index_type}...")
+        embedding = params.get("embedding")
+        index, params = reencode(index, args)
+        if embedding:
+            params["embedding"] = embedding
+
+    print("[INFO] Saving updated index...")
+    faiss.write_index(index, str(index_path))
+    ann.write_params(index_path, params)
 
-    print("[INFO] Processing issues...")
+    print(f"[INFO] Rebuilding BM25 index at {bm25_path}...")
+    lexical.build_from_meta(meta_path, bm25_path)
 
-    for issue in issues:
-        chunks = chunk_text(issue["text"])
+    if args.compact:
+        print("[INFO] Compacting index...")
+        index = compact(index_path, meta_path, bm25_path) or index
 
-        for i, chunk in enumerate(chunks):
-            chunk_id = f"{issue['id']}::chunk{i}"
+    print("[SUCCESS] GitHub issues indexed successfully.")
 
-            metadata_entry = {
-                "id": chunk_id,
+    if snapshot is not None:
+        publish_snapshot(snapshot, index_dir, index, params, args)
+
+
+def publish_snapshot(snapshot: Path, index_dir: Path, index, params: dict, args):
+    # Dedup stats of the build this snapshot was cloned from (see rag.index)
+    base = snapshots.read_manifest(snapshots.resolve(index_dir)) or {}
+    snapshots.write_manifest(
+        snapshot, model=params.get("embedding") or MODEL_NAME, dim=index.d,
+        count=index.ntotal, index_type=params["type"], shard=args.shard or shards.MAIN_SHARD,
+        **{k: base[k] for k in ("dedup",) if k in base},
+    )
+
+    if args.no_publish:
+        print(f"[INFO] Not published; publish with: python -m rag.snapshots publish {snapshot.name}")
+        return
+    snapshots.publish(snapshot, index_dir)
+    snapshots.prune(index_dir, args.keep)
+
+
+def scan_issues(path: Path):
+    """Document keys and repos of every issue in the export."""
+    keys = []
+    repos = set()
+    for issue in iter_jsonl(path):
+        keys.append(stable_key(issue["id"]))
+        repos.add(issue.get("repo"))
+    return np.array(keys, dtype=np.uint64), repos
+
+
+def iter_chunks(path: Path, skip_closed: bool = False):
+    """Metadata entries of every chunk of every issue, in export order."""
+    for issue in iter_jsonl(path):
+        if skip_closed and issue.get("state") == "closed":
+            continue
+
+        for i, chunk in enumerate(chunk_text(issue["text"])):
+            yield {
+                "id": f"{issue['id']}::chunk{i}",
                 "source": "github",
                 "repo": issue.get("repo"),
                 "service": infer_service(issue),
@@ -103,30 +238,45 @@ def main():
                 "text": chunk,
             }
 
-            new_meta.append(metadata_entry)
-            embeddings.append(chunk)
-
-    print(f"[INFO] Creating embeddings for {len(embeddings)} chunks...")
 
-    vectors = model.encode(
-        embeddings,
-        normalize_embeddings=True,
-        show_progress_bar=True,
-    ).astype("float32")
+def reencode(index, args):
+    """Rebuild ``index`` as args.index_type, streaming its vectors in batches."""
+    builder = ann.IndexBuilder(
+        args.index_type, expected=index.ntotal, recall_sample=args.recall_sample,
+        refine=args.refine, pq_m=args.pq_m,
+    )
+    for vectors in ann.iter_vectors(index, BATCH_SIZE):
+        builder.add(vectors)
 
-    print("[INFO] Adding to FAISS index...")
-    index.add(vectors)
+    index, params = builder.finish()
+    if args.recall_sample > 0:
+        params["report"] = builder.report()
+    return index, params
 
-    print("[INFO] Updating metadata...")
-    meta.extend(new_meta)
-
-    print("[INFO] Saving updated index and metadata...")
-    faiss.write_index(index, str(index_path))
 
-    with meta_path.open("w", encoding="utf-8") as f:
-        json.dump(meta, f, ensure_ascii=False, indent=2)
-
-    print("[SUCCESS] GitHub issues indexed successfully.")
+def find_stale_rows(meta_path: Path, doc_keys: np.ndarray, repos: set,
+                    delete_missing: bool) -> np.ndarray:
+    """
+    Live rows to tombstone: every chunk of an issue that is being
+    re-indexed and, with ``delete_missing``, every chunk of the input
+    repos whose issue is no longer in the input.
+    """
+    if not (meta_path / HEADER_FILE).exists():
+        return np.zeros(0, dtype=np.int64)
+
+    meta = MetaStore(meta_path)
+    rows = meta.rows_for_docs(doc_keys)
+
+    if delete_missing:
+        code = meta.code("source", "github")
+        candidates = np.flatnonzero(
+            (meta.codes["source"] == code) & (meta.deleted == 0)
+            & ~np.isin(meta.keys["doc"], doc_keys)
+        ) if code is not None else []
+        missing = [r for r in candidates if meta.get(int(r)).get("repo") in repos]
+        rows = np.union1d(rows, np.asarray(missing, dtype=np.int64))
+
+    return rows
 
 
 # ------------------------------------------------------------
@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+
+"""
+Local stand-in for the GitHub REST API, for exercising fetch_issues.py
+without a token or network: same endpoints, pagination and rate limit
+headers, with generated issues, PRs and comments.
+
+Every token gets --rate-limit requests per --window seconds; past that,
+requests fail with 403 and X-RateLimit-Remaining: 0 until the window
+resets, like on GitHub. --latency-ms delays every response to make
+concurrency measurable. GET /stats reports the requests served and the
+peak number handled at once.
+
+Responses carry an ETag; a request whose If-None-Match still matches
+gets a 304 that, as on GitHub, is not charged to the rate limit. POST
+.../touch marks an issue as updated (optionally adding a comment), to
+exercise fetch_issues.py --sync.
+
+POST /graphql answers the repository issues / pullRequests query of
+fetch_issues.py --api graphql (and only that one), with its own rate
+limit budget like GitHub's.
+
+Endpoints:
+    GET  /repos/{owner}/{repo}/issues?state=&per_page=&page=&since=&sort=&direction=
+    GET  /repos/{owner}/{repo}/issues/{number}/comments?per_page=&page=
+    POST /repos/{owner}/{repo}/issues/{number}/touch {"comment": "..."}
+    POST /graphql
+    GET  /stats
+
+Usage:
+    python -m ingest.github.stub_server --port 8780 --issues 500 --latency-ms 50
+    GITHUB_TOKEN=test python -m ingest.github.fetch_issues \
+        --api-url http://127.0.0.1:8780 --repo openstack/nova --output /tmp/nova.jsonl
+"""
+
+import argparse
+import json
+import re
+import threading
+import time
+import zlib
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8780
+
+ISSUES_RE = re.compile(r"^/repos/([^/]+)/([^/]+)/issues$")
+COMMENTS_RE = re.compile(r"^/repos/([^/]+)/([^/]+)/issues/(\d+)/comments$")
+TOUCH_RE = re.compile(r"^/repos/([^/]+)/([^/]+)/issues/(\d+)/touch$")
+
+LABELS = ["bug", "enhancement", "documentation", "low-hanging-fruit"]
+
+
+class FakeRepo:
+    """Deterministic issues and comments of one repo (same name, same data)."""
+
+    def __init__(self, full_name: str, n_issues: int, max_comments: int):
+        self.full_name = full_name
+        seed = zlib.crc32(full_name.encode("utf-8"))
+        self.issues = [self._issue(n, seed, max_comments) for n in range(n_issues, 0, -1)]
+        self.by_number = {issue["number"]: issue for issue in self.issues}
+        self.added = {}
+        self.clock = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+    def _issue(self, number: int, seed: int, max_comments: int) -> dict:
+        h = zlib.crc32(f"{seed}:{number}".encode("utf-8"))
+        # Most issues have a few comments, some none, a few long threads
+        comments = 0 if h % 4 == 0 else (h >> 8) % 12
+        if h % 97 == 0:
+            comments = max_comments
+
+        day = 1 + number % 28
+        issue = {
+            "number": number,
+            "title": f"{self.full_name.split('/')[-1]} issue {number}: instance fails to boot",
+            "body": f"Steps to reproduce issue {number}.\nTraceback: NoValidHost ({h % 1000})",
+            "state": "open" if h % 3 else "closed",
+            "labels": [{"name": LABELS[h % len(LABELS)]}],
+            "comments": comments,
+            "created_at": f"2024-01-{day:02d}T00:00:00Z",
+            "updated_at": f"2024-02-{day:02d}T00:00:00Z",
+            "html_url": f"https://github.com/{self.full_name}/issues/{number}",
+        }
+        if h % 5 == 0:
+            # As on GitHub, the html_url of a PR is its /pull/ page
+            issue["html_url"] = f"https://github.com/{self.full_name}/pull/{number}"
+            issue["pull_request"] = {"html_url": issue["html_url"]}
+        return issue
+
+    def listing(self, state: str, since: str | None, sort: str, direction: str) -> list[dict]:
+        items = [i for i in self.issues if state == "all" or i["state"] == state]
+        if since:
+            items = [i for i in items if i["updated_at"] >= since]
+        if sort == "updated":
+            items.sort(key=lambda i: (i["updated_at"], i["number"]), reverse=direction != "asc")
+        elif direction == "asc":
+            items.reverse()
+        return items
+
+    def comments(self, number: int) -> list[dict]:
+        issue = self.by_number.get(number)
+        if issue is None:
+            return None
+        added = self.added.get(number, [])
+        generated = issue["comments"] - len(added)
+        return [{"id": number * 10_000 + i, "body": f"Comment {i} on #{number}: retried, same error"}
+                for i in range(generated)] + added
+
+    def graphql_nodes(self, pull_requests: bool, states: list | None, comments: int) -> list[dict]:
+        """Issues or PRs as GraphQL nodes, newest first."""
+        nodes = []
+        for issue in self.issues:
+            if ("pull_request" in issue) != pull_requests:
+                continue
+            state = "OPEN" if issue["state"] == "open" else "CLOSED"
+            if pull_requests and state == "CLOSED" and issue["number"] % 2:
+                state = "MERGED"
+            if states and state not in states:
+                continue
+            thread = self.comments(issue["number"])
+            nodes.append({
+                "number": issue["number"],
+                "title": issue["title"],
+                "body": issue["body"],
+                "state": state,
+                "createdAt": issue["created_at"],
+                "updatedAt": issue["updated_at"],
+                "url": issue["html_url"],
+                "labels": {"nodes": issue["labels"]},
+                "comments": {"totalCount": len(thread), "nodes": [{"body": c["body"]} for c in thread[:comments]]},
+            })
+        return nodes
+
+    def touch(self, number: int, comment: str | None = None) -> dict | None:
+        """Mark an issue as updated now, optionally adding a comment."""
+        issue = self.by_number.get(number)
+        if issue is None:
+            return None
+        self.clock += timedelta(seconds=1)
+        issue["updated_at"] = self.clock.strftime("%Y-%m-%dT%H:%M:%SZ")
+        if comment:
+            self.added.setdefault(number, []).append({"id": number * 10_000 + issue["comments"], "body": comment})
+            issue["comments"] += 1
+        return issue
+
+
+class Handler(BaseHTTPRequestHandler):
+    server_version = "GitHubStub/1.0"
+
+    def do_GET(self):
+        self._track(self._handle)
+
+    def do_POST(self):
+        self._track(self._handle_post)
+
+    def _track(self, handle):
+        server = self.server
+        with server.lock:
+            server.active += 1
+            server.peak = max(server.peak, server.active)
+        try:
+            handle()
+        finally:
+            with server.lock:
+                server.active -= 1
+
+    def _handle(self):
+        url = urlparse(self.path)
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+
+        if url.path == "/stats":
+            return self._send(200, {
+                "requests": self.server.requests,
+                "not_modified": self.server.not_modified,
+                "peak_concurrency": self.server.peak,
+            })
+
+        time.sleep(self.server.latency)
+        per_page = min(int(query.get("per_page", 30)), 100)
+        page = max(int(query.get("page", 1)), 1)
+
+        status, payload = 404, {"message": "Not Found"}
+        m = ISSUES_RE.match(url.path)
+        if m:
+            repo = self.server.repos.get(f"{m[1]}/{m[2]}")
+            if repo is not None:
+                with self.server.lock:
+                    items = repo.listing(query.get("state", "open"), query.get("since"),
+                                         query.get("sort", "created"), query.get("direction", "desc"))
+                status, payload = 200, items[(page - 1) * per_page:page * per_page]
+
+        m = COMMENTS_RE.match(url.path)
+        if m:
+            repo = self.server.repos.get(f"{m[1]}/{m[2]}")
+            with self.server.lock:
+                comments = repo.comments(int(m[3])) if repo else None
+            if comments is not None:
+                status, payload = 200, comments[(page - 1) * per_page:page * per_page]
+
+        etag = f'W/"{zlib.crc32(json.dumps(payload).encode("utf-8")):08x}"'
+        if status == 200 and self.headers.get("If-None-Match") == etag:
+            limit_headers = self._take_budget(charge=False)
+            with self.server.lock:
+                self.server.not_modified += 1
+            return self._send(304, None, {**limit_headers, "ETag": etag})
+
+        limit_headers = self._take_budget()
+        if limit_headers is None:
+            return
+        if status == 200:
+            limit_headers["ETag"] = etag
+        self._send(status, payload, limit_headers)
+
+    def _handle_post(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length) or b"{}")
+
+        if urlparse(self.path).path == "/graphql":
+            return self._graphql(body)
+
+        m = TOUCH_RE.match(urlparse(self.path).path)
+        repo = self.server.repos.get(f"{m[1]}/{m[2]}") if m else None
+        if repo is None:
+            return self._send(404, {"message": "Not Found"})
+
+        with self.server.lock:
+            issue = repo.touch(int(m[3]), body.get("comment"))
+        if issue is None:
+            return self._send(404, {"message": "Not Found"})
+        self._send(200, issue)
+
+    def _graphql(self, body: dict):
+        limit_headers = self._take_budget(resource="graphql")
+        if limit_headers is None:
+            return
+        time.sleep(self.server.latency)
+
+        query, variables = body.get("query", ""), body.get("variables") or {}
+        repo = self.server.repos.get(f"{variables.get('owner')}/{variables.get('name')}")
+        if repo is None:
+            return self._send(200, {"data": {"repository": None}, "errors": [
+                {"type": "NOT_FOUND", "message": "Could not resolve to a Repository"}]}, limit_headers)
+
+        with self.server.lock:
+            nodes = repo.graphql_nodes("pullRequests(" in query, variables.get("states"),
+                                       variables.get("comments", 0))
+        start = int(variables.get("after") or 0)
+        end = start + min(variables.get("first", 100), 100)
+        items = {
+            "pageInfo": {"hasNextPage": end < len(nodes), "endCursor": str(end)},
+            "nodes": nodes[start:end],
+        }
+        self._send(200, {"data": {"repository": {"items": items}}}, limit_headers)
+
+    def _take_budget(self, charge: bool = True, resource: str = "core") -> dict | None:
+        """Charge the token one request; None (after answering 403) when spent."""
+        token = (self.headers.get("Authorization", ""), resource)
+        server = self.server
+        with server.lock:
+            server.requests += 1
+            now = time.time()
+            window = server.budgets.get(token)
+            if window is None or now >= window["reset"]:
+                window = server.budgets[token] = {"used": 0, "reset": now + server.window}
+            if charge:
+                window["used"] += 1
+            remaining = server.rate_limit - window["used"]
+
+        headers = {
+            "X-RateLimit-Limit": str(server.rate_limit),
+            "X-RateLimit-Remaining": str(max(remaining, 0)),
+            "X-RateLimit-Reset": str(int(window["reset"])),
+        }
+        if charge and remaining < 0:
+            self._send(403, {"message": "API rate limit exceeded"}, headers)
+            return None
+        return headers
+
+    def _send(self, status: int, payload, headers: dict | None = None):
+        data = json.dumps(payload).encode("utf-8") if payload is not None else b""
+        self.send_response(status)
+        if payload is not None:
+            self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, fmt, *args):
+        if self.server.verbose:
+            print(f"[{self.log_date_time_string()}] {fmt % args}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--repos", default="openstack/nova,openstack/neutron",
+                        help="Comma-separated owner/repo names to serve")
+    parser.add_argument("--issues", type=int, default=500, help="Issues + PRs per repo")
+    parser.add_argument("--max-comments", type=int, default=250, help="Comments on the longest threads")
+    parser.add_argument("--rate-limit", type=int, default=5000, help="Requests per token and window")
+    parser.add_argument("--window", type=float, default=3600, help="Rate limit window in seconds")
+    parser.add_argument("--latency-ms", type=float, default=0, help="Delay added to every response")
+    parser.add_argument("--verbose", action="store_true", help="Log every request")
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer((args.host, args.port), Handler)
+    server.daemon_threads = True
+    server.repos = {name: FakeRepo(name, args.issues, args.max_comments) for name in args.repos.split(",")}
+    server.rate_limit = args.rate_limit
+    server.window = args.window
+    server.latency = args.latency_ms / 1000
+    server.verbose = args.verbose
+    server.budgets = {}
+    server.lock = threading.Lock()
+    server.requests = server.not_modified = server.active = server.peak = 0
+
+    print(f"[INFO] Serving {', '.join(server.repos)} on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,6 @@
 #!/usr/bin/env python3
 
+import argparse
 import subprocess
 import yaml
 import json
@@ -56,7 +57,12 @@ def extract_notes(repo_path: Path, project: str):
 
 
 def main():
-    for project in PROJECTS:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--project", action="append", choices=PROJECTS,
+                        help="Fetch only this project (repeatable; default: all)")
+    args = parser.parse_args()
+
+    for project in args.project or PROJECTS:
         print(f"Fetching release notes for {project}")
 
         repo_url = f"{BASE_GIT}/{project}"
@@ -19,7 +19,7 @@ def chunk_text(text: str, chunk_size: int = 500):
 def main():
     all_chunks = []
 
-    for file in RAW_DIR.glob("*.json"):
+    for file in sorted(RAW_DIR.glob("*.json")):
         data = json.loads(file.read_text())
         project = data["project"]
 
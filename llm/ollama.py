@@ -1,6 +1,11 @@
-import requests
 import os
 
+from common import http_client
+
+
+# (connect, read) seconds; generation can take minutes on CPU
+TIMEOUT = (5, 120)
+
 
 class OllamaLLM:
     def __init__(
@@ -10,16 +15,19 @@ class OllamaLLM:
     ):
         self.model = model or os.getenv("OLLAMA_MODEL", "qwen2.5:14b")
         self.base_url = base_url
+        # Keep-alive connection to the Ollama server; a refused connection
+        # (e.g. while it restarts) is retried, a slow generation is not
+        self.http = http_client.shared()
 
     def generate(self, prompt: str) -> str:
-        resp = requests.post(
+        resp = self.http.post(
             f"{self.base_url}/api/generate",
             json={
                 "model": self.model,
                 "prompt": prompt,
                 "stream": False,
             },
-            timeout=120,
+            timeout=TIMEOUT,
         )
 
         resp.raise_for_status()
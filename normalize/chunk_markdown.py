@@ -12,6 +12,14 @@ ADMIN_DOCS_FILE = Path("data/raw/admin_docs/nova_admin_docs.json")
 
 HEADING_RE = re.compile(r"^(#{1,3})\s+(.*)")
 
+# Chunk ids derive from the document path and position, so unchanged
+# docs produce an identical chunk file (and the pipeline skips indexing)
+ID_NAMESPACE = uuid.UUID("6f1c0a52-3d43-4ad4-9a8e-2a2f4d1c9b10")
+
+
+def chunk_id(doc_path: str, position: int) -> str:
+    return str(uuid.uuid5(ID_NAMESPACE, f"{doc_path}#{position}"))
+
 
 def load_admin_docs():
     if not ADMIN_DOCS_FILE.exists():
@@ -27,8 +35,14 @@ def load_admin_docs():
         if len(text) < 200:
             continue
 
+        # Ids derive from the doc's identity; docs without one would all collide
+        key = doc.get("path") or doc.get("url") or doc.get("title")
+        if not key:
+            print(f"⚠ Skipping admin doc without path, url or title: {text[:60]!r}")
+            continue
+
         records.append({
-            "id": str(uuid.uuid4()),
+            "id": chunk_id(key, 0),
             "source": "admin_docs",
             "service": doc.get("service"),
             "version": None,
@@ -119,11 +133,12 @@ def normalize():
     count = 0
 
     # --- Process normal markdown docs ---
-    for md_file in RAW_ROOT.rglob("*.md"):
+    for md_file in sorted(RAW_ROOT.rglob("*.md")):
         metadata, body = load_markdown(md_file)
         chunks = chunk_body(body)
+        doc_path = str(md_file.relative_to(RAW_ROOT))
 
-        for c in chunks:
+        for position, c in enumerate(chunks):
             raw_text = "\n".join(c["content"]).strip()
             text = clean_chunk_text(raw_text)
 
@@ -131,12 +146,12 @@ def normalize():
                 continue
 
             record = {
-                "id": str(uuid.uuid4()),
+                "id": chunk_id(doc_path, position),
                 "source": metadata.get("source"),
                 "service": metadata.get("service"),
                 "version": metadata.get("version"),
                 "url": metadata.get("url"),
-                "doc_path": str(md_file.relative_to(RAW_ROOT)),
+                "doc_path": doc_path,
                 "heading": clean_heading(c["heading"]),
                 "text": text,
             }
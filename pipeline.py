@@ -0,0 +1,391 @@
+#!/usr/bin/env python3
+
+"""
+Incremental ingest → normalize → chunk → index pipeline.
+
+Every stage declares the files it reads and writes. A stage runs only
+when something it depends on changed since its last successful run:
+the content of its inputs, its outputs (missing or edited), or its
+code (script, the repo modules it imports) and arguments. Fetch stages read the network rather than local
+files; they run when their last fetch is older than --max-age.
+
+Stages wait for the stages producing their inputs. Independent ones
+(the docs crawl, each project's release-note fetch, ...) run in
+parallel, --jobs at a time. Each stage's output goes to
+data/pipeline/logs/<stage>.log; per-stage status and wall time are
+printed at the end and kept in data/pipeline/state.json.
+
+Usage:
+    python pipeline.py                      # everything that is stale
+    python pipeline.py index --jobs 4       # index and what it needs
+    python pipeline.py --github openstack/nova --github openstack/neutron
+    python pipeline.py --list
+    python pipeline.py --dry-run
+    python pipeline.py normalize-releasenotes --force
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timezone
+from pathlib import Path
+
+
+STATE_FILE = Path("data/pipeline/state.json")
+LOG_DIR = Path("data/pipeline/logs")
+
+DEFAULT_JOBS = 4
+
+# Fetch stages are re-run when their last fetch is older than this
+MAX_AGE_HOURS = 24.0
+
+RELEASENOTE_PROJECTS = ["nova", "neutron", "placement"]
+
+
+class Stage:
+    """
+    One step of the pipeline: a command plus the paths it reads and
+    writes. Paths may be files or directories (all files below count).
+    ``deps`` are the repo modules or packages the script imports; their
+    .py files count like the script itself. ``fetch`` marks stages that
+    read the network instead of ``inputs``.
+    """
+
+    def __init__(self, name: str, cmd: list[str], inputs=(), outputs=(), deps=(), fetch: bool = False):
+        self.name = name
+        self.cmd = cmd
+        self.inputs = [Path(p) for p in inputs]
+        self.outputs = [Path(p) for p in outputs]
+        self.deps = [Path(p) for p in deps]
+        self.fetch = fetch
+
+    @property
+    def script(self) -> Path:
+        """Source file of the command: the script, or the module behind -m."""
+        args = self.cmd[1:]
+        if args[:1] == ["-m"]:
+            return Path(*args[1].split(".")).with_suffix(".py")
+        return Path(args[0])
+
+    def __repr__(self):
+        return f"Stage({self.name})"
+
+
+def stages(github_repos: list[str] = ()) -> list[Stage]:
+    py = sys.executable
+    out = [
+        Stage("fetch-docs", [py, "-m", "ingest.docs.fetch_openstack_docs"],
+              outputs=["data/raw/openstack_docs"], deps=["common"], fetch=True),
+        Stage("fetch-admin-docs", [py, "ingest/admin_docs/fetch_admin_docs.py"],
+              outputs=["data/raw/admin_docs/nova_admin_docs.json"], fetch=True),
+    ]
+    for project in RELEASENOTE_PROJECTS:
+        out.append(Stage(
+            f"fetch-releasenotes-{project}",
+            [py, "ingest/releasenotes/fetch_releasenotes.py", "--project", project],
+            outputs=[f"data/raw/releasenotes/{project}.json"], fetch=True,
+        ))
+
+    out += [
+        Stage("chunk-docs", [py, "normalize/chunk_markdown.py"],
+              inputs=["data/raw/openstack_docs", "data/raw/admin_docs/nova_admin_docs.json"],
+              outputs=["data/processed/chunks/admin_chunks.json"]),
+        Stage("convert-docs", [py, "ingest/docs/convert_docs_jsonl.py"],
+              inputs=["data/processed/chunks.jsonl"],
+              outputs=["data/processed/chunks/docs_chunks.json"]),
+        Stage("normalize-releasenotes", [py, "ingest/releasenotes/normalize_notes.py"],
+              inputs=[f"data/raw/releasenotes/{p}.json" for p in RELEASENOTE_PROJECTS],
+              outputs=["data/processed/chunks/releasenotes_chunks.json"]),
+        Stage("index", [py, "-m", "rag.index"],
+              inputs=["data/processed/chunks"],
+              outputs=["data/processed/index/CURRENT"], deps=["rag"]),
+    ]
+
+    for repo in github_repos:
+        name = repo.split("/")[-1]
+        raw = f"data/raw/github_{name}.jsonl"
+        out += [
+            Stage(f"fetch-github-{name}",
+                  [py, "-m", "ingest.github.fetch_issues", "--repo", repo, "--api", "graphql", "--output", raw],
+                  outputs=[raw], deps=["common"], fetch=True),
+            Stage(f"index-github-{name}",
+                  [py, "-m", "ingest.github.index_github", "--input", raw, "--shard", f"github-{name}"],
+                  inputs=[raw],
+                  outputs=[f"data/processed/index/shards/github-{name}/CURRENT"], deps=["rag"]),
+        ]
+    return out
+
+
+def _within(path: Path, other: Path) -> bool:
+    return path == other or other in path.parents or path in other.parents
+
+
+def dependencies(all_stages: list[Stage]) -> dict[str, set[str]]:
+    """Stage name → names of the stages producing any of its inputs."""
+    return {
+        stage.name: {
+            other.name for other in all_stages
+            if other is not stage
+            and any(_within(i, o) for i in stage.inputs for o in other.outputs)
+        }
+        for stage in all_stages
+    }
+
+
+# ---------------------------------------------------------
+# Fingerprints
+# ---------------------------------------------------------
+
+class Fingerprints:
+    """
+    Content hashes of files, re-hashed only when a file's size or mtime
+    changed since it was last seen (the cache lives in the state file).
+    """
+
+    def __init__(self, cache: dict):
+        self.cache = cache
+        self._lock = threading.Lock()
+
+    def file(self, path: Path) -> str:
+        st = path.stat()
+        key = str(path)
+        with self._lock:
+            cached = self.cache.get(key)
+        if cached and cached[0] == st.st_size and cached[1] == st.st_mtime_ns:
+            return cached[2]
+
+        h = hashlib.sha256()
+        with path.open("rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+        digest = h.hexdigest()
+        with self._lock:
+            self.cache[key] = [st.st_size, st.st_mtime_ns, digest]
+        return digest
+
+    def copy(self) -> dict:
+        with self._lock:
+            return dict(self.cache)
+
+    def paths(self, paths: list[Path], pattern: str = "*") -> str | None:
+        """Combined hash of every file under ``paths`` (matching ``pattern``); None if one is missing."""
+        h = hashlib.sha256()
+        for root in paths:
+            if not root.exists():
+                return None
+            files = sorted(p for p in root.rglob(pattern) if p.is_file()) if root.is_dir() else [root]
+            for f in files:
+                h.update(f"{f}\0{self.file(f)}\n".encode("utf-8"))
+        return h.hexdigest()
+
+    def stage(self, stage: Stage) -> str:
+        """Hash of what a stage's result depends on besides its outputs."""
+        h = hashlib.sha256(json.dumps(stage.cmd[1:]).encode("utf-8"))
+        if stage.script.exists():
+            h.update(self.file(stage.script).encode("utf-8"))
+        # Source only: __pycache__ changes whenever the code is imported
+        h.update((self.paths(stage.deps, "*.py") or "missing").encode("utf-8"))
+        h.update((self.paths(stage.inputs) or "missing").encode("utf-8"))
+        return h.hexdigest()
+
+
+def stale_reason(stage: Stage, record: dict | None, prints: Fingerprints, max_age: float) -> str | None:
+    """Why ``stage`` has to run, or None if its outputs are up to date."""
+    if not record or record.get("status") != "ok":
+        return "never run" if not record else f"last run {record.get('status')}"
+
+    outputs = prints.paths(stage.outputs)
+    if outputs is None:
+        return "output missing"
+    if outputs != record.get("outputs"):
+        return "output changed"
+
+    if stage.fetch:
+        age = time.time() - record.get("finished", 0)
+        if age > max_age:
+            return f"fetched {age / 3600:.1f}h ago"
+
+    if prints.stage(stage) != record.get("inputs"):
+        return "inputs changed"
+    return None
+
+
+# ---------------------------------------------------------
+# Runner
+# ---------------------------------------------------------
+
+class Pipeline:
+    def __init__(self, all_stages: list[Stage], state_file: Path = STATE_FILE):
+        self.stages = {s.name: s for s in all_stages}
+        self.deps = dependencies(all_stages)
+        self.state_file = state_file
+
+        state = json.loads(state_file.read_text()) if state_file.exists() else {}
+        self.records = state.get("stages", {})
+        self.prints = Fingerprints(state.get("files", {}))
+        self._lock = threading.Lock()
+
+    def select(self, names: list[str]) -> list[str]:
+        """The named stages plus everything upstream of them, in pipeline order."""
+        if not names:
+            return list(self.stages)
+        unknown = [n for n in names if n not in self.stages]
+        if unknown:
+            raise SystemExit(f"Unknown stages: {', '.join(unknown)} (see --list)")
+
+        wanted, todo = set(), list(names)
+        while todo:
+            name = todo.pop()
+            if name not in wanted:
+                wanted.add(name)
+                todo.extend(self.deps[name])
+        return [n for n in self.stages if n in wanted]
+
+    def save(self):
+        with self._lock:
+            records = dict(self.records)
+        payload = json.dumps({"stages": records, "files": self.prints.copy()}, indent=1)
+        self.state_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.state_file.with_suffix(".tmp")
+        tmp.write_text(payload)
+        os.replace(tmp, self.state_file)
+
+    def run_stage(self, stage: Stage) -> dict:
+        LOG_DIR.mkdir(parents=True, exist_ok=True)
+        log_file = LOG_DIR / f"{stage.name}.log"
+        inputs = self.prints.stage(stage)
+
+        started = time.perf_counter()
+        with log_file.open("w", encoding="utf-8") as log:
+            proc = subprocess.run(stage.cmd, stdout=log, stderr=subprocess.STDOUT)
+        seconds = time.perf_counter() - started
+
+        record = {
+            "status": "ok" if proc.returncode == 0 else "failed",
+            "seconds": round(seconds, 2),
+            "finished": time.time(),
+            "inputs": inputs,
+            "outputs": self.prints.paths(stage.outputs) if proc.returncode == 0 else None,
+            "log": str(log_file),
+        }
+        if proc.returncode == 0 and record["outputs"] is None:
+            record["status"] = "failed"
+            print(f"[WARN] {stage.name} exited 0 but did not write {stage.outputs}")
+        return record
+
+    def run(self, names: list[str], jobs: int = DEFAULT_JOBS, force=(),
+            max_age: float = MAX_AGE_HOURS * 3600, dry_run: bool = False) -> dict:
+        """
+        Run the stale stages among ``names``, and those in ``force``
+        regardless. Returns name → (status, seconds, reason).
+        """
+        pending = {n: self.deps[n] & set(names) for n in names}
+        results = {}
+        running = {}
+
+        with ThreadPoolExecutor(max_workers=jobs) as pool:
+            while pending or running:
+                for name in [n for n, deps in pending.items() if deps <= results.keys()]:
+                    del pending[name]
+                    stage = self.stages[name]
+
+                    failed = [d for d in self.deps[name] if results.get(d, ("ok",))[0] in ("failed", "blocked")]
+                    if failed:
+                        results[name] = ("blocked", 0.0, f"{', '.join(failed)} failed")
+                        continue
+
+                    produced = [d for d in self.deps[name] if results.get(d, ("",))[0] in ("ran", "would run")]
+                    missing = [str(p) for p in stage.inputs if not p.exists()]
+                    if missing and not (dry_run and produced):
+                        results[name] = ("skipped", 0.0, f"no input {', '.join(missing)}")
+                        continue
+
+                    reason = "forced" if name in force else stale_reason(stage, self.records.get(name), self.prints, max_age)
+                    if reason is None and produced and dry_run:
+                        reason = f"after {', '.join(produced)}"
+                    if reason is None:
+                        results[name] = ("up to date", 0.0, "")
+                        continue
+
+                    if dry_run:
+                        results[name] = ("would run", 0.0, reason)
+                        continue
+
+                    print(f"[INFO] {name}: running ({reason})")
+                    running[pool.submit(self.run_stage, stage)] = (name, reason)
+
+                if not running:
+                    if pending and not any(deps <= results.keys() for deps in pending.values()):
+                        raise RuntimeError(f"Dependency cycle among {', '.join(pending)}")
+                    continue
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name, reason = running.pop(future)
+                    record = future.result()
+                    with self._lock:
+                        self.records[name] = record
+                    self.save()
+
+                    if record["status"] == "ok":
+                        results[name] = ("ran", record["seconds"], reason)
+                        print(f"[INFO] {name}: done in {record['seconds']}s")
+                    else:
+                        results[name] = ("failed", record["seconds"], f"see {record['log']}")
+                        print(f"[ERROR] {name}: failed after {record['seconds']}s, see {record['log']}")
+
+        self.save()
+        return {name: results[name] for name in names}
+
+
+def print_report(results: dict, seconds: float):
+    print()
+    print(f"{'stage':<32} {'status':<12} {'seconds':>8}  reason")
+    for name, (status, secs, reason) in results.items():
+        print(f"{name:<32} {status:<12} {secs:>8.1f}  {reason}")
+    print(f"Total wall time: {seconds:.1f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("stages", nargs="*", help="Stages to bring up to date (default: all)")
+    parser.add_argument("--jobs", type=int, default=DEFAULT_JOBS, help="Stages run in parallel")
+    parser.add_argument("--force", action="store_true",
+                        help="Run the named stages (default: all) even if up to date")
+    parser.add_argument("--max-age", type=float, default=MAX_AGE_HOURS,
+                        help="Hours after which fetch stages run again")
+    parser.add_argument("--github", action="append", default=[], metavar="OWNER/REPO",
+                        help="Also fetch and index this repo's issues (repeatable)")
+    parser.add_argument("--dry-run", action="store_true", help="Show what would run")
+    parser.add_argument("--list", action="store_true", help="List stages and their state")
+    args = parser.parse_args()
+
+    pipeline = Pipeline(stages(args.github))
+    names = pipeline.select(args.stages)
+
+    if args.list:
+        for name in names:
+            record = pipeline.records.get(name) or {}
+            finished = record.get("finished")
+            when = datetime.fromtimestamp(finished, timezone.utc).isoformat(timespec="seconds") if finished else "-"
+            after = ", ".join(sorted(pipeline.deps[name])) or "-"
+            print(f"{name:<32} {record.get('status', 'never run'):<10} {when:<26} after: {after}")
+        return
+
+    started = time.perf_counter()
+    forced = set(args.stages or names) if args.force else set()
+    results = pipeline.run(names, args.jobs, forced, args.max_age * 3600, args.dry_run)
+    print_report(results, time.perf_counter() - started)
+
+    if any(status in ("failed", "blocked") for status, _, _ in results.values()):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,462 @@
+"""
+FAISS index types used by the retrieval index.
+
+    flat      exact inner-product scan (IndexFlatIP)
+    ivf-flat  inverted lists over full vectors      (tuned by nprobe)
+    ivf-pq    inverted lists over PQ-coded vectors   (tuned by nprobe)
+    hnsw      HNSW graph over full vectors           (tuned by ef_search)
+    sq-fp16   exact scan over float16 vectors        (2x smaller)
+    sq8       exact scan over int8 scalar-quantized vectors (4x smaller)
+    pq        exact scan over PQ codes               (pq_m bytes per vector)
+
+Any compressed type can be combined with ``refine`` ("flat" or "fp16"):
+the top ``k_factor * k`` candidates are then re-scored against stored
+exact (or float16) vectors.
+
+build_index() trains and fills an index (IndexBuilder does the same
+from a stream of batches); the parameters it used are
+written next to the index file (``docs.faiss.json``) so rag.search can
+apply the matching search-time settings. recall_report() measures what
+a compressed index costs in recall against the memory it saves.
+"""
+
+import json
+import math
+from pathlib import Path
+
+import faiss
+import numpy as np
+
+
+INDEX_TYPES = ("flat", "ivf-flat", "ivf-pq", "hnsw", "sq-fp16", "sq8", "pq")
+REFINE_TYPES = ("flat", "fp16")
+
+# Types whose codebooks / ranges must be trained before the first add
+TRAINED_TYPES = ("ivf-flat", "ivf-pq", "sq8", "pq")
+
+DEFAULT_PARAMS = {
+    "nlist": None,          # IVF: defaults to ~4 * sqrt(n)
+    "nprobe": 16,           # IVF: lists visited per query
+    "pq_m": 48,             # PQ: sub-quantizers (must divide dim)
+    "pq_nbits": 8,          # PQ: bits per sub-quantizer code
+    "hnsw_m": 32,           # HNSW: graph degree
+    "ef_construction": 200,
+    "ef_search": 128,
+    "refine": None,         # re-score candidates against "flat" / "fp16" vectors
+    "k_factor": 4,          # refine: candidates re-scored per result
+    "train_size": 100_000,  # vectors sampled for IVF/PQ training
+}
+
+# FAISS wants roughly this many training points per centroid
+MIN_POINTS_PER_CENTROID = 39
+
+# Upper bound for efSearch when it is widened for a filtered query
+MAX_EF_SEARCH = 4096
+
+# Vectors decoded at a time by exact_search()
+DECODE_BATCH = 65536
+
+
+def params_path(index_file: Path) -> Path:
+    index_file = Path(index_file)
+    return index_file.with_name(index_file.name + ".json")
+
+
+def default_nlist(n: int) -> int:
+    nlist = int(4 * math.sqrt(max(n, 1)))
+    return max(1, min(nlist, n // MIN_POINTS_PER_CENTROID))
+
+
+def factory_string(index_type: str, dim: int, params: dict) -> str:
+    pq = f"PQ{params['pq_m']}x{params['pq_nbits']}"
+    if index_type in ("ivf-pq", "pq") and dim % params["pq_m"]:
+        raise ValueError(f"pq_m={params['pq_m']} does not divide dimension {dim}")
+
+    factories = {
+        "flat": "Flat",
+        "ivf-flat": f"IVF{params['nlist']},Flat",
+        "ivf-pq": f"IVF{params['nlist']},{pq}",
+        "hnsw": f"HNSW{params['hnsw_m']}",
+        "sq-fp16": "SQfp16",
+        "sq8": "SQ8",
+        # IndexPQ rejects SearchParameters, so service ID selectors could
+        # not be applied; a single inverted list stores the same codes
+        # and does accept them.
+        "pq": f"IVF1,{pq}",
+    }
+    if index_type not in factories:
+        raise ValueError(f"Unknown index type {index_type!r}, expected one of {INDEX_TYPES}")
+
+    factory = factories[index_type]
+
+    refine = params.get("refine")
+    if refine == "flat":
+        factory += ",RFlat"
+    elif refine == "fp16":
+        factory += ",Refine(SQfp16)"
+    elif refine is not None:
+        raise ValueError(f"Unknown refine type {refine!r}, expected one of {REFINE_TYPES}")
+
+    return factory
+
+
+def new_index(index_type: str, dim: int, n: int, **overrides):
+    """
+    Create an empty index of the given type. Returns (index, params);
+    ``n`` is the expected corpus size and only sizes the IVF lists.
+    """
+    params = dict(DEFAULT_PARAMS)
+    params.update({k: v for k, v in overrides.items() if v is not None})
+    if params["nlist"] is None:
+        params["nlist"] = default_nlist(n)
+
+    params["type"] = index_type
+    params["dim"] = dim
+    params["factory"] = factory_string(index_type, dim, params)
+
+    index = faiss.index_factory(dim, params["factory"], faiss.METRIC_INNER_PRODUCT)
+
+    base = faiss.downcast_index(index)
+    if isinstance(base, faiss.IndexRefine):
+        base = base.base_index
+
+    hnsw = _hnsw(base)
+    if hnsw is not None:
+        hnsw.efConstruction = params["ef_construction"]
+
+    return index, params
+
+
+def train(index, vectors: np.ndarray, params: dict):
+    if index.is_trained:
+        return
+
+    sample = vectors
+    if len(vectors) > params["train_size"]:
+        rng = np.random.default_rng(0)
+        sample = vectors[rng.choice(len(vectors), params["train_size"], replace=False)]
+
+    print(f"Training {params['factory']} on {len(sample)} vectors")
+    index.train(np.ascontiguousarray(sample, dtype="float32"))
+
+
+def build_index(vectors: np.ndarray, index_type: str = "flat", **overrides):
+    """Train (if needed) and fill an index. Returns (index, params)."""
+    index, params = new_index(index_type, vectors.shape[1], len(vectors), **overrides)
+    train(index, vectors, params)
+    index.add(vectors)
+    params["ntotal"] = index.ntotal
+    return index, params
+
+
+class IndexBuilder:
+    """
+    Streaming counterpart of build_index(): vectors arrive in batches and
+    are added as they come. Index types that need training buffer the
+    first ``train_size`` vectors, train on them and then add everything;
+    apart from the index itself nothing else grows with the corpus.
+
+    Without an ``expected`` corpus size, IVF lists are sized from the
+    training buffer, which undercounts corpora larger than ``train_size``
+    (pass --nlist to override).
+
+    With ``recall_sample`` the builder also keeps that many of the
+    buffered vectors as queries and tracks their exact top-k over every
+    batch, so report() can measure recall without the full matrix.
+    """
+
+    def __init__(self, index_type: str = "flat", expected: int | None = None,
+                 recall_sample: int = 0, recall_k: int = 10, **overrides):
+        self.index_type = index_type
+        self.expected = expected
+        self.overrides = overrides
+        self.recall_sample = recall_sample
+        self.recall_k = recall_k
+
+        self.index = None
+        self.params = None
+        self._buffer = []
+        self._buffered = 0
+        self._buffer_target = max(recall_sample, 1)
+        if index_type in TRAINED_TYPES:
+            train_size = overrides.get("train_size") or DEFAULT_PARAMS["train_size"]
+            self._buffer_target = max(self._buffer_target, train_size)
+
+        self._queries = None
+        self._truth_scores = None
+        self._truth_ids = None
+
+    @property
+    def ntotal(self) -> int:
+        return (self.index.ntotal if self.index is not None else 0) + self._buffered
+
+    def add(self, vectors: np.ndarray):
+        vectors = np.ascontiguousarray(vectors, dtype="float32")
+        if self.index is None:
+            self._buffer.append(vectors)
+            self._buffered += len(vectors)
+            if self._buffered >= self._buffer_target:
+                self._flush()
+            return
+
+        self._add(vectors)
+
+    def _flush(self):
+        vectors = np.concatenate(self._buffer)
+        self._buffer, self._buffered = [], 0
+
+        n = self.expected or len(vectors)
+        self.index, self.params = new_index(self.index_type, vectors.shape[1], n, **self.overrides)
+        train(self.index, vectors, self.params)
+
+        if self.recall_sample:
+            rng = np.random.default_rng(0)
+            pick = rng.choice(len(vectors), min(self.recall_sample, len(vectors)), replace=False)
+            self._queries = vectors[pick]
+            self._truth_scores = np.full((len(pick), self.recall_k), -np.inf, dtype="float32")
+            self._truth_ids = np.full((len(pick), self.recall_k), -1, dtype=np.int64)
+
+        self._add(vectors)
+
+    def _add(self, vectors: np.ndarray):
+        if self._queries is not None:
+            self._track_truth(vectors, self.index.ntotal)
+        self.index.add(vectors)
+
+    def _track_truth(self, vectors: np.ndarray, start: int):
+        # Exact top-k of the recall queries, merged batch by batch
+        scores = np.concatenate([self._truth_scores, self._queries @ vectors.T], axis=1)
+        ids = np.concatenate([
+            self._truth_ids,
+            np.broadcast_to(np.arange(start, start + len(vectors)), (len(scores), len(vectors))),
+        ], axis=1)
+
+        k = min(self.recall_k, scores.shape[1])
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        self._truth_scores = np.take_along_axis(scores, top, axis=1)
+        self._truth_ids = np.take_along_axis(ids, top, axis=1)
+
+    def finish(self):
+        """Add whatever is still buffered. Returns (index, params)."""
+        if self.index is None:
+            if not self._buffered:
+                raise ValueError("No vectors were added")
+            self._flush()
+        self.params["ntotal"] = self.index.ntotal
+        return self.index, self.params
+
+    def report(self) -> dict:
+        """recall_report() over the tracked queries (requires recall_sample)."""
+        k = min(self.recall_k, self.index.ntotal)
+        # Unfilled slots hold id -1 and sort last
+        truth = -np.sort(-self._truth_ids, axis=1)[:, :k]
+        return _recall(self.index, self.params, self._queries, truth, k, self.index.d)
+
+
+def write_params(index_file: Path, params: dict):
+    params_path(index_file).write_text(json.dumps(params, indent=2))
+
+
+def read_params(index_file: Path, index=None) -> dict:
+    """
+    Parameters recorded at build time. Indexes built before they were
+    recorded are detected from the FAISS structure instead.
+    """
+    path = params_path(index_file)
+    if path.exists():
+        params = dict(DEFAULT_PARAMS)
+        params.update(json.loads(path.read_text()))
+        return params
+
+    params = dict(DEFAULT_PARAMS)
+    params["type"] = detect_type(index) if index is not None else "flat"
+    return params
+
+
+def detect_type(index) -> str:
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexRefine):
+        index = faiss.downcast_index(index.base_index)
+
+    if _hnsw(index) is not None:
+        return "hnsw"
+    ivf = _ivf(index)
+    if ivf is not None:
+        if isinstance(faiss.downcast_index(ivf), faiss.IndexIVFPQ):
+            return "pq" if ivf.nlist == 1 else "ivf-pq"
+        return "ivf-flat"
+    if isinstance(index, faiss.IndexScalarQuantizer):
+        return "sq8" if index.sq.qtype == faiss.ScalarQuantizer.QT_8bit else "sq-fp16"
+    if isinstance(index, faiss.IndexPQ):
+        return "pq"
+    return "flat"
+
+
+def search_parameters(index, params: dict, selector=None, fraction: float = 1.0):
+    """
+    faiss.SearchParameters for one query batch: the type-specific tuning
+    knobs plus an optional ID selector. Returns None when nothing applies.
+
+    ``fraction`` is the share of the index the selector lets through.
+    The selector only filters what the probes reach, so nprobe and
+    efSearch are widened by 1 / fraction to reach about as many
+    matching vectors as an unfiltered query would.
+    """
+    refine = faiss.downcast_index(index)
+    if isinstance(refine, faiss.IndexRefine):
+        base_params = search_parameters(refine.base_index, params, selector, fraction)
+        return faiss.IndexRefineSearchParameters(
+            k_factor=params["k_factor"],
+            base_index_params=base_params,
+            sel=selector,
+        )
+
+    widen = 1 / max(fraction, 1e-6)
+    ivf = _ivf(index)
+    if ivf is not None:
+        nprobe = min(ivf.nlist, math.ceil(params["nprobe"] * widen))
+        return faiss.SearchParametersIVF(sel=selector, nprobe=nprobe)
+    if _hnsw(index) is not None:
+        ef_search = min(max(MAX_EF_SEARCH, params["ef_search"]), math.ceil(params["ef_search"] * widen))
+        return faiss.SearchParametersHNSW(sel=selector, efSearch=ef_search)
+    if selector is not None:
+        return faiss.SearchParameters(sel=selector)
+    return None
+
+
+def _ivf(index):
+    try:
+        return faiss.extract_index_ivf(index)
+    except RuntimeError:
+        return None
+
+
+def _hnsw(index):
+    index = faiss.downcast_index(index)
+    return index.hnsw if isinstance(index, faiss.IndexHNSW) else None
+
+
+# ------------------------------------------------------------
+# Compression report
+# ------------------------------------------------------------
+
+def memory_bytes(index) -> int:
+    """Serialized size of the index, i.e. what it occupies once loaded."""
+    return int(faiss.serialize_index(index).nbytes)
+
+
+def prepare_decode(index):
+    """
+    Make ``index`` decodable by id. This may modify the index the first
+    time, so callers sharing it with searching threads serialize the call.
+    """
+    _ensure_direct_map(index)
+
+
+def _ensure_direct_map(index):
+    # IVF indexes can only decode by id once they have an id -> list map
+    ivf = _ivf(index)
+    if ivf is not None and ivf.direct_map.type == faiss.DirectMap.NoMap:
+        ivf.make_direct_map()
+
+
+def reconstruct_all(index) -> np.ndarray:
+    """
+    Decode every stored vector. Exact for flat indexes, lossy for
+    compressed ones.
+    """
+    _ensure_direct_map(index)
+    return index.reconstruct_n(0, index.ntotal)
+
+
+def iter_vectors(index, batch_size: int = 1024):
+    """Decode the stored vectors in consecutive blocks (see reconstruct_all)."""
+    _ensure_direct_map(index)
+    for start in range(0, index.ntotal, batch_size):
+        yield index.reconstruct_n(start, min(batch_size, index.ntotal - start))
+
+
+def reconstruct(index, ids) -> np.ndarray:
+    """Decode the vectors with the given ids (see reconstruct_all)."""
+    _ensure_direct_map(index)
+    return index.reconstruct_batch(np.asarray(ids, dtype=np.int64))
+
+
+def top_k(queries: np.ndarray, vectors: np.ndarray, ids: np.ndarray, k: int):
+    """
+    Exact inner-product top ``k`` of ``queries`` over ``vectors``
+    (labelled ``ids``). Returns (scores, ids) shaped like index.search(),
+    padded with -1 ids when there are fewer than k vectors.
+    """
+    scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+    labels = np.full((len(queries), k), -1, dtype=np.int64)
+    n = min(k, len(ids))
+    if n == 0:
+        return scores, labels
+
+    sims = queries @ vectors.T
+    top = np.argpartition(-sims, n - 1, axis=1)[:, :n]
+    top_sims = np.take_along_axis(sims, top, axis=1)
+    order = np.argsort(-top_sims, axis=1, kind="stable")
+    scores[:, :n] = np.take_along_axis(top_sims, order, axis=1)
+    labels[:, :n] = np.asarray(ids, dtype=np.int64)[np.take_along_axis(top, order, axis=1)]
+    return scores, labels
+
+
+def exact_search(index, queries: np.ndarray, ids: np.ndarray, k: int):
+    """
+    top_k() over the stored vectors of ``ids``, decoded DECODE_BATCH at
+    a time (exact for flat indexes, lossy for compressed ones).
+    """
+    scores, labels = top_k(queries, np.zeros((0, index.d), dtype=np.float32), ids[:0], k)
+    for start in range(0, len(ids), DECODE_BATCH):
+        batch = ids[start:start + DECODE_BATCH]
+        s, i = top_k(queries, reconstruct(index, batch), batch, k)
+        both_scores = np.concatenate([scores, s], axis=1)
+        both_ids = np.concatenate([labels, i], axis=1)
+        order = np.argsort(-both_scores, axis=1, kind="stable")[:, :k]
+        scores = np.take_along_axis(both_scores, order, axis=1)
+        labels = np.take_along_axis(both_ids, order, axis=1)
+    return scores, labels
+
+
+def recall_report(index, vectors: np.ndarray, params: dict,
+                  k: int = 10, sample: int = 200) -> dict:
+    """
+    Memory used by ``index`` against recall@k on ``sample`` of its own
+    (exact) vectors used as queries, relative to an exact flat search.
+    """
+    rng = np.random.default_rng(0)
+    queries = vectors[rng.choice(len(vectors), min(sample, len(vectors)), replace=False)]
+    k = min(k, len(vectors))
+
+    _, truth = faiss.knn(queries, vectors, k, metric=faiss.METRIC_INNER_PRODUCT)
+    return _recall(index, params, queries, truth, k, vectors.shape[1])
+
+
+def _recall(index, params: dict, queries: np.ndarray, truth: np.ndarray,
+            k: int, dim: int) -> dict:
+    _, found = index.search(queries, k, params=search_parameters(index, params))
+
+    # Only the ids matter, so the order of each truth row is irrelevant
+    hits = sum(len(set(t) & set(f)) for t, f in zip(truth, found))
+    recall = hits / (len(queries) * k)
+
+    exact_bytes = index.ntotal * dim * 4
+    used_bytes = memory_bytes(index)
+
+    report = {
+        "factory": params.get("factory"),
+        "vectors": int(index.ntotal),
+        "memory_bytes": used_bytes,
+        "float32_bytes": exact_bytes,
+        "compression": round(exact_bytes / max(used_bytes, 1), 2),
+        f"recall@{k}": round(recall, 4),
+        "queries": len(queries),
+    }
+
+    print(f"Index {report['factory']}: {used_bytes / 2**20:.1f} MiB "
+          f"(float32: {exact_bytes / 2**20:.1f} MiB, {report['compression']}x), "
+          f"recall@{k} = {recall:.3f} over {len(queries)} queries")
+
+    return report
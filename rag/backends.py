@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+
+"""
+Embedding backends shared by the index builders and query-time search.
+
+    torch      sentence-transformers on PyTorch (reference)
+    onnx       the same model exported to ONNX, run by ONNX Runtime
+    onnx-int8  the ONNX export with int8 dynamic quantization of the
+               weights, the cheapest option on CPU
+
+Every backend returns L2-normalized float32 embeddings of the same
+model. ``name`` identifies the backend in embedding caches, so vectors
+from different backends are never mixed in one cache. The default comes
+from EMBEDDING_BACKEND and falls back to torch.
+
+The ONNX backends load a local export (graph, tokenizer, pooling config)
+from data/models/. Create it once, then verify it against the reference:
+
+    python -m rag.backends export --quantize
+    python -m rag.backends check --backend onnx-int8
+"""
+
+import argparse
+import json
+import os
+import random
+from pathlib import Path
+
+import numpy as np
+
+
+MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+
+BACKENDS = ("torch", "onnx", "onnx-int8")
+DEFAULT_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+
+ONNX_ROOT = Path("data/models")
+ONNX_FILE = "model.onnx"
+ONNX_INT8_FILE = "model.int8.onnx"
+CONFIG_FILE = "embedding.json"
+
+# Maximum allowed drop in cosine similarity from 1.0 (vs. the reference) for `check` to pass
+DEFAULT_TOLERANCE = 0.02
+
+CHECK_SAMPLE = 256
+CHECK_QUERIES = [
+    "allocation candidates not found",
+    "No valid host was found. There are not enough hosts available.",
+    "how to configure live migration",
+    "neutron port binding failed",
+    "instance stuck in BUILD state",
+]
+
+
+def onnx_dir(model_name: str = MODEL_NAME) -> Path:
+    return ONNX_ROOT / model_name.replace("/", "__")
+
+
+def backend_name(kind: str, model_name: str = MODEL_NAME) -> str:
+    # torch keeps the bare model name so existing caches stay valid
+    return model_name if kind == "torch" else f"{model_name}@{kind}"
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return (vectors / np.maximum(norms, 1e-12)).astype("float32")
+
+
+# ------------------------------------------------------------
+# Backends
+# ------------------------------------------------------------
+
+class EmbeddingBackend:
+    """encode(texts) -> normalized float32 matrix of shape (len(texts), dim)."""
+
+    kind = None
+
+    def __init__(self, model_name: str = MODEL_NAME):
+        self.model_name = model_name
+        self.name = backend_name(self.kind, model_name)
+
+    def encode(self, texts: list[str], batch_size: int = 32) -> np.ndarray:
+        raise NotImplementedError
+
+
+class TorchBackend(EmbeddingBackend):
+
+    kind = "torch"
+
+    def __init__(self, model_name: str = MODEL_NAME, threads: int | None = None):
+        super().__init__(model_name)
+        # Deferred: importing sentence_transformers pulls in torch
+        import torch
+        from sentence_transformers import SentenceTransformer
+
+        if threads:
+            torch.set_num_threads(threads)
+        self.model = SentenceTransformer(model_name)
+        self.dim = self.model.get_sentence_embedding_dimension()
+
+    def encode(self, texts: list[str], batch_size: int = 32) -> np.ndarray:
+        return np.asarray(self.model.encode(
+            texts,
+            batch_size=batch_size,
+            show_progress_bar=False,
+            normalize_embeddings=True,
+        ), dtype="float32")
+
+
+class OnnxBackend(EmbeddingBackend):
+    """
+    Transformer graph in ONNX Runtime; tokenization (HF tokenizers) and
+    mean pooling happen here, mirroring the sentence-transformers
+    pipeline of the exported model.
+    """
+
+    kind = "onnx"
+
+    def __init__(self, model_name: str = MODEL_NAME, quantized: bool = False,
+                 model_dir: Path | None = None, threads: int | None = None):
+        self.kind = "onnx-int8" if quantized else "onnx"
+        super().__init__(model_name)
+
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        self.model_dir = Path(model_dir or onnx_dir(model_name))
+        path = self.model_dir / (ONNX_INT8_FILE if quantized else ONNX_FILE)
+        if not path.exists():
+            hint = " --quantize" if quantized else ""
+            raise FileNotFoundError(
+                f"{path} not found; export it with: python -m rag.backends export{hint}"
+            )
+
+        config = json.loads((self.model_dir / CONFIG_FILE).read_text())
+        self.dim = config["dim"]
+
+        self.tokenizer = Tokenizer.from_file(str(self.model_dir / "tokenizer.json"))
+        self.tokenizer.enable_truncation(config["max_seq_length"])
+        self.tokenizer.enable_padding(pad_id=config["pad_token_id"], pad_token=config["pad_token"])
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(str(path), options, providers=["CPUExecutionProvider"])
+        self.inputs = {i.name for i in self.session.get_inputs()}
+
+    def encode(self, texts: list[str], batch_size: int = 32) -> np.ndarray:
+        out = np.empty((len(texts), self.dim), dtype="float32")
+
+        for start in range(0, len(texts), batch_size):
+            encoded = self.tokenizer.encode_batch(texts[start:start + batch_size])
+            mask = np.array([e.attention_mask for e in encoded], dtype=np.int64)
+            feed = {
+                "input_ids": np.array([e.ids for e in encoded], dtype=np.int64),
+                "attention_mask": mask,
+            }
+            if "token_type_ids" in self.inputs:
+                feed["token_type_ids"] = np.array([e.type_ids for e in encoded], dtype=np.int64)
+
+            hidden = self.session.run(None, feed)[0]
+
+            # Mean over real (unpadded) tokens
+            weights = mask[:, :, None].astype("float32")
+            pooled = (hidden * weights).sum(axis=1) / np.maximum(weights.sum(axis=1), 1e-9)
+            out[start:start + len(encoded)] = _normalize(pooled)
+
+        return out
+
+
+def load_backend(kind: str | None = None, model_name: str = MODEL_NAME,
+                 threads: int | None = None) -> EmbeddingBackend:
+    kind = kind or DEFAULT_BACKEND
+    if kind == "torch":
+        return TorchBackend(model_name, threads=threads)
+    if kind in ("onnx", "onnx-int8"):
+        return OnnxBackend(model_name, quantized=kind == "onnx-int8", threads=threads)
+    raise ValueError(f"Unknown embedding backend {kind!r}, expected one of {BACKENDS}")
+
+
+# ------------------------------------------------------------
+# Export and agreement check
+# ------------------------------------------------------------
+
+def _pooling_mode(pooling) -> str:
+    config = pooling.get_config_dict()
+    if "pooling_mode" in config:
+        return config["pooling_mode"]
+    # Older sentence-transformers: one boolean flag per mode
+    flags = [k[len("pooling_mode_"):] for k, v in config.items()
+             if k.startswith("pooling_mode_") and v is True]
+    return "+".join(flags)
+
+
+def export_onnx(model_name: str = MODEL_NAME, out_dir: Path | None = None,
+                quantize: bool = False) -> Path:
+    """
+    Export the transformer of a sentence-transformers model to ONNX,
+    with its tokenizer and pooling config; optionally also write an
+    int8 dynamically quantized copy.
+    """
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    out_dir = Path(out_dir or onnx_dir(model_name))
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    st = SentenceTransformer(model_name, device="cpu")
+    transformer = st[0]
+    pooling = _pooling_mode(st[1])
+    if pooling not in ("mean", "mean_tokens"):
+        raise ValueError(f"Only mean pooling is supported, {model_name} uses {pooling}")
+
+    tokenizer = transformer.tokenizer
+    sample = tokenizer(["export sample", "a second, longer export sample"],
+                       padding=True, return_tensors="pt")
+    input_names = [n for n in ("input_ids", "attention_mask", "token_type_ids") if n in sample]
+
+    class Encoder(torch.nn.Module):
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+
+        def forward(self, *inputs):
+            return self.model(**dict(zip(input_names, inputs))).last_hidden_state
+
+    model_path = out_dir / ONNX_FILE
+    print(f"Exporting {model_name} → {model_path}")
+    torch.onnx.export(
+        Encoder(transformer.auto_model).eval(),
+        tuple(sample[n] for n in input_names),
+        str(model_path),
+        input_names=input_names,
+        output_names=["last_hidden_state"],
+        dynamic_axes={n: {0: "batch", 1: "sequence"} for n in input_names + ["last_hidden_state"]},
+        opset_version=17,
+        dynamo=False,
+    )
+
+    tokenizer.save_pretrained(out_dir)
+    config = {
+        "model": model_name,
+        "dim": st.get_sentence_embedding_dimension(),
+        "max_seq_length": st.max_seq_length,
+        "pooling": "mean",
+        "pad_token": tokenizer.pad_token,
+        "pad_token_id": tokenizer.pad_token_id,
+    }
+    (out_dir / CONFIG_FILE).write_text(json.dumps(config, indent=2))
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        print(f"Quantizing weights to int8 → {out_dir / ONNX_INT8_FILE}")
+        quantize_dynamic(str(model_path), str(out_dir / ONNX_INT8_FILE), weight_type=QuantType.QInt8)
+
+    print(f"✔ ONNX export in {out_dir}")
+    return out_dir
+
+
+def sample_texts(meta_dir: Path | None, n: int = CHECK_SAMPLE) -> list[str]:
+    """Chunk texts from the metadata store plus typical queries."""
+    texts = list(CHECK_QUERIES)
+    if meta_dir and (Path(meta_dir) / "header.json").exists():
+        from rag.meta_store import MetaStore
+
+        meta = MetaStore(meta_dir)
+        rows = random.Random(0).sample(range(len(meta)), min(n, len(meta)))
+        texts += [meta.get(row).get("text") or "" for row in rows]
+    return texts
+
+
+def check_agreement(reference: EmbeddingBackend, candidate: EmbeddingBackend,
+                    texts: list[str], tolerance: float = DEFAULT_TOLERANCE) -> dict:
+    """
+    Cosine similarity between the two backends' embeddings of the same
+    texts. Passes when every text is within ``tolerance`` of 1.0.
+    """
+    a = reference.encode(texts)
+    b = candidate.encode(texts)
+    cosine = (a * b).sum(axis=1)
+
+    report = {
+        "reference": reference.name,
+        "candidate": candidate.name,
+        "texts": len(texts),
+        "min_cosine": round(float(cosine.min()), 6),
+        "mean_cosine": round(float(cosine.mean()), 6),
+        "max_abs_diff": round(float(np.abs(a - b).max()), 6),
+        "tolerance": tolerance,
+        "ok": bool(cosine.min() >= 1.0 - tolerance),
+    }
+    print(json.dumps(report, indent=2))
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    export = sub.add_parser("export", help="Export the model to ONNX")
+    export.add_argument("--model", default=MODEL_NAME)
+    export.add_argument("--output", help="Export directory (default: data/models/<model>)")
+    export.add_argument("--quantize", action="store_true", help="Also write an int8 copy")
+
+    check = sub.add_parser("check", help="Compare a backend against torch")
+    check.add_argument("--model", default=MODEL_NAME)
+    check.add_argument("--backend", default="onnx-int8", choices=BACKENDS)
+    check.add_argument("--reference", default="torch", choices=BACKENDS)
+    check.add_argument("--meta", help="Metadata store to sample chunk texts from "
+                                       "(default: the published index snapshot)")
+    check.add_argument("--sample", type=int, default=CHECK_SAMPLE)
+    check.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                       help="Allowed 1 - cosine similarity per text")
+
+    args = parser.parse_args()
+
+    if args.command == "export":
+        export_onnx(args.model, args.output, quantize=args.quantize)
+        return
+
+    if args.meta:
+        meta_dir = Path(args.meta)
+    else:
+        from rag import snapshots
+        meta_dir = snapshots.layout(snapshots.resolve())[1]
+
+    texts = sample_texts(meta_dir, args.sample)
+    report = check_agreement(
+        load_backend(args.reference, args.model),
+        load_backend(args.backend, args.model),
+        texts,
+        tolerance=args.tolerance,
+    )
+    raise SystemExit(0 if report["ok"] else 1)
+
+
+if __name__ == "__main__":
+    main()
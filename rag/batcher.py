@@ -0,0 +1,80 @@
+"""
+Micro-batching of query encodings across concurrent callers.
+
+Each caller blocks in encode() while a single worker thread gathers
+pending requests for up to ``max_wait_ms`` (or until ``max_batch`` texts
+are queued) and runs them through the model in one call. Under load this
+turns many single-query forward passes into a few batched ones.
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+
+class EmbeddingBatcher:
+
+    def __init__(self, encode_fn, max_batch: int = 64, max_wait_ms: float = 5.0):
+        self.encode_fn = encode_fn
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+
+        self.batches = 0
+        self.texts = 0
+
+        self._queue = queue.Queue()
+        self._worker = threading.Thread(target=self._run, name="embed-batcher", daemon=True)
+        self._worker.start()
+
+    def encode(self, texts: list[str]) -> np.ndarray:
+        future = Future()
+        self._queue.put((list(texts), future))
+        return future.result()
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "texts": self.texts,
+            "avg_batch": round(self.texts / self.batches, 2) if self.batches else 0.0,
+        }
+
+    def _collect(self):
+        pending = [self._queue.get()]
+        size = len(pending[0][0])
+        deadline = time.monotonic() + self.max_wait
+
+        while size < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            pending.append(item)
+            size += len(item[0])
+
+        return pending
+
+    def _run(self):
+        while True:
+            pending = self._collect()
+            texts = [t for batch, _ in pending for t in batch]
+
+            try:
+                embs = self.encode_fn(texts)
+            except Exception as e:
+                for _, future in pending:
+                    future.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.texts += len(texts)
+
+            start = 0
+            for batch, future in pending:
+                future.set_result(embs[start:start + len(batch)])
+                start += len(batch)
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+
+"""
+Compaction: rewrite the FAISS index, metadata store and BM25 index
+without tombstoned rows.
+
+Upserts and deletes only tombstone rows (see rag.meta_store), so after
+many of them the index carries dead vectors that every query still has
+to skip. Vectors of live rows come from the embedding cache where
+possible and are otherwise decoded from the index itself.
+
+Usage:
+    python -m rag.compact
+
+compacts a copy of the published index snapshot and publishes it (see
+rag.snapshots). To compact files in place instead:
+
+    python -m rag.compact \
+        --index data/processed/index/docs.faiss \
+        --meta data/processed/index/docs_meta \
+        --bm25 data/processed/index/bm25
+"""
+
+import argparse
+import shutil
+from pathlib import Path
+
+import faiss
+import numpy as np
+
+from rag import ann, lexical, shards, snapshots
+from rag.backends import MODEL_NAME
+from rag.embed_cache import EmbeddingCache, content_key
+from rag.meta_store import MetaStore, MetaStoreWriter
+
+
+BATCH_SIZE = 1024
+
+
+def _replace_dir(new: Path, target: Path):
+    old = target.with_name(target.name + ".old")
+    if old.exists():
+        shutil.rmtree(old)
+    if target.exists():
+        target.rename(old)
+    new.rename(target)
+    if old.exists():
+        shutil.rmtree(old)
+
+
+def live_vectors(index, cache: EmbeddingCache, records: list[dict], rows: np.ndarray):
+    """
+    Vectors of the live rows: exact from the embedding cache when the
+    chunk text is cached, decoded from ``index`` otherwise. Returns
+    (vectors, number decoded).
+    """
+    keys = np.array([content_key(cache.model_name, r.get("text") or "") for r in records], dtype=np.uint64)
+    cached = cache.lookup(keys)
+
+    vectors = np.zeros((len(records), index.d), dtype="float32")
+    hit = cached >= 0
+    if hit.any():
+        vectors[hit] = cache.vectors(cached[hit])
+    if (~hit).any():
+        vectors[~hit] = ann.reconstruct(index, rows[~hit])
+
+    return vectors, int((~hit).sum())
+
+
+def _skip(meta: MetaStore) -> bool:
+    """Whether there is nothing (or nothing sensible) to compact, saying why."""
+    if meta.n_deleted == 0:
+        print("Nothing to compact")
+        return True
+    if meta.n_deleted == meta.count:
+        # FAISS can't train or build most index types from no vectors
+        print(f"⚠ All {meta.count} rows are deleted; not compacting to an empty index. "
+              f"Rebuild or remove the index instead.")
+        return True
+    return False
+
+
+def compact(index_path: Path, meta_dir: Path, bm25_dir: Path):
+    """
+    Compact in place; returns the new index, or None if nothing was
+    deleted or every row was (see _skip).
+    """
+    meta = MetaStore(meta_dir)
+    if _skip(meta):
+        return None
+
+    live = np.flatnonzero(meta.deleted == 0)
+    print(f"Compacting {meta.count} rows → {len(live)} live rows")
+
+    index = faiss.read_index(str(index_path))
+    params = ann.read_params(index_path, index)
+
+    overrides = {k: params.get(k) for k in ann.DEFAULT_PARAMS if k != "nlist"}
+    builder = ann.IndexBuilder(params["type"], expected=len(live), **overrides)
+    # Cache of the backend the index was embedded with
+    cache = EmbeddingCache(params.get("embedding") or MODEL_NAME)
+    decoded = 0
+
+    # Live rows are copied batch by batch into the new index and stores
+    new_meta = meta_dir.with_name(meta_dir.name + ".compact")
+    with MetaStoreWriter(new_meta) as writer:
+        for start in range(0, len(live), BATCH_SIZE):
+            rows = live[start:start + BATCH_SIZE]
+            records = [meta.get(int(row)) for row in rows]
+
+            vectors, n = live_vectors(index, cache, records, rows)
+            builder.add(vectors)
+            decoded += n
+
+            for record in records:
+                writer.add(record)
+
+    print(f"Vectors: {len(live) - decoded} from embedding cache, {decoded} decoded from index")
+    new_index, new_params = builder.finish()
+    if params.get("embedding"):
+        new_params["embedding"] = params["embedding"]
+
+    new_bm25 = bm25_dir.with_name(bm25_dir.name + ".compact")
+    lexical.build_from_meta(new_meta, new_bm25)
+
+    tmp_index = index_path.with_name(index_path.name + ".compact")
+    faiss.write_index(new_index, str(tmp_index))
+
+    tmp_index.replace(index_path)
+    ann.write_params(index_path, new_params)
+    _replace_dir(new_meta, meta_dir)
+    _replace_dir(new_bm25, bm25_dir)
+
+    print(f"✔ Compacted index: {new_index.ntotal} vectors")
+    return new_index
+
+
+def compact_snapshot(index_dir: Path = snapshots.INDEX_DIR, keep: int = snapshots.KEEP):
+    """Compact a copy of the published snapshot and publish it."""
+    published = snapshots.resolve(index_dir)
+    meta = MetaStore(snapshots.layout(published)[1])
+    if _skip(meta):
+        return
+
+    # Build details that compaction doesn't change (see rag.index)
+    old = snapshots.read_manifest(published) or {}
+    snapshot = snapshots.clone(index_dir)
+    index_path, meta_dir, bm25_dir = snapshots.layout(snapshot)
+    index = compact(index_path, meta_dir, bm25_dir)
+    params = ann.read_params(index_path, index)
+
+    snapshots.write_manifest(
+        snapshot, model=params.get("embedding") or MODEL_NAME, dim=index.d,
+        count=index.ntotal, index_type=params["type"],
+        **{k: old[k] for k in ("shard", "dedup") if k in old},
+    )
+    snapshots.publish(snapshot, index_dir)
+    snapshots.prune(index_dir, keep)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--index-dir", default=str(snapshots.INDEX_DIR),
+                        help="Snapshot root (ignored with --index)")
+    parser.add_argument("--shard", default=shards.MAIN_SHARD, help="Shard to compact (see rag.shards)")
+    parser.add_argument("--keep", type=int, default=snapshots.KEEP,
+                        help="Older snapshots kept for rollback")
+    parser.add_argument("--index", help="Compact this FAISS index in place instead of a snapshot")
+    parser.add_argument("--meta", help="Metadata store directory (with --index)")
+    parser.add_argument("--bm25", help="BM25 index directory (default: bm25/ next to the index)")
+    args = parser.parse_args()
+
+    if bool(args.index) != bool(args.meta):
+        parser.error("--index and --meta go together")
+
+    if not args.index:
+        compact_snapshot(shards.shard_root(args.shard, Path(args.index_dir)), args.keep)
+        return
+
+    index_path = Path(args.index)
+    bm25_dir = Path(args.bm25) if args.bm25 else index_path.parent / "bm25"
+    compact(index_path, Path(args.meta), bm25_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""
+Duplicate and near-duplicate chunks.
+
+The same text reaches the index many times: release notes repeated on
+every stable branch, admin docs that are also rendered into the main
+docs, quoted tracebacks in GitHub threads. rag.index passes every chunk
+through a Deduplicator before embedding. A chunk that repeats one
+already kept is not embedded or stored; instead its provenance (id,
+source, service, version, url, ...) is linked to the kept row, and
+search results carry it as "duplicates".
+
+Two checks:
+
+    exact   blake2b of the chunk's tokens (lowercased words), so
+            whitespace, case and punctuation changes still match
+    near    MinHash of token 3-gram shingles with LSH banding;
+            candidates sharing a band are confirmed when their
+            estimated Jaccard similarity reaches THRESHOLD
+
+Chunks are compared within a shard and service, in build order; the
+first occurrence is kept. The kept row carries one service, so folding
+chunks of different services would hide the text from the other
+service's filtered searches. Memory grows with the unique chunks: about 100
+bytes each for exact matching and about 1 KB for near matching, so
+very large builds may prefer --dedup exact.
+
+Incremental updates (ingest.github.index_github) do not deduplicate;
+the next full build does.
+"""
+
+import hashlib
+
+import numpy as np
+
+from rag.tokens import token_ids, tokenize
+
+
+MODES = ("none", "exact", "near")
+DEFAULT_MODE = "near"
+
+# Estimated Jaccard similarity at which two chunks count as duplicates
+THRESHOLD = 0.85
+
+# Tokens per shingle
+SHINGLE = 3
+
+# MinHash signature: BANDS bands of NUM_PERM // BANDS values; chunks
+# sharing any band are compared. Eight bands of eight find pairs at
+# THRESHOLD about 90% of the time and rarely compare pairs below 0.5.
+NUM_PERM = 64
+BANDS = 8
+
+# Fields of a duplicate chunk kept as provenance on the row it repeats
+PROVENANCE_FIELDS = ("id", "source", "service", "version", "url", "repo", "file_path", "heading")
+
+_rng = np.random.default_rng(0x5EED)
+_MULT = _rng.integers(1, 1 << 63, NUM_PERM, dtype=np.uint64) | np.uint64(1)
+_ADD = _rng.integers(0, 1 << 63, NUM_PERM, dtype=np.uint64)
+_SHINGLE_MULT = np.array([0x9E3779B97F4A7C15, 0xC2B2AE3D27D4EB4F, 0x165667B19E3779F9],
+                         dtype=np.uint64)
+
+
+def content_key(text: str) -> int:
+    """64-bit key of a chunk's normalized text."""
+    normalized = " ".join(tokenize(text)).encode("utf-8")
+    return int.from_bytes(hashlib.blake2b(normalized, digest_size=8).digest(), "little")
+
+
+def minhash(text: str) -> np.ndarray:
+    """NUM_PERM-value MinHash signature (uint32) of the text's token shingles."""
+    ids = token_ids(text).astype(np.uint64)
+    if len(ids) == 0:
+        return np.zeros(NUM_PERM, dtype=np.uint32)
+
+    # Shingles of SHINGLE consecutive tokens (or the whole text if shorter)
+    n = max(len(ids) - SHINGLE + 1, 1)
+    shingles = np.zeros(n, dtype=np.uint64)
+    for j in range(min(SHINGLE, len(ids))):
+        shingles ^= ids[j:j + n] * _SHINGLE_MULT[j]
+    shingles = np.unique(shingles)
+
+    # Multiply-shift hashes, one per permutation (uint64 arithmetic wraps)
+    hashes = (shingles[:, None] * _MULT[None, :] + _ADD[None, :]) >> np.uint64(32)
+    return hashes.min(axis=0).astype(np.uint32)
+
+
+def provenance(chunk: dict) -> dict:
+    return {f: chunk[f] for f in PROVENANCE_FIELDS if chunk.get(f) is not None}
+
+
+class Deduplicator:
+    """
+    Assigns each new chunk the next row, or reports the row of the
+    chunk it duplicates. Rows count kept chunks only, so they match the
+    rows of the metadata store the kept chunks are written to.
+    """
+
+    def __init__(self, mode: str = DEFAULT_MODE, threshold: float = THRESHOLD):
+        if mode not in MODES:
+            raise ValueError(f"Unknown dedup mode {mode!r}, expected one of {MODES}")
+        self.mode = mode
+        self.threshold = threshold
+
+        self.rows = 0
+        self.exact = 0
+        self.near = 0
+
+        self._keys = {}
+        self._bands = [{} for _ in range(BANDS)]
+        self._signatures = np.zeros((1024, NUM_PERM), dtype=np.uint32)
+
+    def check(self, chunk: dict) -> int | None:
+        """Row of the kept chunk this one duplicates, or None if it is new."""
+        if self.mode == "none":
+            self.rows += 1
+            return None
+
+        text = chunk.get("text") or ""
+        service = chunk.get("service")
+        key = (service, content_key(text))
+        row = self._keys.get(key)
+        if row is not None:
+            self.exact += 1
+            return row
+
+        if self.mode == "near":
+            signature = minhash(text)
+            row = self._near(service, signature)
+            if row is not None:
+                self.near += 1
+                return row
+            self._remember(service, signature)
+
+        self._keys[key] = self.rows
+        self.rows += 1
+        return None
+
+    def _near(self, service, signature) -> int | None:
+        candidates = {
+            table[band]
+            for table, band in zip(self._bands, self._band_keys(service, signature))
+            if band in table
+        }
+        best, best_score = None, self.threshold
+        for row in candidates:
+            score = float(np.mean(self._signatures[row] == signature))
+            if score >= best_score:
+                best, best_score = row, score
+        return best
+
+    def _remember(self, service, signature):
+        if self.rows == len(self._signatures):
+            grown = np.zeros((2 * len(self._signatures), NUM_PERM), dtype=np.uint32)
+            grown[:self.rows] = self._signatures
+            self._signatures = grown
+        self._signatures[self.rows] = signature
+
+        for table, band in zip(self._bands, self._band_keys(service, signature)):
+            table.setdefault(band, self.rows)
+
+    def _band_keys(self, service, signature):
+        width = NUM_PERM // BANDS
+        return [(service, signature[b * width:(b + 1) * width].tobytes()) for b in range(BANDS)]
+
+    def stats(self) -> dict:
+        return {
+            "mode": self.mode,
+            "kept": self.rows,
+            "exact_duplicates": self.exact,
+            "near_duplicates": self.near,
+        }
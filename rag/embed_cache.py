@@ -0,0 +1,216 @@
+"""
+Persistent content-hash embedding cache.
+
+Embeddings are keyed by a 64-bit BLAKE2b hash of (model name, chunk
+text), so a rebuild only embeds chunks that are new or whose text
+changed, and any index type can be rebuilt from the stored vectors.
+One directory per model:
+
+    header.json  model name, dimension, row count
+    keys.u64     content hash of every row
+    vectors.f32  row-major float32 matrix, memory-mapped on read
+
+Lookups go through a sorted copy of the keys (binary search), so the
+resident index is 16 bytes per cached chunk.
+
+Several processes may share a directory (e.g. the pipeline's index and
+index-github stages): appends and the header update happen under an
+exclusive lock on ``lock``, after picking up rows other processes
+appended since.
+"""
+
+import fcntl
+import hashlib
+import json
+import os
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+
+
+CACHE_ROOT = Path("data/processed/embeddings")
+
+KEY_DTYPE = np.dtype("<u8")
+VECTOR_DTYPE = np.dtype("<f4")
+
+# New keys kept in a dict before re-sorting the key index
+PENDING_LIMIT = 65_536
+
+HEADER_FILE = "header.json"
+KEYS_FILE = "keys.u64"
+VECTORS_FILE = "vectors.f32"
+LOCK_FILE = "lock"
+
+
+def cache_dir(model_name: str, root: Path = CACHE_ROOT) -> Path:
+    return Path(root) / model_name.replace("/", "__")
+
+
+def content_key(model_name: str, text: str) -> int:
+    digest = hashlib.blake2b(digest_size=8)
+    digest.update(model_name.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(text.encode("utf-8"))
+    return int.from_bytes(digest.digest(), "little")
+
+
+class EmbeddingCache:
+    """
+    Append-only embedding store for one model.
+    """
+
+    def __init__(self, model_name: str, root: Path = CACHE_ROOT):
+        self.model_name = model_name
+        self.path = cache_dir(model_name, root)
+        self.path.mkdir(parents=True, exist_ok=True)
+
+        self.dim = None
+        self.count = 0
+        self.hits = 0
+        self.misses = 0
+
+        with self._locked():
+            self._read_header()
+            self._discard_partial_append()
+
+        self._index_keys()
+        self._vectors = None
+
+    # --------------------------------------------------------
+    # Storage
+    # --------------------------------------------------------
+
+    @contextmanager
+    def _locked(self):
+        with (self.path / LOCK_FILE).open("a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _read_header(self):
+        header_file = self.path / HEADER_FILE
+        if header_file.exists():
+            header = json.loads(header_file.read_text())
+            self.dim = header["dim"]
+            self.count = header["count"]
+
+    def _discard_partial_append(self):
+        """
+        The header is written last, so bytes past ``count`` rows belong to
+        an interrupted append; drop them before appending again.
+        """
+        sizes = {
+            KEYS_FILE: self.count * KEY_DTYPE.itemsize,
+            VECTORS_FILE: self.count * (self.dim or 0) * VECTOR_DTYPE.itemsize,
+        }
+        for name, size in sizes.items():
+            path = self.path / name
+            if path.exists() and path.stat().st_size > size:
+                os.truncate(path, size)
+
+    def _index_keys(self):
+        keys = self._keys()
+        self._order = np.argsort(keys, kind="stable")
+        self._sorted_keys = keys[self._order]
+        self._pending = {}  # key -> row, appended since the last _index_keys()
+
+    def _keys(self) -> np.ndarray:
+        path = self.path / KEYS_FILE
+        if not path.exists() or self.count == 0:
+            return np.zeros(0, dtype=KEY_DTYPE)
+        return np.fromfile(path, dtype=KEY_DTYPE, count=self.count)
+
+    def _matrix(self) -> np.ndarray:
+        if self._vectors is None or len(self._vectors) != self.count:
+            self._vectors = np.memmap(
+                self.path / VECTORS_FILE, dtype=VECTOR_DTYPE, mode="r",
+                shape=(self.count, self.dim),
+            )
+        return self._vectors
+
+    def _append(self, keys: np.ndarray, vectors: np.ndarray) -> np.ndarray:
+        vectors = np.ascontiguousarray(vectors, dtype=VECTOR_DTYPE)
+        if self.dim is None:
+            self.dim = vectors.shape[1]
+        elif vectors.shape[1] != self.dim:
+            raise ValueError(f"Cache holds {self.dim}-d vectors, got {vectors.shape[1]}-d")
+
+        with self._locked():
+            # Rows appended by another process go before ours
+            count = self.count
+            self._read_header()
+            if self.count != count:
+                self._index_keys()
+            self._discard_partial_append()
+
+            with (self.path / VECTORS_FILE).open("ab") as f:
+                f.write(vectors.tobytes())
+            with (self.path / KEYS_FILE).open("ab") as f:
+                f.write(keys.astype(KEY_DTYPE).tobytes())
+
+            rows = np.arange(self.count, self.count + len(keys), dtype=np.int64)
+            self._pending.update(zip(keys.tolist(), rows.tolist()))
+            self.count += len(keys)
+            self._write_header()
+
+        # A streaming build appends batch after batch; fold the dict back
+        # into the sorted arrays before it outgrows them
+        if len(self._pending) > max(PENDING_LIMIT, len(self._sorted_keys)):
+            self._index_keys()
+        return rows
+
+    def _write_header(self):
+        header = {"model": self.model_name, "dim": self.dim, "count": self.count}
+        tmp = self.path / (HEADER_FILE + ".tmp")
+        tmp.write_text(json.dumps(header))
+        os.replace(tmp, self.path / HEADER_FILE)
+
+    # --------------------------------------------------------
+    # Lookup
+    # --------------------------------------------------------
+
+    def lookup(self, keys: np.ndarray) -> np.ndarray:
+        """Cache row of every key, -1 where it is not cached."""
+        rows = np.full(len(keys), -1, dtype=np.int64)
+
+        if len(self._sorted_keys):
+            pos = np.minimum(np.searchsorted(self._sorted_keys, keys), len(self._sorted_keys) - 1)
+            found = self._sorted_keys[pos] == keys
+            rows[found] = self._order[pos[found]]
+
+        if self._pending:
+            for i in np.flatnonzero(rows < 0):
+                rows[i] = self._pending.get(int(keys[i]), -1)
+
+        return rows
+
+    def vectors(self, rows: np.ndarray) -> np.ndarray:
+        return np.asarray(self._matrix()[rows])
+
+    def get_or_encode(self, texts: list[str], encode_fn) -> np.ndarray:
+        """
+        Embeddings for ``texts`` in order. Only texts not seen before (for
+        this model) are passed to ``encode_fn``, once each.
+        """
+        keys = np.array([content_key(self.model_name, t) for t in texts], dtype=KEY_DTYPE)
+        rows = self.lookup(keys)
+
+        miss = np.flatnonzero(rows < 0)
+        self.hits += len(texts) - len(miss)
+        self.misses += len(miss)
+
+        if len(miss):
+            new_keys, first = np.unique(keys[miss], return_index=True)
+            encoded = encode_fn([texts[miss[i]] for i in first])
+            new_rows = self._append(new_keys, encoded)
+            rows[miss] = new_rows[np.searchsorted(new_keys, keys[miss])]
+
+        if len(rows) == 0:
+            return np.zeros((0, self.dim or 0), dtype=VECTOR_DTYPE)
+        return self.vectors(rows)
+
+    def stats(self) -> dict:
+        return {"rows": self.count, "hits": self.hits, "misses": self.misses}
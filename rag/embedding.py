@@ -0,0 +1,157 @@
+"""
+Embedding stage for index builds.
+
+ChunkEncoder sorts texts by token length and cuts them into batches, so
+each batch pads to a similar length instead of to its longest outlier.
+With ``workers > 1`` the batches are encoded by a pool of processes,
+each holding its own copy of the model and a share of the CPU threads.
+Results are returned in the original order.
+
+Query encoding (rag.search) stays in-process: it is latency-bound and
+already batched across callers by rag.batcher.
+"""
+
+import multiprocessing
+import os
+import time
+
+import numpy as np
+
+from rag.backends import DEFAULT_BACKEND, MODEL_NAME, backend_name, load_backend
+from rag.tokens import tokenize
+
+
+BATCH_SIZE = 32
+
+# CPU cores per worker process by default; each worker runs that many threads
+CORES_PER_WORKER = 4
+
+# all-MiniLM-L6-v2 truncates at 256 word pieces, so longer texts cost the
+# same; used to cap the sort key
+MAX_TOKENS = 256
+
+
+def default_workers() -> int:
+    return max(1, (os.cpu_count() or 1) // CORES_PER_WORKER)
+
+
+def length_batches(texts: list[str], batch_size: int) -> list[np.ndarray]:
+    """Indices of ``texts`` grouped into batches of similar token length."""
+    lengths = np.array([min(len(tokenize(t)), MAX_TOKENS) for t in texts])
+    order = np.argsort(lengths, kind="stable")
+    return [order[i:i + batch_size] for i in range(0, len(order), batch_size)]
+
+
+# ------------------------------------------------------------
+# Worker processes
+# ------------------------------------------------------------
+
+_worker_backend = None
+
+
+def _init_worker(kind: str, model_name: str, threads: int):
+    global _worker_backend
+
+    # Must be set before torch is imported, or every worker starts one
+    # thread per core and they oversubscribe the machine
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS"):
+        os.environ[var] = str(threads)
+
+    _worker_backend = load_backend(kind, model_name, threads=threads)
+
+
+def _encode_batch(job):
+    batch_id, texts, batch_size = job
+    return batch_id, _worker_backend.encode(texts, batch_size=batch_size)
+
+
+# ------------------------------------------------------------
+# Encoder
+# ------------------------------------------------------------
+
+class ChunkEncoder:
+    """
+    Callable ``encode(texts) -> float32 matrix`` for EmbeddingCache.
+
+    The model (or worker pool) is only started on the first call, so a
+    build whose chunks are all cached never loads it.
+    """
+
+    def __init__(self, backend: str | None = None, model_name: str = MODEL_NAME,
+                 workers: int = 1, batch_size: int = BATCH_SIZE):
+        self.kind = backend or DEFAULT_BACKEND
+        self.model_name = model_name
+        # Identity of the vectors this encoder produces, for EmbeddingCache
+        self.name = backend_name(self.kind, model_name)
+        self.workers = max(1, workers)
+        self.batch_size = batch_size
+
+        self.chunks = 0
+        self.seconds = 0.0
+
+        self._backend = None
+        self._pool = None
+
+    def _start(self):
+        if self.workers == 1:
+            print(f"Loading embedding backend: {self.name}")
+            self._backend = load_backend(self.kind, self.model_name)
+            return
+
+        threads = max(1, (os.cpu_count() or 1) // self.workers)
+        print(f"Starting {self.workers} embedding workers ({threads} threads each): {self.name}")
+        # spawn: forking a process that may already hold torch threads is unsafe
+        self._pool = multiprocessing.get_context("spawn").Pool(
+            self.workers, initializer=_init_worker, initargs=(self.kind, self.model_name, threads),
+        )
+
+    def __call__(self, texts: list[str]) -> np.ndarray:
+        return self.encode(texts)
+
+    def encode(self, texts: list[str]) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, 0), dtype="float32")
+        if self._backend is None and self._pool is None:
+            self._start()
+
+        started = time.perf_counter()
+        batches = length_batches(texts, self.batch_size)
+        results = [None] * len(batches)
+
+        if self._pool is None:
+            for i, idx in enumerate(batches):
+                results[i] = self._backend.encode([texts[j] for j in idx], batch_size=self.batch_size)
+        else:
+            jobs = ((i, [texts[j] for j in idx], self.batch_size) for i, idx in enumerate(batches))
+            for i, vectors in self._pool.imap_unordered(_encode_batch, jobs):
+                results[i] = vectors
+
+        # Scatter the length-sorted batches back to input order
+        out = np.empty((len(texts), results[0].shape[1]), dtype="float32")
+        for idx, vectors in zip(batches, results):
+            out[idx] = vectors
+
+        self.chunks += len(texts)
+        self.seconds += time.perf_counter() - started
+        return out
+
+    def stats(self) -> dict:
+        return {
+            "chunks": self.chunks,
+            "seconds": round(self.seconds, 2),
+            "chunks_per_s": round(self.chunks / self.seconds, 1) if self.seconds else 0.0,
+            "workers": self.workers,
+            "backend": self.name,
+        }
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
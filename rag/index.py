@@ -1,11 +1,19 @@
+import argparse
 import json
+import time
 from pathlib import Path
 import faiss
-import numpy as np
-from sentence_transformers import SentenceTransformer
+
+from rag import ann, dedup, shards, snapshots
+from rag.backends import BACKENDS, DEFAULT_BACKEND, MODEL_NAME, backend_name
+from rag.embed_cache import EmbeddingCache
+from rag.embedding import BATCH_SIZE as EMBED_BATCH_SIZE, ChunkEncoder, default_workers
+from rag.lexical import BM25Writer, document_text
+from rag.meta_store import MetaStoreWriter
+from rag.stream import batched, iter_records
 
 CHUNKS_DIR = Path("data/processed/chunks")
-INDEX_DIR = Path("data/processed/index")
+INDEX_DIR = snapshots.INDEX_DIR
 INDEX_DIR.mkdir(parents=True, exist_ok=True)
 
 CHUNK_FILES = [
@@ -14,60 +22,244 @@ CHUNK_FILES = [
     "data/processed/chunks/admin_chunks.json",
 ]
 
-INDEX_FILE = INDEX_DIR / "docs.faiss"
-META_FILE = INDEX_DIR / "docs_meta.json"
-
-MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+# Chunks read, embedded and added per step; bounds the build's memory
+BATCH_SIZE = 1024
 
 
-def load_chunks():
-    chunks = []
-    for f in CHUNKS_DIR.glob("*.json"):
+def iter_chunks():
+    # .jsonl: e.g. code chunks from ingest.github.git_ingest
+    for f in sorted(CHUNKS_DIR.glob("*.json")) + sorted(CHUNKS_DIR.glob("*.jsonl")):
         print(f"Loading {f}")
-        with open(f, encoding="utf-8") as fh:
-            data = json.load(fh)
-            chunks.extend(data)
-    return chunks
+        yield from iter_records(f)
 
 
-def main():
-    print("Loading chunks")
-    chunks = load_chunks()
-    texts = [c["text"] for c in chunks]
+def count_chunks(shard_by: str) -> dict[str, int]:
+    """
+    Chunks per shard, before deduplication: an upper bound on each
+    shard's row count, read ahead of the build to size its IVF lists.
+    """
+    counts = {}
+    for f in sorted(CHUNKS_DIR.glob("*.json")) + sorted(CHUNKS_DIR.glob("*.jsonl")):
+        for chunk in iter_records(f):
+            name = shards.shard_name(chunk, shard_by)
+            counts[name] = counts.get(name, 0) + 1
+    return counts
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--index-type", default="flat", choices=ann.INDEX_TYPES)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE,
+                        help="Chunks embedded and added to the index per step")
+    parser.add_argument("--backend", default=DEFAULT_BACKEND, choices=BACKENDS,
+                        help="Embedding backend (onnx / onnx-int8 need python -m rag.backends export)")
+    parser.add_argument("--workers", type=int, default=default_workers(),
+                        help="Embedding processes (default: one per 4 CPU cores)")
+    parser.add_argument("--embed-batch-size", type=int, default=EMBED_BATCH_SIZE,
+                        help="Texts per model call, grouped by token length")
+    parser.add_argument("--nlist", type=int, help="IVF: number of inverted lists")
+    parser.add_argument("--nprobe", type=int, help="IVF: lists visited per query")
+    parser.add_argument("--pq-m", type=int, help="IVF-PQ: number of sub-quantizers")
+    parser.add_argument("--pq-nbits", type=int, help="IVF-PQ: bits per sub-quantizer")
+    parser.add_argument("--hnsw-m", type=int, help="HNSW: graph degree")
+    parser.add_argument("--ef-construction", type=int, help="HNSW: build-time beam width")
+    parser.add_argument("--ef-search", type=int, help="HNSW: query-time beam width")
+    parser.add_argument("--train-size", type=int, help="IVF/PQ: training sample size")
+    parser.add_argument("--refine", choices=ann.REFINE_TYPES,
+                        help="Re-score top candidates against flat / fp16 vectors")
+    parser.add_argument("--k-factor", type=int, help="Refine: candidates re-scored per result")
+    parser.add_argument("--recall-sample", type=int, default=200,
+                        help="Queries used for the memory vs recall report")
+    parser.add_argument("--dedup", default=dedup.DEFAULT_MODE, choices=dedup.MODES,
+                        help="Fold exact / near-duplicate chunks into one row before embedding")
+    parser.add_argument("--dedup-threshold", type=float, default=dedup.THRESHOLD,
+                        help="Near duplicates: minimum estimated Jaccard similarity")
+    parser.add_argument("--shard-by", default="none", choices=shards.SHARD_BY,
+                        help="Split the index into one shard per source or per repo")
+    parser.add_argument("--shards", help="Comma-separated shards to (re)build; others are left as they are")
+    parser.add_argument("--stats-out", help="Write build timings and sizes to this JSON file")
+    parser.add_argument("--no-publish", action="store_true",
+                        help="Build the snapshot but leave the published one in place")
+    parser.add_argument("--keep", type=int, default=snapshots.KEEP,
+                        help="Older snapshots kept for rollback")
+    return parser.parse_args()
+
+
+def index_overrides(args) -> dict:
+    return {
+        "nlist": args.nlist,
+        "nprobe": args.nprobe,
+        "pq_m": args.pq_m,
+        "pq_nbits": args.pq_nbits,
+        "hnsw_m": args.hnsw_m,
+        "ef_construction": args.ef_construction,
+        "ef_search": args.ef_search,
+        "train_size": args.train_size,
+        "refine": args.refine,
+        "k_factor": args.k_factor,
+    }
+
+
+class ShardBuild:
+    """
+    One shard being built: a new snapshot under the shard's root, its
+    index builder, its metadata / BM25 writers and its deduplicator. The
+    build goes into a new snapshot; readers keep using the published one
+    until it is complete.
+    """
+
+    def __init__(self, name: str, args, expected: int | None = None):
+        self.name = name
+        self.root = shards.shard_root(name, INDEX_DIR)
+        self.snapshot = snapshots.create(self.root)
+        self.index_file, meta_dir, bm25_dir = snapshots.layout(self.snapshot)
+
+        self.builder = ann.IndexBuilder(
+            args.index_type,
+            expected=expected,
+            recall_sample=args.recall_sample if args.index_type != "flat" else 0,
+            **index_overrides(args),
+        )
+        self.writer = MetaStoreWriter(meta_dir)
+        self.bm25 = BM25Writer(bm25_dir)
+        self.dedup = dedup.Deduplicator(args.dedup, args.dedup_threshold)
+        print(f"Writing shard {name} to snapshot {self.snapshot}")
+
+    def is_duplicate(self, chunk: dict) -> bool:
+        """Link the chunk to the row it duplicates, if any; kept chunks get the next row."""
+        row = self.dedup.check(chunk)
+        if row is None:
+            return False
+        self.writer.link(row, dedup.provenance(chunk))
+        return True
+
+    def add(self, chunks: list[dict], vectors):
+        self.builder.add(vectors)
+        for chunk in chunks:
+            row = self.writer.add(chunk)
+            self.bm25.add(row, document_text(chunk))
 
-    print(f"Loaded {len(texts)} chunks")
+    def close(self):
+        self.writer.close()
+        self.bm25.close()
 
-    print(f"Loading embedding model: {MODEL_NAME}")
-    model = SentenceTransformer(MODEL_NAME)
+    def finish(self, embedding: str, args) -> dict:
+        """Build, save and publish the shard. Returns its build summary."""
+        self.close()
+        started = time.perf_counter()
 
-    print("Generating embeddings")
-    embeddings = model.encode(
-        texts,
-        batch_size=32,
-        show_progress_bar=True,
-        normalize_embeddings=True,
-    )
+        print(f"Building FAISS index for shard {self.name} ({args.index_type})")
+        index, params = self.builder.finish()
+        params["embedding"] = embedding
 
-    embeddings = np.array(embeddings).astype("float32")
+        print(f"Index contains {index.ntotal} vectors of dimension {index.d}")
 
-    dim = embeddings.shape[1]
-    print(f"Embedding dimension: {dim}")
+        if args.index_type != "flat" and args.recall_sample > 0:
+            params["report"] = self.builder.report()
 
-    print("Building FAISS index")
-    index = faiss.IndexFlatIP(dim)
-    index.add(embeddings)
+        print(f"Saving index to {self.index_file}")
+        faiss.write_index(index, str(self.index_file))
+        ann.write_params(self.index_file, params)
 
-    print(f"Index contains {index.ntotal} vectors")
+        snapshots.write_manifest(
+            self.snapshot, model=embedding, dim=index.d, count=index.ntotal,
+            index_type=args.index_type, shard=self.name, dedup=self.dedup.stats(),
+        )
+        summary = {
+            "snapshot": self.snapshot.name,
+            "count": index.ntotal,
+            "dim": index.d,
+            "index_bytes": self.index_file.stat().st_size,
+            "finish_seconds": round(time.perf_counter() - started, 3),
+            "dedup": self.dedup.stats(),
+        }
 
-    print(f"Saving index to {INDEX_FILE}")
-    faiss.write_index(index, str(INDEX_FILE))
+        if args.no_publish:
+            print(f"Not published; publish with: python -m rag.snapshots "
+                  f"--index-dir {self.root} publish {self.snapshot.name}")
+            return summary
+        snapshots.publish(self.snapshot, self.root)
+        snapshots.prune(self.root, args.keep)
+        return summary
 
-    print(f"Saving metadata to {META_FILE}")
-    with META_FILE.open("w") as f:
-        json.dump(chunks, f, indent=2)
 
+def main():
+    args = parse_args()
+    started = time.perf_counter()
+    only = set(args.shards.split(",")) if args.shards else None
+
+    cache = EmbeddingCache(backend_name(args.backend, MODEL_NAME))
+    builds = {}
+
+    # IVF lists are sized for the whole shard, not just the training sample
+    expected = {}
+    if args.index_type in ann.TRAINED_TYPES and args.nlist is None:
+        expected = count_chunks(args.shard_by)
+
+    # Chunks are read, deduplicated, embedded (content-hash cache), added
+    # to their shard's index and written to its metadata / BM25 stores one
+    # batch at a time
+    print(f"Indexing chunks in batches of {args.batch_size}")
+    with ChunkEncoder(args.backend, MODEL_NAME, args.workers, args.embed_batch_size) as encode:
+        try:
+            for batch in batched(iter_chunks(), args.batch_size):
+                names = [shards.shard_name(c, args.shard_by) for c in batch]
+                if only is not None:
+                    batch = [c for c, name in zip(batch, names) if name in only]
+                    names = [name for name in names if name in only]
+                # Duplicates are linked to the row they repeat, not embedded
+                for name in names:
+                    if name not in builds:
+                        builds[name] = ShardBuild(name, args, expected.get(name))
+                kept = [not builds[name].is_duplicate(c) for c, name in zip(batch, names)]
+                batch = [c for c, keep in zip(batch, kept) if keep]
+                names = [name for name, keep in zip(names, kept) if keep]
+                if not batch:
+                    continue
+
+                vectors = cache.get_or_encode([c["text"] for c in batch], encode)
+
+                by_shard = {}
+                for i, name in enumerate(names):
+                    by_shard.setdefault(name, []).append(i)
+                for name, idx in by_shard.items():
+                    builds[name].add([batch[i] for i in idx], vectors[idx])
+
+                total = sum(b.writer.count for b in builds.values())
+                dups = sum(b.dedup.exact + b.dedup.near for b in builds.values())
+                print(f"  {total} chunks ({cache.misses} embedded, {dups} duplicates)")
+        except BaseException:
+            for build in builds.values():
+                build.close()
+            raise
+
+    print(f"Embedding cache: {cache.stats()}")
+    print(f"Embedding throughput: {encode.stats()}")
+    for name, build in builds.items():
+        print(f"Duplicates in shard {name}: {build.dedup.stats()}")
+
+    if not builds:
+        raise SystemExit("No chunks to index")
+
+    summaries = {name: build.finish(encode.name, args) for name, build in builds.items()}
     print("✔ Embedding + indexing complete")
 
+    if args.stats_out:
+        stats = {
+            "seconds": round(time.perf_counter() - started, 3),
+            "chunks": sum(s["count"] for s in summaries.values()),
+            "index_type": args.index_type,
+            "embedding": encode.stats(),
+            "cache": cache.stats(),
+            "shards": summaries,
+        }
+        Path(args.stats_out).write_text(json.dumps(stats, indent=2))
+
+    if args.shard_by != "none" and shards.has_index(INDEX_DIR):
+        print(f"Note: the unsharded index in {INDEX_DIR} is still searched as shard "
+              f"'{shards.MAIN_SHARD}'; remove its {snapshots.CURRENT_FILE} (and any "
+              f"{snapshots.INDEX_FILE}) to retire it")
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+
+"""
+BM25 inverted index stored next to the FAISS index.
+
+Documents are metadata-store rows; terms are the hashed token ids from
+rag.tokens. On disk the index is a directory of flat arrays, all
+memory-mapped at query time:
+
+    header.json          document count, average length, k1 / b
+    terms.u32            sorted term ids
+    postings_offsets.u64 n_terms + 1 offsets into the postings arrays
+    postings_docs.u32    row ids, grouped by term and ascending per term
+    postings_tf.u16      term frequency of each posting
+    doc_len.u32          token count of every row
+
+A query only reads the posting lists of its own terms, so exact tokens
+such as ``instance_actions`` are found anywhere in the corpus at the
+cost of those lists, independent of the dense candidate pool.
+
+Usage (rebuild from an existing metadata store):
+    python -m rag.lexical \
+        --meta data/processed/index/docs_meta \
+        --output data/processed/index/bm25
+"""
+
+import argparse
+import json
+import shutil
+from pathlib import Path
+
+import numpy as np
+
+from rag.meta_store import MetaStore
+from rag.tokens import TOKEN_DTYPE, token_ids
+
+
+K1 = 1.2
+B = 0.75
+
+# Query terms in more than this share of the documents are skipped: their
+# posting lists are the longest to read and score, and their idf is small
+# enough not to change the ranking much. The rarest term is always kept.
+MAX_DF_FRACTION = 0.5
+
+# Postings buffered before spilling to disk (~10 bytes each)
+SPILL_POSTINGS = 4_000_000
+# Spill buckets are keyed by the top 8 bits of the term id
+SPILL_SHIFT = 24
+
+DOC_DTYPE = np.dtype("<u4")
+TF_DTYPE = np.dtype("<u2")
+OFFSET_DTYPE = np.dtype("<u8")
+
+HEADER_FILE = "header.json"
+TERMS_FILE = "terms.u32"
+POSTINGS_OFFSETS_FILE = "postings_offsets.u64"
+POSTINGS_DOCS_FILE = "postings_docs.u32"
+POSTINGS_TF_FILE = "postings_tf.u16"
+DOC_LEN_FILE = "doc_len.u32"
+
+
+def document_text(record: dict) -> str:
+    return f"{record.get('heading') or ''}\n{record.get('text') or ''}"
+
+
+def _map_array(path: Path, dtype):
+    if path.stat().st_size == 0:
+        return np.zeros(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r")
+
+
+# ------------------------------------------------------------
+# Writer
+# ------------------------------------------------------------
+
+class BM25Writer:
+    """
+    Collects (term, row, tf) postings as rows are added in order, then
+    sorts them into term-major posting lists on close().
+
+    Postings are buffered up to ``spill_postings`` and then appended to
+    on-disk buckets by the high bits of the term id, so every bucket
+    covers one contiguous term range. close() sorts one bucket at a time,
+    keeping memory bounded by the buffer and the largest bucket rather
+    than by the corpus.
+    """
+
+    def __init__(self, path: Path, spill_postings: int = SPILL_POSTINGS):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.spill_postings = spill_postings
+
+        self._terms = []
+        self._docs = []
+        self._tfs = []
+        self._buffered = 0
+        self._spill_dir = None
+
+        self._doc_len = (self.path / DOC_LEN_FILE).open("wb")
+        self._n_docs = 0
+        self._total_len = 0
+
+    def add(self, row: int, text: str):
+        if row != self._n_docs:
+            raise ValueError(f"Rows must be added in order (expected {self._n_docs}, got {row})")
+
+        tokens = token_ids(text)
+        terms, tfs = np.unique(tokens, return_counts=True)
+
+        self._terms.append(terms)
+        self._docs.append(np.full(len(terms), row, dtype=DOC_DTYPE))
+        self._tfs.append(np.minimum(tfs, np.iinfo(TF_DTYPE).max).astype(TF_DTYPE))
+        self._buffered += len(terms)
+
+        self._doc_len.write(np.array([len(tokens)], dtype=DOC_DTYPE).tobytes())
+        self._n_docs += 1
+        self._total_len += len(tokens)
+
+        if self._buffered >= self.spill_postings:
+            self._spill()
+
+    def _take_buffer(self):
+        terms = np.concatenate(self._terms) if self._terms else np.zeros(0, TOKEN_DTYPE)
+        docs = np.concatenate(self._docs) if self._docs else np.zeros(0, DOC_DTYPE)
+        tfs = np.concatenate(self._tfs) if self._tfs else np.zeros(0, TF_DTYPE)
+        self._terms, self._docs, self._tfs = [], [], []
+        self._buffered = 0
+        return terms.astype(TOKEN_DTYPE), docs, tfs
+
+    def _spill(self):
+        if self._spill_dir is None:
+            self._spill_dir = self.path / "spill"
+            shutil.rmtree(self._spill_dir, ignore_errors=True)
+            self._spill_dir.mkdir()
+
+        terms, docs, tfs = self._take_buffer()
+        buckets = terms >> SPILL_SHIFT
+        order = np.argsort(buckets, kind="stable")
+        terms, docs, tfs, buckets = terms[order], docs[order], tfs[order], buckets[order]
+
+        ids, starts = np.unique(buckets, return_index=True)
+        ends = np.append(starts[1:], len(terms))
+        for b, start, end in zip(ids, starts, ends):
+            for name, arr in (("terms", terms), ("docs", docs), ("tfs", tfs)):
+                with (self._spill_dir / f"{b:04d}.{name}").open("ab") as f:
+                    f.write(arr[start:end].tobytes())
+
+    def _buckets(self):
+        """(terms, docs, tfs) per term range, in ascending term order."""
+        if self._spill_dir is None:
+            yield self._take_buffer()
+            return
+
+        self._spill()
+        for terms_file in sorted(self._spill_dir.glob("*.terms")):
+            stem = terms_file.with_suffix("")
+            yield (
+                np.fromfile(terms_file, dtype=TOKEN_DTYPE),
+                np.fromfile(stem.with_suffix(".docs"), dtype=DOC_DTYPE),
+                np.fromfile(stem.with_suffix(".tfs"), dtype=TF_DTYPE),
+            )
+
+    def close(self):
+        self._doc_len.close()
+
+        n_terms = 0
+        n_postings = 0
+
+        with (self.path / TERMS_FILE).open("wb") as terms_out, \
+                (self.path / POSTINGS_OFFSETS_FILE).open("wb") as offsets_out, \
+                (self.path / POSTINGS_DOCS_FILE).open("wb") as docs_out, \
+                (self.path / POSTINGS_TF_FILE).open("wb") as tfs_out:
+
+            for terms, docs, tfs in self._buckets():
+                # Rows were added (and spilled) in order, so a stable sort
+                # on term keeps each posting list sorted by row
+                order = np.argsort(terms, kind="stable")
+                terms, docs, tfs = terms[order], docs[order], tfs[order]
+
+                unique_terms, starts = np.unique(terms, return_index=True)
+
+                unique_terms.astype(TOKEN_DTYPE).tofile(terms_out)
+                (starts + n_postings).astype(OFFSET_DTYPE).tofile(offsets_out)
+                docs.astype(DOC_DTYPE).tofile(docs_out)
+                tfs.astype(TF_DTYPE).tofile(tfs_out)
+
+                n_terms += len(unique_terms)
+                n_postings += len(terms)
+
+            np.array([n_postings], dtype=OFFSET_DTYPE).tofile(offsets_out)
+
+        if self._spill_dir is not None:
+            shutil.rmtree(self._spill_dir)
+
+        header = {
+            "version": 1,
+            "n_docs": self._n_docs,
+            "n_terms": n_terms,
+            "avgdl": self._total_len / self._n_docs if self._n_docs else 0.0,
+            "k1": K1,
+            "b": B,
+        }
+        (self.path / HEADER_FILE).write_text(json.dumps(header))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def build_from_meta(meta_dir: Path, output: Path):
+    """Rebuild the BM25 index over every row of a metadata store."""
+    meta = MetaStore(meta_dir)
+    with BM25Writer(output) as writer:
+        for row, record in enumerate(meta):
+            writer.add(row, document_text(record))
+    print(f"✔ BM25 index over {len(meta)} rows → {output}")
+
+
+# ------------------------------------------------------------
+# Reader
+# ------------------------------------------------------------
+
+class BM25Index:
+    """
+    Memory-mapped reader for an index written by BM25Writer.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        header = json.loads((self.path / HEADER_FILE).read_text())
+
+        self.n_docs = header["n_docs"]
+        self.avgdl = header["avgdl"] or 1.0
+        self.k1 = header["k1"]
+        self.b = header["b"]
+
+        self.terms = _map_array(self.path / TERMS_FILE, TOKEN_DTYPE)
+        self.offsets = _map_array(self.path / POSTINGS_OFFSETS_FILE, OFFSET_DTYPE)
+        self.docs = _map_array(self.path / POSTINGS_DOCS_FILE, DOC_DTYPE)
+        self.tfs = _map_array(self.path / POSTINGS_TF_FILE, TF_DTYPE)
+        self.doc_len = _map_array(self.path / DOC_LEN_FILE, DOC_DTYPE)
+
+    def _postings(self, query_terms: np.ndarray):
+        """Postings position of each query term, -1 for terms not in the index."""
+        if len(self.terms) == 0:
+            return np.full(len(query_terms), -1)
+        pos = np.minimum(np.searchsorted(self.terms, query_terms), len(self.terms) - 1)
+        return np.where(self.terms[pos] == query_terms, pos, -1)
+
+    def term_stats(self, query: str):
+        """
+        (documents, total length, document frequency of each distinct
+        query term): summed over shards, these give the BM25 statistics
+        of the whole corpus (see search()).
+        """
+        pos = self._postings(np.unique(token_ids(query)))
+        found = pos >= 0
+        df = np.zeros(len(pos), dtype=np.int64)
+        df[found] = self.offsets[pos[found] + 1] - self.offsets[pos[found]]
+        return self.n_docs, self.avgdl * self.n_docs, df
+
+    def search(self, query: str, k: int, keep=None, stats=None):
+        """
+        Top-k rows by BM25 for ``query``. ``keep`` is an optional function
+        taking an array of row ids and returning a boolean mask, used to
+        restrict results (e.g. to one service partition). ``stats``
+        replaces this index's statistics with corpus-wide ones in the
+        shape of term_stats(), so scores of different shards compare.
+        Terms above MAX_DF_FRACTION of the documents are not scored.
+
+        Returns (rows, scores), best first.
+        """
+        query_terms = np.unique(token_ids(query))
+        if len(self.terms) == 0 or len(query_terms) == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+
+        n_docs, avgdl = self.n_docs, self.avgdl
+        if stats is not None:
+            n_docs, total_len, corpus_df = stats
+            avgdl = total_len / n_docs if n_docs else 1.0
+
+        postings = self._postings(query_terms)
+        if stats is None:
+            found = postings >= 0
+            dfs = np.where(found, self.offsets[postings + 1] - self.offsets[postings], 0).astype(np.int64)
+        else:
+            # Decided on corpus-wide counts, so every shard skips the same terms
+            dfs = np.asarray(corpus_df, dtype=np.int64)
+            found = dfs > 0
+        common = found & (dfs > MAX_DF_FRACTION * n_docs)
+        if found.any() and not (found & ~common).any():
+            common[np.flatnonzero(found)[np.argmin(dfs[found])]] = False
+
+        all_docs = []
+        all_scores = []
+
+        for i, p in enumerate(postings):
+            if p < 0 or common[i]:
+                continue
+            start, end = int(self.offsets[p]), int(self.offsets[p + 1])
+            docs = np.asarray(self.docs[start:end])
+            tfs = np.asarray(self.tfs[start:end], dtype=np.float32)
+
+            if keep is not None:
+                mask = keep(docs)
+                docs, tfs = docs[mask], tfs[mask]
+                if len(docs) == 0:
+                    continue
+
+            df = end - start if stats is None else corpus_df[i]
+            idf = np.log(1.0 + (n_docs - df + 0.5) / (df + 0.5))
+            norm = self.k1 * (1.0 - self.b + self.b * self.doc_len[docs] / avgdl)
+
+            all_docs.append(docs)
+            all_scores.append(idf * tfs * (self.k1 + 1.0) / (tfs + norm))
+
+        if not all_docs:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+
+        rows, inverse = np.unique(np.concatenate(all_docs), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(all_scores))
+
+        top = np.argsort(-scores, kind="stable")[:k]
+        return rows[top].astype(np.int64), scores[top].astype(np.float32)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--meta", required=True, help="Metadata store directory")
+    parser.add_argument("--output", required=True, help="Output BM25 directory")
+    args = parser.parse_args()
+
+    build_from_meta(Path(args.meta), Path(args.output))
+
+
+if __name__ == "__main__":
+    main()
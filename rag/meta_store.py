@@ -0,0 +1,432 @@
+#!/usr/bin/env python3
+
+"""
+Offset-indexed binary metadata store for the FAISS index.
+
+Row ``i`` of the store describes vector ``i`` of the index. On disk a
+store is a directory:
+
+    header.json          row count + code tables for the fixed columns
+    codes.bin            fixed-width (source, service, version) codes
+    offsets.u64          n + 1 offsets into records.bin
+    records.bin          compact JSON of every other field, incl. text
+    heading_offsets.u64  n + 1 offsets into heading_tokens.u32
+    heading_tokens.u32   hashed heading tokens (used by the ranking boosts)
+    partitions.i64       row ids grouped by service code, for filtered
+                         FAISS searches (ranges listed in header.json)
+    keys.bin             stable 64-bit keys of the chunk id and of its
+                         document (the chunk id up to "::")
+    deleted.u8           tombstone flag per row
+    link_rows.i64        rows with linked duplicates (see rag.dedup),
+    link_offsets.u64     their offsets into links.bin
+    links.bin            and the duplicates' provenance as JSON lists
+
+Rows are never rewritten in place. Updating a document tombstones its
+old rows and appends new ones; searches skip tombstoned rows until
+rag.compact rewrites the index without them.
+
+Everything is memory-mapped, so opening a store costs the same for ten
+chunks as for ten million, and a query only decodes the rows it returns.
+
+Usage (convert a legacy docs_meta.json):
+    python -m rag.meta_store \
+        --convert data/processed/index/docs_meta.json \
+        --output data/processed/index/docs_meta
+"""
+
+import argparse
+import hashlib
+import json
+import mmap
+from pathlib import Path
+
+import numpy as np
+
+from rag.tokens import TOKEN_DTYPE, token_ids
+
+
+CODE_COLUMNS = ("source", "service", "version")
+CODE_DTYPE = np.dtype([(c, "<u2") for c in CODE_COLUMNS])
+OFFSET_DTYPE = np.dtype("<u8")
+ROW_DTYPE = np.dtype("<i8")  # FAISS idx_t
+KEY_DTYPE = np.dtype([("id", "<u8"), ("doc", "<u8")])
+
+HEADER_FILE = "header.json"
+CODES_FILE = "codes.bin"
+OFFSETS_FILE = "offsets.u64"
+RECORDS_FILE = "records.bin"
+HEADING_OFFSETS_FILE = "heading_offsets.u64"
+HEADING_TOKENS_FILE = "heading_tokens.u32"
+PARTITIONS_FILE = "partitions.i64"
+KEYS_FILE = "keys.bin"
+DELETED_FILE = "deleted.u8"
+LINK_ROWS_FILE = "link_rows.i64"
+LINK_OFFSETS_FILE = "link_offsets.u64"
+LINKS_FILE = "links.bin"
+
+# Code 0 is reserved for "missing" (None) in every column
+NULL_CODE = 0
+
+
+def stable_key(value: str | None) -> int:
+    """64-bit key of a chunk or document id; 0 when there is no id."""
+    if not value:
+        return 0
+    digest = hashlib.blake2b(str(value).encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
+
+
+def doc_id(chunk_id: str | None) -> str | None:
+    """Document a chunk belongs to: "github:o/r:issue:1::chunk0" -> "github:o/r:issue:1"."""
+    if not chunk_id:
+        return None
+    return str(chunk_id).split("::", 1)[0]
+
+
+def _read_header(path: Path) -> dict:
+    return json.loads((path / HEADER_FILE).read_text(encoding="utf-8"))
+
+
+def _map_blob(path: Path):
+    with path.open("rb") as f:
+        if path.stat().st_size == 0:
+            return b""
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def _map_array(path: Path, dtype):
+    if path.stat().st_size == 0:
+        return np.zeros(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r")
+
+
+def _read_links(path: Path) -> dict:
+    """Row → duplicates' provenance of an existing store (empty if it has none)."""
+    if not (path / LINK_ROWS_FILE).exists():
+        return {}
+    rows = np.fromfile(path / LINK_ROWS_FILE, dtype=ROW_DTYPE)
+    offsets = np.fromfile(path / LINK_OFFSETS_FILE, dtype=OFFSET_DTYPE)
+    blob = (path / LINKS_FILE).read_bytes()
+    return {
+        int(row): json.loads(blob[offsets[i]:offsets[i + 1]])
+        for i, row in enumerate(rows)
+    }
+
+
+# ------------------------------------------------------------
+# Writer
+# ------------------------------------------------------------
+
+class MetaStoreWriter:
+    """
+    Streams records into a store. With ``append=True`` rows are added
+    after the ones already on disk, otherwise the store is recreated.
+
+    Duplicates of a row (see rag.dedup) are linked to it with link(), or
+    passed as the record's "duplicates" field; they are kept in memory
+    and written on close().
+    """
+
+    def __init__(self, path: Path, append: bool = False):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+
+        if append and (self.path / HEADER_FILE).exists():
+            header = _read_header(self.path)
+            self.count = header["count"]
+            self.vocab = header["vocab"]
+            self.links = _read_links(self.path)
+            mode = "ab"
+        else:
+            self.count = 0
+            self.vocab = {c: [None] for c in CODE_COLUMNS}
+            self.links = {}
+            mode = "wb"
+
+        self._lookup = {
+            c: {v: code for code, v in enumerate(values)}
+            for c, values in self.vocab.items()
+        }
+
+        self._codes = (self.path / CODES_FILE).open(mode)
+        self._offsets = (self.path / OFFSETS_FILE).open(mode)
+        self._records = (self.path / RECORDS_FILE).open(mode)
+        self._heading_offsets = (self.path / HEADING_OFFSETS_FILE).open(mode)
+        self._heading_tokens = (self.path / HEADING_TOKENS_FILE).open(mode)
+        self._keys = (self.path / KEYS_FILE).open(mode)
+
+        # Tombstones are flipped in place, so this one is opened read/write
+        deleted_file = self.path / DELETED_FILE
+        if mode == "wb" or not deleted_file.exists():
+            deleted_file.write_bytes(b"")
+        self._deleted = deleted_file.open("r+b")
+        self._deleted.seek(0, 2)
+        self.deleted = int(np.count_nonzero(np.fromfile(deleted_file, dtype=np.uint8)))
+
+        self._records_end = self._records.tell()
+        self._heading_tokens_end = self._heading_tokens.tell() // TOKEN_DTYPE.itemsize
+
+        if mode == "wb":
+            self._offsets.write(np.array([0], dtype=OFFSET_DTYPE).tobytes())
+            self._heading_offsets.write(np.array([0], dtype=OFFSET_DTYPE).tobytes())
+
+    def _code(self, column: str, value) -> int:
+        if value is None:
+            return NULL_CODE
+
+        value = str(value)
+        code = self._lookup[column].get(value)
+        if code is None:
+            code = len(self.vocab[column])
+            if code > np.iinfo(CODE_DTYPE[column]).max:
+                raise ValueError(f"Too many distinct values for column {column!r}")
+            self.vocab[column].append(value)
+            self._lookup[column][value] = code
+        return code
+
+    def add(self, record: dict) -> int:
+        row = np.zeros(1, dtype=CODE_DTYPE)
+        rest = dict(record)
+        duplicates = rest.pop("duplicates", None)
+        for column in CODE_COLUMNS:
+            row[column] = self._code(column, rest.pop(column, None))
+
+        blob = json.dumps(rest, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        heading = token_ids(record.get("heading") or "")
+
+        self._records_end += len(blob)
+        self._heading_tokens_end += len(heading)
+
+        keys = np.array([(stable_key(record.get("id")), stable_key(doc_id(record.get("id"))))],
+                        dtype=KEY_DTYPE)
+
+        self._codes.write(row.tobytes())
+        self._keys.write(keys.tobytes())
+        self._deleted.seek(0, 2)
+        self._deleted.write(b"\x00")
+        self._records.write(blob)
+        self._offsets.write(np.array([self._records_end], dtype=OFFSET_DTYPE).tobytes())
+        self._heading_tokens.write(heading.tobytes())
+        self._heading_offsets.write(np.array([self._heading_tokens_end], dtype=OFFSET_DTYPE).tobytes())
+
+        if duplicates:
+            self.links[self.count] = list(duplicates)
+
+        self.count += 1
+        return self.count - 1
+
+    def link(self, row: int, duplicate: dict):
+        """Record ``duplicate`` (a provenance dict) as a duplicate of ``row``."""
+        self.links.setdefault(int(row), []).append(duplicate)
+
+    def delete(self, rows):
+        """Tombstone rows; they stay on disk until compaction."""
+        for row in sorted(set(int(r) for r in rows)):
+            if not 0 <= row < self.count:
+                raise IndexError(f"Row {row} out of range (store has {self.count} rows)")
+            self._deleted.seek(row)
+            if self._deleted.read(1) != b"\x01":
+                self._deleted.seek(row)
+                self._deleted.write(b"\x01")
+                self.deleted += 1
+
+    def _write_partitions(self) -> dict:
+        """
+        Group row ids by service code so a service-filtered query can hand
+        FAISS exactly the rows of its partition.
+        """
+        services = _map_array(self.path / CODES_FILE, CODE_DTYPE)[:self.count]["service"]
+        order = np.argsort(services, kind="stable").astype(ROW_DTYPE)
+        order.tofile(self.path / PARTITIONS_FILE)
+
+        codes, starts, counts = np.unique(services[order], return_index=True, return_counts=True)
+        return {
+            str(code): [int(start), int(start + count)]
+            for code, start, count in zip(codes, starts, counts)
+        }
+
+    def _write_links(self):
+        rows = sorted(self.links)
+        blobs = [json.dumps(self.links[row], ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+                 for row in rows]
+        offsets = np.concatenate([[0], np.cumsum([len(b) for b in blobs], dtype=np.int64)])
+
+        np.array(rows, dtype=ROW_DTYPE).tofile(self.path / LINK_ROWS_FILE)
+        offsets.astype(OFFSET_DTYPE).tofile(self.path / LINK_OFFSETS_FILE)
+        (self.path / LINKS_FILE).write_bytes(b"".join(blobs))
+
+    def close(self):
+        for f in (self._codes, self._offsets, self._records,
+                  self._heading_offsets, self._heading_tokens,
+                  self._keys, self._deleted):
+            f.close()
+
+        header = {
+            "version": 1,
+            "count": self.count,
+            "deleted": self.deleted,
+            "vocab": self.vocab,
+            "partitions": self._write_partitions(),
+            "linked": len(self.links),
+        }
+        self._write_links()
+        (self.path / HEADER_FILE).write_text(json.dumps(header, ensure_ascii=False), encoding="utf-8")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# ------------------------------------------------------------
+# Reader
+# ------------------------------------------------------------
+
+class MetaStore:
+    """
+    Read-only, memory-mapped view of a store written by MetaStoreWriter.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        header = _read_header(self.path)
+
+        self.count = header["count"]
+        self.vocab = header["vocab"]
+        self.partitions = header.get("partitions", {})
+        self._lookup = {
+            c: {v: code for code, v in enumerate(values)}
+            for c, values in self.vocab.items()
+        }
+
+        self.codes = _map_array(self.path / CODES_FILE, CODE_DTYPE)[:self.count]
+        self._offsets = _map_array(self.path / OFFSETS_FILE, OFFSET_DTYPE)
+        self._records = _map_blob(self.path / RECORDS_FILE)
+        self._heading_offsets = _map_array(self.path / HEADING_OFFSETS_FILE, OFFSET_DTYPE)
+        self._heading_tokens = _map_array(self.path / HEADING_TOKENS_FILE, TOKEN_DTYPE)
+
+        self.n_deleted = header.get("deleted", 0)
+        self.keys = self._optional_array(KEYS_FILE, KEY_DTYPE)
+        self.deleted = self._optional_array(DELETED_FILE, np.uint8)
+
+        # Rows with linked duplicates; stores without links have none
+        if (self.path / LINK_ROWS_FILE).exists():
+            self._link_rows = _map_array(self.path / LINK_ROWS_FILE, ROW_DTYPE)
+            self._link_offsets = _map_array(self.path / LINK_OFFSETS_FILE, OFFSET_DTYPE)
+            self._links = _map_blob(self.path / LINKS_FILE)
+        else:
+            self._link_rows = np.zeros(0, dtype=ROW_DTYPE)
+
+        partitions_file = self.path / PARTITIONS_FILE
+        self._partition_rows = (
+            _map_array(partitions_file, ROW_DTYPE) if partitions_file.exists() else None
+        )
+
+    def _optional_array(self, name: str, dtype):
+        # Stores written before a column existed read it as all zeros
+        path = self.path / name
+        if path.exists():
+            return _map_array(path, dtype)[:self.count]
+        return np.zeros(self.count, dtype=dtype)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def live(self, rows) -> np.ndarray:
+        """Boolean mask over ``rows``: True where the row is not tombstoned."""
+        return self.deleted[rows] == 0
+
+    def deleted_rows(self) -> np.ndarray:
+        if self.n_deleted == 0:
+            return np.zeros(0, dtype=ROW_DTYPE)
+        return np.flatnonzero(self.deleted).astype(ROW_DTYPE)
+
+    def rows_for_docs(self, doc_keys) -> np.ndarray:
+        """Live rows belonging to any of the given document keys."""
+        doc_keys = np.asarray(list(doc_keys), dtype=np.uint64)
+        mask = np.isin(self.keys["doc"], doc_keys) & (self.deleted == 0)
+        return np.flatnonzero(mask).astype(ROW_DTYPE)
+
+    def code(self, column: str, value) -> int | None:
+        """Code of ``value`` in ``column``, or None if it never occurs."""
+        if value is None:
+            return NULL_CODE
+        return self._lookup[column].get(str(value))
+
+    def value(self, column: str, code: int):
+        return self.vocab[column][code]
+
+    def partition(self, service_code: int):
+        """Sorted row ids (int64) of every chunk with the given service code."""
+        if self._partition_rows is None:
+            return np.flatnonzero(self.codes["service"] == service_code).astype(ROW_DTYPE)
+
+        bounds = self.partitions.get(str(service_code))
+        if bounds is None:
+            return np.zeros(0, dtype=ROW_DTYPE)
+        return np.asarray(self._partition_rows[bounds[0]:bounds[1]])
+
+    def heading_matches(self, rows, tokens) -> np.ndarray:
+        """
+        Boolean mask over ``rows``: True where the row's heading contains
+        any of the given token ids. Fully vectorized over the CSR arrays.
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        starts = self._heading_offsets[rows].astype(np.int64)
+        lengths = self._heading_offsets[rows + 1].astype(np.int64) - starts
+        total = int(lengths.sum())
+
+        if total == 0 or len(tokens) == 0:
+            return np.zeros(len(rows), dtype=bool)
+
+        owner = np.repeat(np.arange(len(rows)), lengths)
+        within = np.arange(total) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        hits = np.isin(self._heading_tokens[np.repeat(starts, lengths) + within], tokens)
+
+        return np.bincount(owner[hits], minlength=len(rows)) > 0
+
+    def get(self, i: int) -> dict:
+        start, end = self._offsets[i], self._offsets[i + 1]
+        record = json.loads(self._records[start:end])
+        row = self.codes[i]
+        for column in CODE_COLUMNS:
+            record[column] = self.vocab[column][row[column]]
+
+        pos = int(np.searchsorted(self._link_rows, i))
+        if pos < len(self._link_rows) and self._link_rows[pos] == i:
+            start, end = self._link_offsets[pos], self._link_offsets[pos + 1]
+            record["duplicates"] = json.loads(self._links[start:end])
+        return record
+
+    def __iter__(self):
+        for i in range(self.count):
+            yield self.get(i)
+
+
+# ------------------------------------------------------------
+# Legacy conversion
+# ------------------------------------------------------------
+
+def convert_json(src: Path, dst: Path):
+    with src.open(encoding="utf-8") as f:
+        records = json.load(f)
+
+    with MetaStoreWriter(dst) as writer:
+        for record in records:
+            writer.add(record)
+
+    print(f"✔ Converted {len(records)} records → {dst}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--convert", required=True, help="Legacy docs_meta.json")
+    parser.add_argument("--output", required=True, help="Output store directory")
+    args = parser.parse_args()
+
+    convert_json(Path(args.convert), Path(args.output))
+
+
+if __name__ == "__main__":
+    main()
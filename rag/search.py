@@ -1,86 +1,932 @@
 #!/usr/bin/env python3
 
 import faiss
-import json
+import numpy as np
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from sentence_transformers import SentenceTransformer
+from typing import NamedTuple
 
-INDEX_FILE = Path("data/processed/index/docs.faiss")
-META_FILE = Path("data/processed/index/docs_meta.json")
+import requests
 
-MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+from rag import ann, shards, snapshots
+from rag.backends import DEFAULT_BACKEND, MODEL_NAME, backend_name, load_backend
+from rag.lexical import BM25Index
+from rag.meta_store import MetaStore
+from rag.tokens import token_ids
 
+INDEX_DIR = snapshots.INDEX_DIR
 
-def load():
-    index = faiss.read_index(str(INDEX_FILE))
-    with META_FILE.open() as f:
-        meta = json.load(f)
-    model = SentenceTransformer(MODEL_NAME)
-    return index, meta, model
+# Seconds between checks for a newly published index snapshot (or shard)
+RELOAD_INTERVAL = 2.0
 
+# Threads searching shards concurrently, and the timeout for remote ones
+SHARD_WORKERS = 8
+REMOTE_TIMEOUT = 10.0
 
-_index = faiss.read_index(str(INDEX_FILE))
+# Candidates of all shards are ranked together keyed by
+# (shard << SHARD_SHIFT) + row
+SHARD_SHIFT = 40
 
-with META_FILE.open() as f:
-    _meta = json.load(f)
+QUERY_CACHE_SIZE = 1024
 
-_model = SentenceTransformer(MODEL_NAME)
+# Candidates pulled from FAISS per query for re-ranking by the boosts
+CANDIDATES = 50
+
+# Service partitions up to this many rows are scored exactly against
+# their decoded vectors (kept in memory) instead of through the index
+EXACT_PARTITION_ROWS = 20_000
+
+# Candidates pulled from BM25 per query, fused with the FAISS ones by
+# reciprocal rank: score = sum(1 / (RRF_K + rank))
+LEXICAL_CANDIDATES = 50
+RRF_K = 60
+
+# Query intent keywords and the boosts they unlock
+BUG_WORDS = [
+    "error", "bug", "exception", "traceback",
+    "failure", "regression", "stacktrace"
+]
+HOWTO_WORDS = ["how", "configure", "setup", "install", "create"]
+
+RELEASENOTES_PENALTY = 0.5
+GITHUB_BUG_BOOST = 1.25
+SERVICE_BOOST = 1.1
+DOCS_HOWTO_BOOST = 1.2
+HEADING_BOOST = 1.15
+SECURITY_NEUTRON_BOOST = 1.2
+
+
+def read_index_mmap(path: Path):
+    """
+    Open a FAISS index memory-mapped and read-only, so pages are only
+    faulted in when a search touches them. Falls back to a regular read
+    for index types / FAISS builds that do not support mmap.
+    """
+    flags = faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY
+    flags |= getattr(faiss, "IO_FLAG_MMAP_IFC", 0)
+
+    try:
+        return faiss.read_index(str(path), flags)
+    except RuntimeError:
+        return faiss.read_index(str(path))
+
+
+def normalize_query(query: str) -> str:
+    # MiniLM lower-cases its input, so case and spacing never change the vector
+    return " ".join(query.lower().split())
+
+
+class QueryEmbeddingCache:
+    """
+    Thread-safe LRU of query embeddings keyed by (model name, normalized
+    query), with hit/miss counters.
+    """
+
+    def __init__(self, maxsize: int = QUERY_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, model_name: str, query: str):
+        key = (model_name, normalize_query(query))
+        with self._lock:
+            emb = self._entries.get(key)
+            if emb is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return emb
+
+    def put(self, model_name: str, query: str, emb):
+        key = (model_name, normalize_query(query))
+        with self._lock:
+            self._entries[key] = emb
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+class IndexSnapshot:
+    """
+    One published index: FAISS index, metadata store and BM25 index read
+    from the same snapshot directory (see rag.snapshots), loaded lazily.
+
+    A query takes one IndexSnapshot and uses it throughout, so a swap to
+    a newer snapshot never mixes vectors of one build with metadata of
+    another; the old one is released when its last query finishes.
+    """
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self.index_file, self.meta_dir, self.bm25_dir = snapshots.layout(self.root)
+        self.manifest = snapshots.read_manifest(self.root)
+        # None for an index built before snapshots (flat layout)
+        self.id = self.manifest["id"] if self.manifest else None
+
+        self._lock = threading.Lock()
+        self._index = None
+        self._meta = None
+        self._lexical = None
+        self._lexical_loaded = False
+        self._index_params = None
+        self._search_params = {}
+        self._partition_vectors = {}
+
+    @property
+    def index(self):
+        if self._index is None:
+            with self._lock:
+                if self._index is None:
+                    self._index = read_index_mmap(self.index_file)
+        return self._index
+
+    @property
+    def meta(self):
+        if self._meta is None:
+            with self._lock:
+                if self._meta is None:
+                    self._meta = MetaStore(self.meta_dir)
+        return self._meta
+
+    @property
+    def lexical(self):
+        """BM25 index built next to the FAISS index, or None if there is none."""
+        if not self._lexical_loaded:
+            with self._lock:
+                if not self._lexical_loaded:
+                    if (self.bm25_dir / "header.json").exists():
+                        self._lexical = BM25Index(self.bm25_dir)
+                    self._lexical_loaded = True
+        return self._lexical
+
+    @property
+    def index_params(self) -> dict:
+        """Build-time parameters of the index (type, nprobe, ef_search, ...)."""
+        if self._index_params is None:
+            self._index_params = ann.read_params(self.index_file, self.index)
+        return self._index_params
+
+    def load(self):
+        """
+        Read everything a query needs and check that the parts agree with
+        each other and with the manifest. Raises ValueError if not.
+        """
+        index, meta = self.index, self.meta
+        self.lexical
+        self.index_params
+
+        if index.ntotal != meta.count:
+            raise ValueError(f"{self.root}: {index.ntotal} vectors but {meta.count} metadata rows")
+        if self.manifest:
+            expected = (self.manifest.get("count"), self.manifest.get("dim"))
+            if expected != (index.ntotal, index.d):
+                raise ValueError(
+                    f"{self.root}: index has {index.ntotal} x {index.d} vectors, "
+                    f"manifest says {expected[0]} x {expected[1]}"
+                )
+        return self
+
+    def search_params(self, service: str | None = None):
+        """
+        FAISS search parameters for the index type, with an ID selector
+        restricting the query to one service partition and / or excluding
+        tombstoned rows.
+
+        Returns (ok, params): ok is False when the service has no chunks.
+        """
+        ok, params, _, _ = self._service(service)
+        return ok, params
+
+    def _service(self, service: str | None):
+        # (ok, params, live partition rows or None, selectors), cached
+        if service not in self._search_params:
+            meta = self.meta
+            selectors = []
+            ok = True
+            rows = None
+            fraction = 1.0
+
+            if service:
+                code = meta.code("service", service)
+                rows = meta.partition(code) if code is not None else np.zeros(0, dtype=np.int64)
+                rows = rows[meta.live(rows)] if len(rows) else rows
+                if len(rows) == 0:
+                    ok = False
+                else:
+                    selectors.append(faiss.IDSelectorBatch(rows))
+                    fraction = len(rows) / max(self.index.ntotal, 1)
+            elif meta.n_deleted:
+                # Tombstoned rows stay in FAISS until compaction
+                selectors.append(faiss.IDSelectorBatch(meta.deleted_rows()))
+                selectors.append(faiss.IDSelectorNot(selectors[-1]))
+
+            selector = selectors[-1] if selectors else None
+            params = ann.search_parameters(self.index, self.index_params, selector, fraction) if ok else None
+            # Keep the selectors referenced alongside the params that use them
+            self._search_params[service] = (ok, params, rows, selectors)
+
+        return self._search_params[service]
+
+    def dense_search(self, q_embs: np.ndarray, n: int, service: str | None = None):
+        """
+        Top ``n`` (scores, ids) per query among the live rows of the
+        service (or of the whole index), like index.search(). None when
+        the service has no chunks.
+
+        IVF and HNSW indexes apply the service's ID selector only to the
+        vectors their probes reach, which can miss a small partition
+        entirely. Partitions up to EXACT_PARTITION_ROWS are therefore
+        scored exactly; for larger ones the probes are widened (see
+        ann.search_parameters) and queries still left short are finished
+        with an exact scan of the partition. Every query gets
+        min(n, partition size) results.
+        """
+        ok, params, rows, _ = self._service(service)
+        if not ok:
+            return None
+
+        index = self.index
+        if rows is not None and len(rows) <= EXACT_PARTITION_ROWS:
+            return ann.top_k(q_embs, self._partition(service, rows), rows, n)
+
+        scores, ids = index.search(q_embs, n, params=params)
+        if rows is not None:
+            short = np.flatnonzero((ids != -1).sum(axis=1) < min(n, len(rows)))
+            if len(short):
+                with self._lock:
+                    ann.prepare_decode(index)
+                scores[short], ids[short] = ann.exact_search(index, q_embs[short], rows, n)
+        return scores, ids
+
+    def _partition(self, service: str, rows: np.ndarray) -> np.ndarray:
+        # Decoded vectors of a small partition, in the order of ``rows``
+        vectors = self._partition_vectors.get(service)
+        if vectors is None:
+            index = self.index
+            with self._lock:
+                vectors = self._partition_vectors.get(service)
+                if vectors is None:
+                    ann.prepare_decode(index)
+                    vectors = self._partition_vectors[service] = ann.reconstruct(index, rows)
+        return vectors
+
+
+class SnapshotHandle:
+    """
+    The published snapshot of one index root. The snapshot pointer is
+    re-read at most every ``reload_interval`` seconds; a new snapshot is
+    loaded by the query that notices it while the others keep using the
+    current one, then swapped in.
+    """
+
+    # Snapshots kept reachable by id after a swap, for rag.shard_server
+    # fetches that follow a candidates call
+    RECENT = 2
+
+    def __init__(self, root: Path, reload_interval: float = RELOAD_INTERVAL):
+        self.root = Path(root)
+        self.reload_interval = reload_interval
+
+        self._snapshot = None
+        self._recent = OrderedDict()
+        self._reload_lock = threading.Lock()
+        self._next_check = 0.0
+
+    def snapshot(self) -> IndexSnapshot:
+        """The snapshot to run a query against, swapping to a newly published one."""
+        current = self._snapshot
+        if current is not None and time.monotonic() < self._next_check:
+            return current
+
+        # Only one thread checks and loads; the others carry on with the
+        # current snapshot (and wait only if there is none yet)
+        if not self._reload_lock.acquire(blocking=current is None):
+            return current
+        try:
+            if self._snapshot is not current:
+                return self._snapshot
+            self._next_check = time.monotonic() + self.reload_interval
+
+            root = snapshots.resolve(self.root)
+            if current is not None and root == current.root:
+                return current
+
+            fresh = IndexSnapshot(root)
+            if current is not None:
+                try:
+                    fresh.load()
+                except (OSError, RuntimeError, ValueError) as e:
+                    print(f"[WARN] Not swapping to index snapshot {root.name}: {e}")
+                    return current
+                print(f"[INFO] Swapped to index snapshot {fresh.id}")
+
+            self._snapshot = fresh
+            self._recent[fresh.id] = fresh
+            while len(self._recent) > self.RECENT:
+                self._recent.popitem(last=False)
+            return fresh
+        finally:
+            self._reload_lock.release()
+
+    def get(self, snapshot_id: str | None) -> IndexSnapshot | None:
+        """A recently served snapshot by id (None if it has been released)."""
+        return self._recent.get(snapshot_id)
+
+
+# ------------------------------------------------------------
+# Shards
+# ------------------------------------------------------------
+
+class Candidates(NamedTuple):
+    """
+    One shard's candidates for one query: FAISS and BM25 hits (best
+    first) with the source/service/heading boost of each row. The
+    lexical fields are None when the shard has no BM25 index.
+    """
+    dense_ids: np.ndarray
+    dense_scores: np.ndarray
+    dense_boost: np.ndarray
+    lexical_ids: np.ndarray | None = None
+    lexical_scores: np.ndarray | None = None
+    lexical_boost: np.ndarray | None = None
+
+
+class LocalShard:
+    """Shard read from this machine's disk."""
+
+    def __init__(self, name: str, root: Path, reload_interval: float = RELOAD_INTERVAL):
+        self.name = name
+        self.handle = SnapshotHandle(root, reload_interval)
+
+    def start(self, queries: list[str], services: list) -> "LocalShardQuery":
+        return LocalShardQuery(self.handle.snapshot(), queries, services)
+
+    def info(self) -> dict:
+        snapshot = self.handle.snapshot()
+        manifest = snapshot.manifest or {}
+        return {
+            "id": snapshot.id,
+            "path": str(snapshot.root),
+            "created": manifest.get("created"),
+            "count": manifest.get("count"),
+            "model": manifest.get("model"),
+        }
+
+
+class LocalShardQuery:
+    """One batch of queries against one snapshot of a local shard."""
+
+    def __init__(self, snapshot: IndexSnapshot, queries: list[str], services: list):
+        self.snapshot = snapshot
+        self.queries = queries
+        self.services = services
+        self._lexical = None
+
+    def term_stats(self):
+        """BM25Index.term_stats() of every query, or None without a BM25 index."""
+        lexical = self.snapshot.lexical
+        if lexical is None:
+            return None
+        return [lexical.term_stats(query) for query in self.queries]
+
+    def start_lexical(self, stats=None):
+        """
+        Submit the BM25 lookups (with corpus-wide ``stats`` per query), so
+        they run while the caller does something else.
+        """
+        lexical = self.snapshot.lexical
+        self._lexical = {}
+        if lexical is None:
+            return
+        for pos, (query, service) in enumerate(zip(self.queries, self.services)):
+            self._lexical[pos] = _lexical_pool.submit(
+                _lexical_search, self.snapshot.meta, lexical, query, service,
+                stats[pos] if stats else None,
+            )
+
+    def candidates(self, q_embs: np.ndarray, n_dense: int, stats=None) -> list[Candidates | None]:
+        if self._lexical is None:
+            self.start_lexical(stats)
+
+        snapshot = self.snapshot
+        meta = snapshot.meta
+        out = [None] * len(self.queries)
+
+        groups = {}
+        for pos, service in enumerate(self.services):
+            groups.setdefault(service, []).append(pos)
+
+        for service, positions in groups.items():
+            found = snapshot.dense_search(q_embs[positions], n_dense, service)
+            if found is None:
+                continue
+
+            scores, ids = found
+
+            for row, pos in enumerate(positions):
+                valid = ids[row] != -1
+                dense_ids, dense_scores = ids[row][valid], scores[row][valid]
+                query = self.queries[pos]
+
+                lexical_ids = lexical_scores = lexical_boost = None
+                if pos in self._lexical:
+                    lexical_ids, lexical_scores = self._lexical[pos].result()
+                    lexical_boost = _boosts(meta, query, service, lexical_ids)
+
+                out[pos] = Candidates(
+                    dense_ids, dense_scores, _boosts(meta, query, service, dense_ids),
+                    lexical_ids, lexical_scores, lexical_boost,
+                )
+
+        return out
+
+    def fetch(self, rows) -> list[dict]:
+        return [self.snapshot.meta.get(int(row)) for row in rows]
+
+
+class RemoteShard:
+    """
+    Shard served by rag.shard_server on another host. Query vectors are
+    sent along, so the shard host does not need the embedding model.
+    """
+
+    def __init__(self, name: str, url: str, timeout: float = REMOTE_TIMEOUT):
+        self.name = name
+        self.url = url
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def start(self, queries: list[str], services: list) -> "RemoteShardQuery":
+        return RemoteShardQuery(self, queries, services)
+
+    def post(self, endpoint: str, body: dict) -> dict:
+        response = self.session.post(f"{self.url}/{endpoint}", json=body, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+    def info(self) -> dict:
+        return {"url": self.url}
+
+
+class RemoteShardQuery:
+
+    def __init__(self, shard: RemoteShard, queries: list[str], services: list):
+        self.shard = shard
+        self.queries = queries
+        self.services = services
+        self.snapshot_id = None
+
+    def term_stats(self):
+        try:
+            reply = self.shard.post("stats", {"shard": self.shard.name, "queries": self.queries})
+        except (requests.RequestException, ValueError) as e:
+            print(f"[WARN] Shard {self.shard.name} unavailable: {e}")
+            return None
+        return stats_from_json(reply["stats"])
+
+    def start_lexical(self, stats=None):
+        # BM25 runs on the shard host, as part of candidates()
+        pass
+
+    def candidates(self, q_embs: np.ndarray, n_dense: int, stats=None) -> list[Candidates | None]:
+        try:
+            reply = self.shard.post("candidates", {
+                "shard": self.shard.name,
+                "queries": self.queries,
+                "services": self.services,
+                "vectors": q_embs.tolist(),
+                "n_dense": n_dense,
+                "stats": stats_to_json(stats),
+            })
+        except (requests.RequestException, ValueError) as e:
+            # A missing shard degrades results instead of failing the query
+            print(f"[WARN] Shard {self.shard.name} unavailable: {e}")
+            return [None] * len(self.queries)
+
+        self.snapshot_id = reply["snapshot"]
+        return [candidates_from_json(c) for c in reply["results"]]
+
+    def fetch(self, rows) -> list[dict] | None:
+        try:
+            reply = self.shard.post("fetch", {
+                "shard": self.shard.name,
+                "snapshot": self.snapshot_id,
+                "rows": [int(row) for row in rows],
+            })
+        except (requests.RequestException, ValueError) as e:
+            print(f"[WARN] Shard {self.shard.name} fetch failed: {e}")
+            return None
+        return reply["records"]
+
+
+def candidates_to_json(candidates: Candidates | None):
+    if candidates is None:
+        return None
+    return {
+        field: value.tolist() if value is not None else None
+        for field, value in candidates._asdict().items()
+    }
+
+
+def candidates_from_json(data: dict | None) -> Candidates | None:
+    if data is None:
+        return None
+    dtypes = {"ids": np.int64, "scores": np.float32, "boost": np.float64}
+    return Candidates(**{
+        field: np.asarray(value, dtype=dtypes[field.split("_")[1]]) if value is not None else None
+        for field, value in data.items()
+    })
+
+
+def stats_to_json(stats):
+    if stats is None:
+        return None
+    return [[int(n), float(total), df.tolist()] for n, total, df in stats]
+
+
+def stats_from_json(data):
+    if data is None:
+        return None
+    return [(n, total, np.asarray(df, dtype=np.int64)) for n, total, df in data]
+
+
+def _corpus_stats(per_shard: list) -> list | None:
+    """Sum the term_stats() of all shards, query by query."""
+    per_shard = [stats for stats in per_shard if stats is not None]
+    if not per_shard:
+        return None
+    return [
+        (sum(s[0] for s in per_query), sum(s[1] for s in per_query), sum(s[2] for s in per_query))
+        for per_query in zip(*per_shard)
+    ]
+
+
+# ------------------------------------------------------------
+# Store
+# ------------------------------------------------------------
+
+class IndexStore:
+    """
+    Index shards plus the lazily loaded embedding backend.
+
+    Nothing is read from disk until the first query needs it, so
+    importing this module (e.g. via cli.py --help) stays cheap. The set
+    of shards is re-discovered every ``reload_interval`` seconds, so a
+    newly built shard is picked up like a newly published snapshot.
+    """
+
+    def __init__(self, index_dir: Path, model_name: str = MODEL_NAME,
+                 backend: str | None = None, reload_interval: float = RELOAD_INTERVAL,
+                 remote: dict[str, str] | None = None):
+        self.index_dir = Path(index_dir)
+        self.model_name = model_name
+        self.backend_kind = backend or DEFAULT_BACKEND
+        # Query cache key: embeddings differ (slightly) between backends
+        self.embedding_name = backend_name(self.backend_kind, model_name)
+        self.reload_interval = reload_interval
+
+        self.query_cache = QueryEmbeddingCache()
+
+        self._lock = threading.Lock()
+        self._backend = None
+
+        self._local = {}
+        self._remote = {name: RemoteShard(name, url) for name, url in (remote or {}).items()}
+        self._shards = []
+        self._next_scan = 0.0
+
+        # Replaceable, e.g. by an EmbeddingBatcher in the retrieval server
+        self.encoder = self.encode_texts
+
+    def shards(self) -> list:
+        """Local and remote shards, re-scanning the index directory when due."""
+        if time.monotonic() >= self._next_scan:
+            with self._lock:
+                if time.monotonic() >= self._next_scan:
+                    found = shards.local_shards(self.index_dir)
+                    for name, root in found.items():
+                        if name not in self._local:
+                            self._local[name] = LocalShard(name, root, self.reload_interval)
+                    self._shards = [self._local[name] for name in found] + list(self._remote.values())
+                    self._next_scan = time.monotonic() + self.reload_interval
+
+        if not self._shards:
+            raise FileNotFoundError(f"No index found in {self.index_dir}")
+        return self._shards
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            with self._lock:
+                if self._backend is None:
+                    # Deferred: loading torch / onnxruntime is the slow part
+                    self._backend = load_backend(self.backend_kind, self.model_name)
+        return self._backend
+
+    def encode_texts(self, texts: list[str]):
+        return self.backend.encode(texts)
+
+    def encode_queries(self, queries: list[str]):
+        """
+        Normalized float32 embeddings of shape (len(queries), dim).
+        Cache misses are encoded together in a single model call.
+        """
+        embs = [self.query_cache.get(self.embedding_name, q) for q in queries]
+
+        missing = {normalize_query(q): q for q, e in zip(queries, embs) if e is None}
+        if missing:
+            encoded = self.encoder(list(missing.values()))
+            fresh = dict(zip(missing, encoded))
+            for q, emb in zip(missing.values(), encoded):
+                self.query_cache.put(self.embedding_name, q, emb)
+            embs = [fresh[normalize_query(q)] if e is None else e for q, e in zip(queries, embs)]
+
+        return np.vstack(embs).astype("float32")
+
+    def encode_query(self, query: str):
+        """Normalized float32 embedding of shape (1, dim), cached per query."""
+        return self.encode_queries([query])
+
+
+_store = IndexStore(INDEX_DIR, MODEL_NAME, DEFAULT_BACKEND, remote=shards.remote_shards())
+
+# BM25 lookups run here while the main thread encodes the queries
+_lexical_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="bm25")
+
+# Shards are searched concurrently; FAISS releases the GIL while searching
+_shard_pool = ThreadPoolExecutor(max_workers=SHARD_WORKERS, thread_name_prefix="shard")
+
+
+def query_cache_stats() -> dict:
+    return _store.query_cache.stats()
+
+
+def snapshot_info() -> dict:
+    """Per shard: id, path and manifest summary of the snapshot queries run on."""
+    return {shard.name: shard.info() for shard in _store.shards()}
+
+
+def enable_micro_batching(max_batch: int = 64, max_wait_ms: float = 5.0):
+    """
+    Route query encodings from concurrent callers through one batched
+    model call (used by the long-running retrieval server).
+    """
+    from rag.batcher import EmbeddingBatcher
+
+    batcher = EmbeddingBatcher(_store.encode_texts, max_batch, max_wait_ms)
+    _store.encoder = batcher.encode
+    return batcher
+
+
+def warm_up():
+    """Load the local shards' indexes, metadata, BM25 indexes and the model up front."""
+    for shard in _store.shards():
+        if isinstance(shard, LocalShard):
+            shard.handle.snapshot().load()
+    _store.encode_texts(["warm up"])
 
 
 def search(query: str, service: str | None = None, k: int = 5):
-    q_emb = _model.encode([query], normalize_embeddings=True).astype("float32")
+    return search_many([query], [service], k=k)[0]
 
-    scores, ids = _index.search(q_emb, 50)  # fetch extra for filtering
-    candidates = []
 
-    for i, similarity_score in zip(ids[0], scores[0]):
-        if i == -1:
-            continue
+def search_many(queries: list[str], services=None, k: int = 5) -> list[list[dict]]:
+    """
+    Batched search(): all queries are encoded in one model call and looked
+    up with one matrix FAISS search per distinct service. ``services`` is
+    either a single service (or None) applied to every query, or one entry
+    per query. Returns one result list per query, each shaped like search().
+
+    A service filter restricts the dense search to the service's partition
+    (see IndexSnapshot.dense_search), so every candidate belongs to the
+    service and k results are returned whenever the partition holds at
+    least k chunks, on every index type. Partitions of up to
+    EXACT_PARTITION_ROWS chunks are scanned exactly, in time proportional
+    to their size. Larger ones are searched through the index with the
+    partition's ID selector; on a flat index that still scans all vectors.
+
+    When a BM25 index exists, each query also runs a lexical search in
+    parallel with the dense one and both rankings are merged by
+    reciprocal-rank fusion before boosting; scores are then RRF scores,
+    which only order the results. Each result's "similarity" keeps the
+    cosine of the query and the chunk (None when only BM25 found it).
+
+    With several shards, every shard is searched concurrently and the
+    candidates of all shards are ranked together, as if they came from
+    one index. Each shard's part of a batch runs against one snapshot,
+    even if a newer one is published meanwhile.
+    """
+    if not queries:
+        return []
 
-        chunk = _meta[i]
-        score = float(similarity_score)
+    if services is None or isinstance(services, str):
+        services = [services] * len(queries)
+    if len(services) != len(queries):
+        raise ValueError("services must be a single value or one per query")
 
-        # Penalize release notes
-        if chunk.get("source") == "releasenotes":
-            score *= 0.5
+    runs = [shard.start(queries, services) for shard in _store.shards()]
+    n_dense = max(CANDIDATES, k)
 
-        # Boost GitHub for failure/bug queries
-        if chunk.get("source") == "github":
-            if any(word in query.lower() for word in [
-                "error", "bug", "exception", "traceback",
-                "failure", "regression", "stacktrace"
-            ]):
-                score *= 1.25
+    # BM25 scores of different shards only compare under the same corpus
+    # statistics; they are gathered while the queries are encoded
+    if len(runs) == 1:
+        runs[0].start_lexical()
+        q_embs = _store.encode_queries(queries)
+        per_shard = [runs[0].candidates(q_embs, n_dense)]
+    else:
+        stats_futures = [_shard_pool.submit(run.term_stats) for run in runs]
+        q_embs = _store.encode_queries(queries)
+        stats = _corpus_stats([f.result() for f in stats_futures])
+        per_shard = list(_shard_pool.map(lambda run: run.candidates(q_embs, n_dense, stats), runs))
 
-        # Boost matching service if explicit
-        if service and chunk.get("service") == service:
-            score *= 1.1
+    # Rank each query's candidates across shards, then decode only the winners
+    winners = [_merge([cands[pos] for cands in per_shard], n_dense, k) for pos in range(len(queries))]
 
-        # Boost documentation for how-to/config queries
-        if chunk.get("source") == "docs":
-            if any(word in query.lower() for word in [
-                "how", "configure", "setup", "install", "create"
-            ]):
-                score *= 1.2
+    wanted = {}
+    for pos, (shard_ids, rows, _, _) in enumerate(winners):
+        for shard_id, row in zip(shard_ids, rows):
+            wanted.setdefault(shard_id, {})[int(row)] = None
 
-        heading = (chunk.get("heading") or "").lower()
-        if any(word in heading for word in query.lower().split()):
-            score *= 1.15
+    def fetch(shard_id):
+        rows = list(wanted[shard_id])
+        records = runs[shard_id].fetch(rows)
+        return shard_id, dict(zip(rows, records)) if records is not None else {}
 
-        if "security" in query.lower() and chunk.get("service") == "neutron":
-            score *= 1.2
+    if len(wanted) <= 1:
+        fetched = dict(fetch(shard_id) for shard_id in wanted)
+    else:
+        fetched = dict(_shard_pool.map(fetch, wanted))
 
-        if service and chunk.get("service") != service:
+    results = []
+    for shard_ids, rows, scores, similarities in winners:
+        hits = []
+        for shard_id, row, score, similarity in zip(shard_ids, rows, scores, similarities):
+            record = fetched[shard_id].get(int(row))
+            if record is not None:
+                r = dict(record)
+                r["score"] = float(score)
+                r["similarity"] = None if np.isnan(similarity) else float(similarity)
+                hits.append(r)
+        results.append(hits)
+
+    return results
+
+
+def _lexical_search(meta, lexical, query: str, service: str | None, stats=None):
+    keep = None
+    if service:
+        code = meta.code("service", service)
+        keep = lambda rows: (meta.codes["service"][rows] == code) & meta.live(rows)
+    elif meta.n_deleted:
+        keep = meta.live
+
+    return lexical.search(query, LEXICAL_CANDIDATES, keep=keep, stats=stats)
+
+
+def _merge(candidates: list[Candidates | None], n_dense: int, k: int):
+    """
+    Top-k of one query over all shards. Dense hits are ranked together
+    by similarity (comparable across shards: same model, same metric),
+    BM25 hits by score, and the two rankings fused by reciprocal rank
+    before the boosts are applied. Rows are keyed by (shard, row) so
+    row ids of different shards do not collide.
+
+    Returns (shard ids, rows, scores, similarities), best first; the
+    similarity is the cosine of a dense candidate, NaN for rows only
+    BM25 found.
+    """
+    keys, dense_scores, lexical_keys, lexical_scores, boost_keys, boosts = [], [], [], [], [], []
+    for shard_id, c in enumerate(candidates):
+        if c is None:
             continue
+        base = np.int64(shard_id) << SHARD_SHIFT
+        keys.append(base + c.dense_ids)
+        dense_scores.append(c.dense_scores)
+        boost_keys.append(base + c.dense_ids)
+        boosts.append(c.dense_boost)
+        if c.lexical_ids is not None:
+            lexical_keys.append(base + c.lexical_ids)
+            lexical_scores.append(c.lexical_scores)
+            boost_keys.append(base + c.lexical_ids)
+            boosts.append(c.lexical_boost)
+
+    empty = np.zeros(0, dtype=np.int64)
+    if not keys:
+        return empty, empty, np.zeros(0), np.zeros(0)
+
+    dense_keys, dense = _top(keys, dense_scores, n_dense)
+    if lexical_keys:
+        lexical_ranked, _ = _top(lexical_keys, lexical_scores, LEXICAL_CANDIDATES)
+        ids, scores = _fuse(dense_keys, lexical_ranked)
+    else:
+        ids, scores = dense_keys, dense.astype(np.float64)
+
+    if len(ids) == 0:
+        return empty, empty, np.zeros(0), np.zeros(0)
 
-        r = chunk.copy()
-        r["score"] = score
-        candidates.append(r)
+    # Boost of each candidate, looked up by key
+    boost_keys = np.concatenate(boost_keys)
+    boosts = np.concatenate(boosts)
+    order = np.argsort(boost_keys, kind="stable")
+    boost_keys, boosts = boost_keys[order], boosts[order]
+    final = scores * boosts[np.searchsorted(boost_keys, ids)]
 
     # Now sort AFTER boosting
-    candidates.sort(key=lambda x: x["score"], reverse=True)
+    order = np.argsort(-final, kind="stable")[:k]
+    ids = ids[order]
+    return ids >> SHARD_SHIFT, ids & ((1 << SHARD_SHIFT) - 1), final[order], _similarities(ids, dense_keys, dense)
+
+
+def _similarities(ids, dense_keys, dense):
+    # Cosine of each id among the dense candidates, NaN where it is not one
+    out = np.full(len(ids), np.nan)
+    if len(dense_keys):
+        order = np.argsort(dense_keys, kind="stable")
+        sorted_keys = dense_keys[order]
+        pos = np.minimum(np.searchsorted(sorted_keys, ids), len(sorted_keys) - 1)
+        hit = sorted_keys[pos] == ids
+        out[hit] = dense[order][pos[hit]]
+    return out
+
+
+def _top(keys: list[np.ndarray], scores: list[np.ndarray], n: int):
+    keys, scores = np.concatenate(keys), np.concatenate(scores)
+    order = np.argsort(-scores, kind="stable")[:n]
+    return keys[order], scores[order]
+
+
+def _fuse(dense_ids, lexical_ids):
+    """
+    Reciprocal-rank fusion of the FAISS and BM25 rankings (both best
+    first). Returns (ids, scores) ordered by fused score.
+    """
+    ids = np.concatenate([dense_ids, lexical_ids]).astype(np.int64)
+    ranks = np.concatenate([np.arange(len(dense_ids)), np.arange(len(lexical_ids))])
+
+    rows, inverse = np.unique(ids, return_inverse=True)
+    scores = np.bincount(inverse, weights=1.0 / (RRF_K + ranks + 1))
+
+    order = np.argsort(-scores, kind="stable")
+    return rows[order], scores[order]
+
+
+def _boosts(meta, query: str, service: str | None, ids) -> np.ndarray:
+    """
+    Source/service/heading multiplier of each candidate row. Query intent
+    is evaluated once; the boosts are array operations over the
+    precomputed code columns and heading tokens, so the cost barely
+    moves when CANDIDATES grows.
+    """
+    if len(ids) == 0:
+        return np.zeros(0)
+
+    codes = meta.codes[ids]
+
+    q = query.lower()
+    bug_query = any(word in q for word in BUG_WORDS)
+    howto_query = any(word in q for word in HOWTO_WORDS)
+
+    # Per-source multiplier table, indexed by source code
+    source_boost = np.ones(len(meta.vocab["source"]))
+    _set_boost(source_boost, meta.code("source", "releasenotes"), RELEASENOTES_PENALTY)
+    if bug_query:
+        _set_boost(source_boost, meta.code("source", "github"), GITHUB_BUG_BOOST)
+    if howto_query:
+        _set_boost(source_boost, meta.code("source", "docs"), DOCS_HOWTO_BOOST)
+
+    boost = source_boost[codes["source"]]
+
+    if service:
+        # Candidates are already restricted to the service's partition
+        boost = boost * SERVICE_BOOST
+
+    heading_hit = meta.heading_matches(ids, token_ids(query))
+    boost = boost * np.where(heading_hit, HEADING_BOOST, 1.0)
+
+    if "security" in q:
+        neutron_code = meta.code("service", "neutron")
+        boost = boost * np.where(codes["service"] == neutron_code, SECURITY_NEUTRON_BOOST, 1.0)
+
+    return boost
+
 
-    return candidates[:k]
+def _set_boost(table, code, factor):
+    if code is not None:
+        table[code] *= factor
 
 
 if __name__ == "__main__":
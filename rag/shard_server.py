@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+
+"""
+Serves index shards to rag.search on other hosts.
+
+The coordinator (rag.search) encodes the queries and sends the vectors,
+so a shard host needs the index files but not the embedding model.
+Shards hot-swap to newly published snapshots like local ones.
+
+Endpoints (JSON in, JSON out):
+    GET  /health
+    POST /stats       {"shard", "queries"} → {"stats"}
+    POST /candidates  {"shard", "queries", "services", "vectors", "n_dense", "stats"}
+                      → {"snapshot", "results": [candidates per query]}
+    POST /fetch       {"shard", "snapshot", "rows"} → {"records"}
+
+/stats returns each shard's BM25 term statistics; the coordinator sums
+them and passes the corpus-wide figures back with /candidates, so BM25
+scores of different shards compare. /fetch names the snapshot /candidates answered from, so the rows still
+mean the same chunks if a newer snapshot was published in between.
+
+Usage:
+    python -m rag.shard_server --port 8770 --shards code-nova,github-nova
+    RAG_REMOTE_SHARDS="code-nova=http://host:8770,github-nova=http://host:8770" \
+        python server.py
+"""
+
+import argparse
+import json
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import numpy as np
+
+from rag import shards, snapshots
+from rag.search import LocalShard, candidates_to_json, stats_from_json, stats_to_json
+
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8770
+
+
+class Handler(BaseHTTPRequestHandler):
+    server_version = "ShardServer/1.0"
+
+    def do_GET(self):
+        if self.path != "/health":
+            return self._send(404, {"error": f"Unknown endpoint {self.path}"})
+
+        self._send(200, {
+            "status": "ok",
+            "uptime_s": round(time.monotonic() - self.server.started, 1),
+            "shards": {name: shard.info() for name, shard in self.server.shards.items()},
+        })
+
+    def do_POST(self):
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError as e:
+            return self._send(400, {"error": f"Invalid JSON body: {e}"})
+
+        try:
+            shard = self.server.shards.get(body["shard"])
+            if shard is None:
+                return self._send(404, {"error": f"Unknown shard {body['shard']!r}"})
+
+            if self.path == "/stats":
+                run = shard.start(body["queries"], [None] * len(body["queries"]))
+                return self._send(200, {"stats": stats_to_json(run.term_stats())})
+
+            if self.path == "/candidates":
+                run = shard.start(body["queries"], body["services"])
+                vectors = np.asarray(body["vectors"], dtype="float32")
+                stats = stats_from_json(body.get("stats"))
+                results = run.candidates(vectors, int(body["n_dense"]), stats)
+                return self._send(200, {
+                    "snapshot": run.snapshot.id,
+                    "results": [candidates_to_json(c) for c in results],
+                })
+
+            if self.path == "/fetch":
+                snapshot = shard.handle.get(body["snapshot"])
+                if snapshot is None:
+                    return self._send(409, {"error": f"Snapshot {body['snapshot']} is no longer served"})
+                return self._send(200, {"records": [snapshot.meta.get(int(r)) for r in body["rows"]]})
+
+        except KeyError as e:
+            return self._send(400, {"error": f"Missing field {e}"})
+        except Exception as e:
+            return self._send(500, {"error": f"{type(e).__name__}: {e}"})
+
+        self._send(404, {"error": f"Unknown endpoint {self.path}"})
+
+    def _send(self, status: int, payload: dict):
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, fmt, *args):
+        print(f"[{self.log_date_time_string()}] {fmt % args}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--index-dir", default=str(snapshots.INDEX_DIR))
+    parser.add_argument("--shards", help="Comma-separated shards to serve (default: all local ones)")
+    args = parser.parse_args()
+
+    found = shards.local_shards(Path(args.index_dir))
+    if args.shards:
+        wanted = args.shards.split(",")
+        missing = [name for name in wanted if name not in found]
+        if missing:
+            raise SystemExit(f"No index for shards: {', '.join(missing)}")
+        found = {name: found[name] for name in wanted}
+
+    print(f"[INFO] Loading shards: {', '.join(found)}")
+    served = {}
+    for name, root in found.items():
+        served[name] = LocalShard(name, root)
+        served[name].handle.snapshot().load()
+
+    server = ThreadingHTTPServer((args.host, args.port), Handler)
+    server.daemon_threads = True
+    server.started = time.monotonic()
+    server.shards = served
+
+    print(f"[INFO] Serving {len(served)} shards on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
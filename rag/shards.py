@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+
+"""
+Index shards.
+
+The corpus can be split into shards per source (docs, releasenotes,
+github, code, ...) or per repo, each a separate snapshot root with its
+own FAISS index, metadata store and BM25 index:
+
+    data/processed/index/
+        CURRENT, snapshots/     the unsharded index ("main"), if any
+        shards/<name>/
+            CURRENT, snapshots/
+
+Each shard is built, published and rolled back on its own (see
+rag.snapshots), so re-ingesting one large repo does not rebuild the
+rest. rag.search queries every shard concurrently and merges the
+results. Shards can also be served from other hosts by
+rag.shard_server and listed in RAG_REMOTE_SHARDS:
+
+    RAG_REMOTE_SHARDS="code-nova=http://10.0.0.5:8770,github=http://10.0.0.6:8770"
+
+Usage:
+    python -m rag.shards list
+"""
+
+import argparse
+import os
+import re
+from pathlib import Path
+
+from rag import snapshots
+
+
+SHARDS_DIR = "shards"
+
+# Name of the unsharded index at the root of the index directory
+MAIN_SHARD = "main"
+
+SHARD_BY = ("none", "source", "repo")
+
+REMOTE_SHARDS = os.getenv("RAG_REMOTE_SHARDS", "")
+
+
+def shard_root(name: str, index_dir: Path = snapshots.INDEX_DIR) -> Path:
+    if name == MAIN_SHARD:
+        return Path(index_dir)
+    return Path(index_dir) / SHARDS_DIR / name
+
+
+def shard_name(chunk: dict, shard_by: str) -> str:
+    """Shard a chunk belongs to: its source, or its repo (falling back to the source)."""
+    if shard_by == "none":
+        return MAIN_SHARD
+    if shard_by == "source":
+        value = chunk.get("source")
+    elif shard_by == "repo":
+        value = chunk.get("repo") or chunk.get("source")
+    else:
+        raise ValueError(f"Unknown shard key {shard_by!r}, expected one of {SHARD_BY}")
+    # Shard names are directory names
+    return re.sub(r"[^A-Za-z0-9_.-]+", "__", str(value or "unknown"))
+
+
+def has_index(root: Path) -> bool:
+    root = Path(root)
+    return (root / snapshots.CURRENT_FILE).exists() or (root / snapshots.INDEX_FILE).exists()
+
+
+def local_shards(index_dir: Path = snapshots.INDEX_DIR) -> dict[str, Path]:
+    """Name → root of every shard with an index under ``index_dir``."""
+    index_dir = Path(index_dir)
+    found = {}
+    if has_index(index_dir):
+        found[MAIN_SHARD] = index_dir
+
+    shards_dir = index_dir / SHARDS_DIR
+    if shards_dir.exists():
+        for root in sorted(shards_dir.iterdir()):
+            if root.is_dir() and has_index(root):
+                found[root.name] = root
+    return found
+
+
+def remote_shards(spec: str = REMOTE_SHARDS) -> dict[str, str]:
+    """Parse ``name=url,name=url`` into name → base URL."""
+    found = {}
+    for entry in filter(None, (e.strip() for e in spec.split(","))):
+        name, sep, url = entry.partition("=")
+        if not sep or not name or not url:
+            raise ValueError(f"Bad remote shard {entry!r}, expected name=http://host:port")
+        found[name.strip()] = url.strip().rstrip("/")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--index-dir", default=str(snapshots.INDEX_DIR))
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("list", help="List local and remote shards")
+    args = parser.parse_args()
+
+    for name, root in local_shards(Path(args.index_dir)).items():
+        manifest = snapshots.read_manifest(snapshots.resolve(root)) or {}
+        print(f"{name:<24} {root}  snapshot={manifest.get('id')}  count={manifest.get('count')}")
+    for name, url in remote_shards().items():
+        print(f"{name:<24} {url}  (remote)")
+
+
+if __name__ == "__main__":
+    main()
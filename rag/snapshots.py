@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+
+"""
+Versioned index snapshots.
+
+Every build writes a complete, self-consistent index into its own
+directory and only then publishes it:
+
+    data/processed/index/
+        CURRENT                 id of the published snapshot
+        snapshots/<id>/
+            docs.faiss          FAISS index (+ docs.faiss.json parameters)
+            docs_meta/          metadata store
+            bm25/               BM25 index
+            manifest.json       model, dimension, row count, checksums
+
+Publishing replaces CURRENT with os.replace(), so a reader sees either
+the old snapshot or the new one, never a FAISS index from one build
+with metadata from another. rag.search polls CURRENT and swaps to a
+new snapshot while queries already running finish on the old one.
+
+Without a CURRENT file the index directory itself is read (the layout
+used before snapshots), so existing indexes keep working.
+
+Usage:
+    python -m rag.snapshots list
+    python -m rag.snapshots verify [<id>]
+    python -m rag.snapshots publish <id>
+    python -m rag.snapshots prune --keep 2
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import time
+import uuid
+from pathlib import Path
+
+
+INDEX_DIR = Path("data/processed/index")
+
+SNAPSHOTS_DIR = "snapshots"
+CURRENT_FILE = "CURRENT"
+MANIFEST_FILE = "manifest.json"
+
+INDEX_FILE = "docs.faiss"
+META_DIR = "docs_meta"
+BM25_DIR = "bm25"
+
+# Older snapshots kept by prune() besides the published one, for rollback
+KEEP = 2
+
+
+def layout(root: Path):
+    """(index file, metadata dir, BM25 dir) inside a snapshot."""
+    root = Path(root)
+    return root / INDEX_FILE, root / META_DIR, root / BM25_DIR
+
+
+def current_id(index_dir: Path = INDEX_DIR) -> str | None:
+    try:
+        return (Path(index_dir) / CURRENT_FILE).read_text().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def resolve(index_dir: Path = INDEX_DIR) -> Path:
+    """Directory of the published snapshot (or the legacy flat layout)."""
+    index_dir = Path(index_dir)
+    snapshot_id = current_id(index_dir)
+    if snapshot_id is None:
+        return index_dir
+    return index_dir / SNAPSHOTS_DIR / snapshot_id
+
+
+def list_ids(index_dir: Path = INDEX_DIR) -> list[str]:
+    root = Path(index_dir) / SNAPSHOTS_DIR
+    if not root.exists():
+        return []
+    # Ids start with a UTC timestamp, so name order is creation order
+    return sorted(p.name for p in root.iterdir() if p.is_dir())
+
+
+# ------------------------------------------------------------
+# Writing
+# ------------------------------------------------------------
+
+def create(index_dir: Path = INDEX_DIR) -> Path:
+    """New, empty and unpublished snapshot directory."""
+    snapshot_id = time.strftime("%Y%m%dT%H%M%SZ", time.gmtime()) + "-" + uuid.uuid4().hex[:6]
+    path = Path(index_dir) / SNAPSHOTS_DIR / snapshot_id
+    path.mkdir(parents=True)
+    return path
+
+
+def clone(index_dir: Path = INDEX_DIR) -> Path:
+    """
+    New snapshot holding a copy of the published one, for incremental
+    updates. Files are copied, not linked: the metadata store is
+    appended to and tombstoned in place.
+    """
+    src = resolve(index_dir)
+    dst = create(index_dir)
+    for path in layout(src):
+        if path.is_dir():
+            shutil.copytree(path, dst / path.name)
+        elif path.exists():
+            shutil.copy2(path, dst / path.name)
+
+    params = src / (INDEX_FILE + ".json")
+    if params.exists():
+        shutil.copy2(params, dst / params.name)
+    return dst
+
+
+def _sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as f:
+        while block := f.read(1 << 20):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _files(root: Path):
+    for path in sorted(root.rglob("*")):
+        if path.is_file() and path.name != MANIFEST_FILE:
+            yield path
+
+
+def write_manifest(snapshot: Path, **fields) -> dict:
+    """
+    Record ``fields`` (model, dim, count, ...) and the size and SHA-256
+    of every file in the snapshot.
+    """
+    snapshot = Path(snapshot)
+    manifest = {
+        "id": snapshot.name,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        **fields,
+        "files": {
+            str(path.relative_to(snapshot)): {"bytes": path.stat().st_size, "sha256": _sha256(path)}
+            for path in _files(snapshot)
+        },
+    }
+    (snapshot / MANIFEST_FILE).write_text(json.dumps(manifest, indent=2))
+    return manifest
+
+
+def read_manifest(snapshot: Path) -> dict | None:
+    path = Path(snapshot) / MANIFEST_FILE
+    if not path.exists():
+        return None
+    return json.loads(path.read_text())
+
+
+def verify(snapshot: Path) -> list[str]:
+    """Problems found comparing the snapshot to its manifest (empty if none)."""
+    snapshot = Path(snapshot)
+    manifest = read_manifest(snapshot)
+    if manifest is None:
+        return [f"{snapshot}: no {MANIFEST_FILE}"]
+
+    problems = []
+    for name, expected in manifest["files"].items():
+        path = snapshot / name
+        if not path.exists():
+            problems.append(f"{name}: missing")
+        elif path.stat().st_size != expected["bytes"]:
+            problems.append(f"{name}: {path.stat().st_size} bytes, expected {expected['bytes']}")
+        elif _sha256(path) != expected["sha256"]:
+            problems.append(f"{name}: checksum mismatch")
+    return problems
+
+
+def _fsync_dir(path: Path):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def publish(snapshot: Path, index_dir: Path = INDEX_DIR):
+    """Atomically point CURRENT at ``snapshot``."""
+    snapshot = Path(snapshot)
+    index_dir = Path(index_dir)
+    if read_manifest(snapshot) is None:
+        raise ValueError(f"{snapshot} has no manifest; refusing to publish it")
+
+    # Make the snapshot durable before anything can point at it
+    for path in _files(snapshot):
+        with path.open("rb") as f:
+            os.fsync(f.fileno())
+    _fsync_dir(snapshot)
+
+    tmp = index_dir / (CURRENT_FILE + ".tmp")
+    with tmp.open("w") as f:
+        f.write(snapshot.name + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, index_dir / CURRENT_FILE)
+    _fsync_dir(index_dir)
+
+    print(f"✔ Published snapshot {snapshot.name}")
+
+
+def prune(index_dir: Path = INDEX_DIR, keep: int = KEEP):
+    """
+    Delete snapshots older than the published one, except the ``keep``
+    most recent. Newer ones (e.g. a build still in progress) are left
+    alone. Processes still reading a deleted snapshot keep their mapped
+    files until they swap.
+    """
+    current = current_id(index_dir)
+    if current is None:
+        return
+
+    older = [s for s in list_ids(index_dir) if s < current]
+    for snapshot_id in older[:max(len(older) - keep, 0)]:
+        shutil.rmtree(Path(index_dir) / SNAPSHOTS_DIR / snapshot_id)
+        print(f"Removed snapshot {snapshot_id}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--index-dir", default=str(INDEX_DIR))
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("list", help="List snapshots")
+    verify_cmd = sub.add_parser("verify", help="Check a snapshot against its manifest")
+    verify_cmd.add_argument("id", nargs="?", help="Snapshot id (default: published)")
+    publish_cmd = sub.add_parser("publish", help="Publish a snapshot (e.g. to roll back)")
+    publish_cmd.add_argument("id")
+    prune_cmd = sub.add_parser("prune", help="Delete old snapshots")
+    prune_cmd.add_argument("--keep", type=int, default=KEEP)
+    args = parser.parse_args()
+
+    index_dir = Path(args.index_dir)
+
+    if args.command == "list":
+        current = current_id(index_dir)
+        for snapshot_id in list_ids(index_dir):
+            manifest = read_manifest(index_dir / SNAPSHOTS_DIR / snapshot_id) or {}
+            marker = "*" if snapshot_id == current else " "
+            print(f"{marker} {snapshot_id}  count={manifest.get('count')}  "
+                  f"model={manifest.get('model')}")
+
+    elif args.command == "verify":
+        snapshot = index_dir / SNAPSHOTS_DIR / args.id if args.id else resolve(index_dir)
+        problems = verify(snapshot)
+        for problem in problems:
+            print(problem)
+        print("✔ OK" if not problems else f"✘ {len(problems)} problems")
+        raise SystemExit(1 if problems else 0)
+
+    elif args.command == "publish":
+        publish(index_dir / SNAPSHOTS_DIR / args.id, index_dir)
+
+    elif args.command == "prune":
+        prune(index_dir, args.keep)
+
+
+if __name__ == "__main__":
+    main()
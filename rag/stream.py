@@ -0,0 +1,93 @@
+"""
+Incremental readers for chunk files and JSONL exports.
+
+Chunk files are single JSON arrays that can be larger than memory is
+comfortable with; iter_json_array() decodes them one element at a time
+from fixed-size blocks, so only the current element and one block are
+resident. Together with batched() this lets the index builders encode,
+add and write a corpus in bounded memory.
+"""
+
+import json
+import re
+from itertools import islice
+from pathlib import Path
+
+
+BLOCK_SIZE = 1 << 20  # characters read per refill
+
+_SEPARATORS = re.compile(r"[\s,]*")
+_WHITESPACE = re.compile(r"\s*")
+
+
+def iter_json_array(path: Path, block_size: int = BLOCK_SIZE):
+    """Yield the elements of a top-level JSON array one by one."""
+    decoder = json.JSONDecoder()
+
+    with open(path, encoding="utf-8-sig") as f:
+        buf = ""
+        while not buf.strip():
+            more = f.read(block_size)
+            if not more:
+                break
+            buf += more
+        eof = False
+
+        pos = _WHITESPACE.match(buf).end()
+        if buf[pos:pos + 1] != "[":
+            raise ValueError(f"{path}: expected a JSON array")
+        pos += 1
+
+        while True:
+            pos = _SEPARATORS.match(buf, pos).end()
+
+            if pos < len(buf) and buf[pos] == "]":
+                return
+
+            item = end = None
+            if pos < len(buf):
+                try:
+                    item, end = decoder.raw_decode(buf, pos)
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+
+            # Incomplete element, or one not yet followed by "," / "]" (a
+            # number cut at the block boundary): keep the tail, read more
+            if end is None or not _complete(buf, end):
+                if eof:
+                    raise ValueError(f"{path}: invalid or unterminated JSON array")
+                more = f.read(block_size)
+                eof = not more
+                buf, pos = buf[pos:] + more, 0
+                continue
+
+            yield item
+            pos = end
+
+
+def _complete(buf: str, end: int) -> bool:
+    nxt = _WHITESPACE.match(buf, end).end()
+    return nxt < len(buf) and buf[nxt] in ",]"
+
+
+def iter_jsonl(path: Path):
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def iter_records(path: Path):
+    """Records of a ``.jsonl`` file or of a JSON array file."""
+    path = Path(path)
+    if path.suffix == ".jsonl":
+        return iter_jsonl(path)
+    return iter_json_array(path)
+
+
+def batched(iterable, size: int):
+    """Lists of up to ``size`` consecutive items."""
+    it = iter(iterable)
+    while batch := list(islice(it, size)):
+        yield batch
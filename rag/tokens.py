@@ -0,0 +1,27 @@
+"""
+Shared tokenizer for the lexical parts of retrieval.
+
+Tokens are hashed to uint32 ids (CRC32) so they can be stored and
+compared as fixed-width NumPy arrays instead of Python strings.
+"""
+
+import re
+import zlib
+
+import numpy as np
+
+
+TOKEN_RE = re.compile(r"\w+")
+TOKEN_DTYPE = np.dtype("<u4")
+
+
+def tokenize(text: str) -> list[str]:
+    return TOKEN_RE.findall((text or "").lower())
+
+
+def token_id(token: str) -> int:
+    return zlib.crc32(token.encode("utf-8"))
+
+
+def token_ids(text: str) -> np.ndarray:
+    return np.array([token_id(t) for t in tokenize(text)], dtype=TOKEN_DTYPE)
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+
+"""
+Long-running retrieval / agent server.
+
+Keeps the FAISS index, metadata, BM25 index, embedding model and
+ReActAgent instances loaded, so each question only pays for the search
+and the LLM call. Query encodings from concurrent clients are
+micro-batched into single model calls. Newly published index snapshots
+(see rag.snapshots) and new shards (see rag.shards) are picked up
+without a restart.
+
+Endpoints (JSON in, JSON out):
+    GET  /health
+    POST /search       {"query", "service", "k"}
+    POST /search_docs  {"query", "service", "k"}
+    POST /run          {"symptom", "service", "llm", "debug"}
+
+Usage:
+    python server.py --port 8765
+    python cli.py --symptom "allocation candidates not found"
+"""
+
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from agents.react_agent import ReActAgent
+from agents.tools import search_docs
+from common import http_client
+from rag import search as rag_search
+
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+
+class AgentPool:
+    """One warm ReActAgent per (model, debug) combination."""
+
+    def __init__(self):
+        self._agents = {}
+        self._lock = threading.Lock()
+
+    def get(self, model: str | None, debug: bool) -> ReActAgent:
+        key = (model, debug)
+        with self._lock:
+            if key not in self._agents:
+                self._agents[key] = ReActAgent(model=model, debug=debug)
+            return self._agents[key]
+
+
+class Handler(BaseHTTPRequestHandler):
+    server_version = "TroubleshooterServer/1.0"
+
+    def do_GET(self):
+        if self.path != "/health":
+            return self._send(404, {"error": f"Unknown endpoint {self.path}"})
+
+        self._send(200, {
+            "status": "ok",
+            "uptime_s": round(time.monotonic() - self.server.started, 1),
+            "shards": rag_search.snapshot_info(),
+            "query_cache": rag_search.query_cache_stats(),
+            "batcher": self.server.batcher.stats(),
+            "http": http_client.shared().metrics(),
+        })
+
+    def do_POST(self):
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError as e:
+            return self._send(400, {"error": f"Invalid JSON body: {e}"})
+
+        try:
+            if self.path == "/search":
+                results = rag_search.search(
+                    body["query"], service=body.get("service"), k=body.get("k", 5)
+                )
+                return self._send(200, {"results": results})
+
+            if self.path == "/search_docs":
+                results = search_docs(
+                    body["query"], service=body.get("service"), k=body.get("k", 5)
+                )
+                return self._send(200, {"results": results})
+
+            if self.path == "/run":
+                agent = self.server.agents.get(body.get("llm"), bool(body.get("debug")))
+                result, trace = agent.run(body["symptom"], body.get("service"))
+                return self._send(200, {"result": result, "trace": trace})
+
+        except KeyError as e:
+            return self._send(400, {"error": f"Missing field {e}"})
+        except Exception as e:
+            return self._send(500, {"error": f"{type(e).__name__}: {e}"})
+
+        self._send(404, {"error": f"Unknown endpoint {self.path}"})
+
+    def _send(self, status: int, payload: dict):
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, fmt, *args):
+        print(f"[{self.log_date_time_string()}] {fmt % args}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--max-batch", type=int, default=64,
+                        help="Maximum queries encoded in one model call")
+    parser.add_argument("--max-wait-ms", type=float, default=5.0,
+                        help="How long to wait for more queries before encoding")
+    args = parser.parse_args()
+
+    print("[INFO] Loading index, metadata and embedding model...")
+    rag_search.warm_up()
+
+    server = ThreadingHTTPServer((args.host, args.port), Handler)
+    server.daemon_threads = True
+    server.started = time.monotonic()
+    server.agents = AgentPool()
+    server.batcher = rag_search.enable_micro_batching(args.max_batch, args.max_wait_ms)
+
+    print(f"[INFO] Serving on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
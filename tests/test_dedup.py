@@ -0,0 +1,25 @@
+from rag.dedup import Deduplicator
+
+
+TEXT = "Placement allocation candidates are not found when the resource provider inventory is stale"
+
+
+def chunk(service, text=TEXT):
+    return {"id": f"{service}-1", "service": service, "text": text}
+
+
+def test_same_text_in_two_services_is_kept_for_each():
+    for mode in ("exact", "near"):
+        dedup = Deduplicator(mode)
+        assert dedup.check(chunk("placement")) is None
+        assert dedup.check(chunk("neutron")) is None
+        assert dedup.rows == 2
+
+
+def test_duplicates_within_a_service_are_folded():
+    for mode in ("exact", "near"):
+        dedup = Deduplicator(mode)
+        assert dedup.check(chunk("placement")) is None
+        assert dedup.check(chunk("neutron")) is None
+        assert dedup.check(chunk("neutron", TEXT.upper() + "!")) == 1
+        assert dedup.stats()["exact_duplicates"] == 1